@@ -0,0 +1,184 @@
+"""Synthetic PDFs for the benchmarks, generated with PyMuPDF.
+
+Every document is built from fixed text, seeded random images and fixed metadata, so the same
+tier produces the same files on every machine and run (the encrypted one differs only in its
+random salt). Files are named after a hash of their specification and reused when present;
+changing a tier regenerates only what changed.
+
+Kinds of documents:
+    pages      many plain text pages
+    images     pages carrying large embedded photos (random noise, so they do not compress away)
+    fonts      text set in several embedded fonts on every page
+    outline    text pages with a deep, wide bookmark tree
+    encrypted  the pages document protected with AES-256 (password BENCHMARK_PASSWORD)
+    scanned    pages that are only an image of text, for OCR
+"""
+import hashlib
+import io
+import os
+from typing import Dict, NamedTuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+BENCHMARK_PASSWORD = "benchmark"
+CORPUS_VERSION = 1  # bump when a generator changes, so existing corpora are rebuilt
+KINDS = ("pages", "images", "fonts", "outline", "encrypted", "scanned")
+
+_PAGE_SIZE = (595, 842)  # A4 in points
+_METADATA = {'title': "PDF Toolbox benchmark", 'author': "benchmark_corpus", 'subject': "Synthetic test document",
+             'keywords': "benchmark, synthetic", 'creator': "benchmark_corpus", 'producer': "PyMuPDF",
+             'creationDate': "D:20240101000000Z", 'modDate': "D:20240101000000Z"}
+_WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut "
+          "labore et dolore magna aliqua ut enim ad minim veniam quis nostrud exercitation ullamco").split()
+
+
+class CorpusTier(NamedTuple):
+    pages: int  # pages of the pages, outline and encrypted documents
+    image_pages: int
+    image_size: int  # side of each embedded image in pixels
+    font_pages: int
+    fonts: int  # embedded fonts per page
+    outline_depth: int
+    outline_fanout: int  # bookmarks per level
+    scanned_pages: int
+
+
+TIERS = {
+    'small': CorpusTier(pages=50, image_pages=5, image_size=800, font_pages=20, fonts=3,
+                        outline_depth=3, outline_fanout=4, scanned_pages=2),
+    'medium': CorpusTier(pages=500, image_pages=25, image_size=1600, font_pages=200, fonts=3,
+                         outline_depth=4, outline_fanout=6, scanned_pages=10),
+    'large': CorpusTier(pages=5000, image_pages=100, image_size=2400, font_pages=1000, fonts=3,
+                        outline_depth=5, outline_fanout=8, scanned_pages=40),
+}
+
+
+def corpus_paths(directory: str, tier: str) -> Dict[str, str]:
+    """Path of every kind of document of tier in directory, generating the missing ones."""
+    spec = TIERS[tier]
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for kind in KINDS:
+        digest = hashlib.sha256(f"{CORPUS_VERSION} {kind} {tuple(spec)} {fitz.VersionBind}".encode()).hexdigest()[:12]
+        path = os.path.join(directory, f"{tier}_{kind}_{digest}.pdf")
+        if not os.path.exists(path):
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            _GENERATORS[kind](spec, temp_path)
+            os.replace(temp_path, path)
+        paths[kind] = path
+    return paths
+
+
+def _paragraph(number: int, words: int = 120) -> str:
+    # Deterministic filler text that differs from page to page
+    return " ".join(_WORDS[(number * 7 + i * 3) % len(_WORDS)] for i in range(words))
+
+
+def _new_document() -> fitz.Document:
+    doc = fitz.open()
+    doc.set_metadata(_METADATA)
+    return doc
+
+
+def _add_text_page(doc: fitz.Document, number: int, fontname: str = "helv") -> fitz.Page:
+    page = doc.new_page(width=_PAGE_SIZE[0], height=_PAGE_SIZE[1])
+    page.insert_text((72, 72), f"Page {number + 1}", fontsize=18, fontname=fontname)
+    page.insert_textbox(fitz.Rect(72, 100, _PAGE_SIZE[0] - 72, _PAGE_SIZE[1] - 72), _paragraph(number),
+                        fontsize=11, fontname=fontname)
+    return page
+
+
+def _save(doc: fitz.Document, path: str, **options):
+    # No IDs or timestamps from the save itself, so the output is byte-for-byte reproducible
+    doc.save(path, garbage=3, deflate=True, no_new_id=True, **options)
+    doc.close()
+
+
+def _generate_pages(spec: CorpusTier, path: str):
+    doc = _new_document()
+    for number in range(spec.pages):
+        _add_text_page(doc, number)
+    _save(doc, path)
+
+
+def _generate_images(spec: CorpusTier, path: str):
+    rng = np.random.default_rng(0)
+    doc = _new_document()
+    for number in range(spec.image_pages):
+        page = _add_text_page(doc, number)
+        pixels = rng.integers(0, 256, (spec.image_size, spec.image_size, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+        page.insert_image(fitz.Rect(72, 300, _PAGE_SIZE[0] - 72, _PAGE_SIZE[1] - 72), stream=buffer.getvalue())
+    _save(doc, path)
+
+
+def _generate_fonts(spec: CorpusTier, path: str):
+    doc = _new_document()
+    # Embedded copies of the built-in fonts, so every one is a real font program in the file
+    buffers = [fitz.Font(name).buffer for name in ("helv", "tiro", "cour", "hebo", "tibo", "cobo")][:spec.fonts]
+    for number in range(spec.font_pages):
+        page = doc.new_page(width=_PAGE_SIZE[0], height=_PAGE_SIZE[1])
+        height = (_PAGE_SIZE[1] - 144) / len(buffers)
+        for index, buffer in enumerate(buffers):
+            fontname = f"F{index}"
+            page.insert_font(fontname=fontname, fontbuffer=buffer)
+            top = 72 + index * height
+            page.insert_textbox(fitz.Rect(72, top, _PAGE_SIZE[0] - 72, top + height),
+                                _paragraph(number * len(buffers) + index, 60), fontsize=10, fontname=fontname)
+    _save(doc, path)
+
+
+def _generate_outline(spec: CorpusTier, path: str):
+    doc = _new_document()
+    for number in range(spec.pages):
+        _add_text_page(doc, number)
+    # A full tree of outline_fanout bookmarks per level, spread evenly over the pages
+    leaves = spec.outline_fanout ** spec.outline_depth
+    toc = []
+
+    def add_level(level: int, first_leaf: int, path_label: str):
+        span = spec.outline_fanout ** (spec.outline_depth - level)
+        for index in range(spec.outline_fanout):
+            leaf = first_leaf + index * span
+            label = f"{path_label}.{index + 1}" if path_label else str(index + 1)
+            toc.append([level, f"Section {label}", 1 + leaf * spec.pages // leaves])
+            if level < spec.outline_depth:
+                add_level(level + 1, leaf, label)
+
+    add_level(1, 0, "")
+    doc.set_toc(toc)
+    _save(doc, path)
+
+
+def _generate_encrypted(spec: CorpusTier, path: str):
+    doc = _new_document()
+    for number in range(spec.pages):
+        _add_text_page(doc, number)
+    _save(doc, path, encryption=fitz.PDF_ENCRYPT_AES_256, user_pw=BENCHMARK_PASSWORD,
+          owner_pw=BENCHMARK_PASSWORD + "-owner")
+
+
+def _generate_scanned(spec: CorpusTier, path: str):
+    # Text pages rendered to grayscale images at 150 DPI, then placed as the only page content
+    with _new_document() as source:
+        for number in range(spec.scanned_pages):
+            _add_text_page(source, number, fontname="tiro")
+        doc = _new_document()
+        for page in source:
+            pix = page.get_pixmap(matrix=fitz.Matrix(150 / 72, 150 / 72), colorspace=fitz.csGRAY)
+            scan = doc.new_page(width=page.rect.width, height=page.rect.height)
+            scan.insert_image(scan.rect, stream=pix.tobytes("png"))
+    _save(doc, path)
+
+
+_GENERATORS = {
+    'pages': _generate_pages,
+    'images': _generate_images,
+    'fonts': _generate_fonts,
+    'outline': _generate_outline,
+    'encrypted': _generate_encrypted,
+    'scanned': _generate_scanned,
+}
@@ -0,0 +1,136 @@
+"""Open document handles shared by the GUI tabs.
+
+Selecting the same file in several tabs, or clicking through one tab, used to open and parse the
+file again each time. DocumentPool keeps parsed fitz documents and PyPDF2 readers keyed by path
+and hands the same handle to every caller while the file's size and modification time are
+unchanged; a file changed on disk gets a fresh handle on its next use.
+
+Handles are reference counted. Unused handles stay open for reuse and the least recently used
+ones are closed once more than max_open are kept. Neither fitz documents nor PdfReaders may be
+used by two threads at once, so every handle comes with a lock that its users share.
+
+Pooled PdfReaders are for reading only: PyPDF2's writers modify the page dictionaries of the
+reader they copy from, so operations that write a file keep parsing their own.
+"""
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import fitz  # PyMuPDF
+from PyPDF2 import PdfReader
+
+from pdf_operations import file_fingerprint
+
+FITZ = "fitz"
+PYPDF2 = "pypdf2"
+
+DEFAULT_MAX_OPEN = 8
+
+
+class DocumentHandle:
+    def __init__(self, path: str, kind: str, fingerprint: Tuple[str, int, int]):
+        self.path = path
+        self.kind = kind
+        self.fingerprint = fingerprint
+        self.lock = threading.RLock()  # held while the document is in use
+        self.refs = 0
+        self.stale = False
+        self._file = None
+        if kind == FITZ:
+            self.document = fitz.open(path)
+        else:
+            # Through a file handle PdfReader parses only the xref and the objects it is asked for
+            self._file = open(path, 'rb')
+            try:
+                self.document = PdfReader(self._file)
+            except Exception:
+                self._file.close()
+                raise
+
+    def close(self):
+        if self.kind == FITZ:
+            self.document.close()
+        else:
+            self._file.close()
+
+
+class DocumentPool:
+    """Reference-counted, LRU-bounded cache of open documents keyed by path, size and mtime."""
+
+    def __init__(self, max_open: int = DEFAULT_MAX_OPEN):
+        self.max_open = max_open
+        self._handles: "OrderedDict[Tuple[str, str], DocumentHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, path: str, kind: str = FITZ) -> DocumentHandle:
+        """A handle on the current version of path; give it back with release()."""
+        fingerprint = file_fingerprint(path)
+        if fingerprint is None:
+            raise FileNotFoundError(f"Cannot read {path}")
+        key = (fingerprint[0], kind)
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None and handle.fingerprint != fingerprint:
+                self._discard(key)
+                handle = None
+            if handle is None:
+                handle = DocumentHandle(path, kind, fingerprint)
+                self._handles[key] = handle
+            self._handles.move_to_end(key)
+            handle.refs += 1
+            self._evict()
+            return handle
+
+    def release(self, handle: DocumentHandle):
+        with self._lock:
+            handle.refs -= 1
+            if handle.refs <= 0 and handle.stale:
+                handle.close()
+            else:
+                self._evict()
+
+    @contextmanager
+    def fitz(self, path: str) -> Iterator[fitz.Document]:
+        """The shared fitz document of path, locked for the calling thread while in use."""
+        with self._borrow(path, FITZ) as document:
+            yield document
+
+    @contextmanager
+    def reader(self, path: str) -> Iterator[PdfReader]:
+        """The shared PdfReader of path for reading, locked for the calling thread while in use."""
+        with self._borrow(path, PYPDF2) as document:
+            yield document
+
+    def invalidate(self, path: Optional[str] = None):
+        """Forget the handles of path (all handles when None); ones in use close on release."""
+        with self._lock:
+            for key in list(self._handles):
+                if path is None or key[0] == os.path.abspath(path):
+                    self._discard(key)
+
+    def close(self):
+        self.invalidate()
+
+    @contextmanager
+    def _borrow(self, path: str, kind: str):
+        handle = self.acquire(path, kind)
+        try:
+            with handle.lock:
+                yield handle.document
+        finally:
+            self.release(handle)
+
+    def _discard(self, key):
+        # Called with self._lock held
+        handle = self._handles.pop(key)
+        handle.stale = True
+        if handle.refs <= 0:
+            handle.close()
+
+    def _evict(self):
+        # Called with self._lock held
+        unused = [key for key, handle in self._handles.items() if handle.refs <= 0]
+        for key in unused[:max(len(self._handles) - self.max_open, 0)]:
+            self._discard(key)
@@ -0,0 +1,217 @@
+"""Background jobs of the GUI: a bounded queue served by a pool of worker threads.
+
+A job is a generator function run on a worker thread. Everything it yields, and finally the
+error it ended with (or None), is handed back to callbacks that always run on the Tk thread:
+workers only put them on a queue that the scheduler drains through window.after while jobs are
+active, so no Tk call is ever made from a worker.
+
+Each kind of job (merge, split, ocr, ...) has a concurrency limit, so a split can be queued and
+run while a merge is still writing, but two OCR runs do not fight over the same cores. Jobs are
+cancelled between two yielded items; closing the generator lets it shut down its process pools.
+A job that writes one file yields nothing and checks Job.cancelled itself (through
+Progress.check()) before committing the file: an error raised after cancel() counts as the
+cancellation, and a job that ran to completion is never reported as cancelled.
+"""
+import itertools
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PENDING = 32
+DEFAULT_KIND_LIMIT = 2
+# Kinds that already spread their work over a process pool of their own
+DEFAULT_LIMITS = {'split': 1, 'ocr': 1, 'batch': 1}
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+
+
+class JobCancelled(Exception):
+    def __init__(self, title: str = ""):
+        super().__init__(f"{title} cancelled" if title else "Cancelled")
+
+
+class SchedulerFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, title: str, produce: Callable[[], Iterable],
+                 on_item: Optional[Callable[[Any], None]], on_done: Optional[Callable[[Optional[Exception]], None]]):
+        self.id = next(_job_ids)
+        self.kind = kind
+        self.title = title
+        self.state = QUEUED
+        self.produce = produce
+        self.on_item = on_item
+        self.on_done = on_done
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} {self.state}: {self.title}>"
+
+
+_job_ids = itertools.count(1)
+
+
+class JobScheduler:
+    """Runs submitted jobs on up to workers threads, at most limits[kind] of each kind at a time.
+
+    after is the Tk after() method used to poll for results; submit() and cancel() are meant to
+    be called from the Tk thread as well.
+    """
+
+    def __init__(self, after: Callable, workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING,
+                 limits: Optional[Dict[str, int]] = None, kind_limit: int = DEFAULT_KIND_LIMIT, poll_ms: int = 50):
+        self.after = after
+        self.workers = workers
+        self.max_pending = max_pending
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.kind_limit = kind_limit
+        self.poll_ms = poll_ms
+        self._pending: Deque[Job] = deque()
+        self._running: Dict[int, Job] = {}
+        self._threads: List[threading.Thread] = []
+        self._condition = threading.Condition()
+        self._results: "queue.Queue" = queue.Queue()
+        self._polling = False
+        self._stopped = False
+
+    def submit(self, kind: str, produce: Callable[[], Iterable], on_item=None, on_done=None, title: str = "") -> Job:
+        """Queue produce() to run in the background; raises SchedulerFull when max_pending jobs wait."""
+        job = Job(kind, title or kind, produce, on_item, on_done)
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("The job scheduler is shut down.")
+            if len(self._pending) >= self.max_pending:
+                raise SchedulerFull(f"{len(self._pending)} jobs are already waiting; try again when some have finished.")
+            self._pending.append(job)
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads) + 1}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._condition.notify_all()
+        self._start_polling()
+        return job
+
+    def cancel(self, job: Job):
+        """Drop a queued job, or stop a running one after the item it is working on."""
+        job._cancelled.set()
+        with self._condition:
+            if job.state != QUEUED:
+                return
+            self._pending.remove(job)
+            job.state = DONE
+        self._results.put((job.on_done, JobCancelled(job.title)))
+        self._start_polling()
+
+    def notify(self, callback: Callable[[Any], None], value):
+        """Call callback(value) on the Tk thread; safe to use from any thread, e.g. for progress."""
+        self._results.put((callback, value))
+
+    def cancel_all(self):
+        for job in self.jobs():
+            self.cancel(job)
+
+    def jobs(self) -> List[Job]:
+        """Running jobs followed by the queued ones in the order they will start."""
+        with self._condition:
+            return list(self._running.values()) + list(self._pending)
+
+    def counts(self) -> Dict[str, int]:
+        with self._condition:
+            return {RUNNING: len(self._running), QUEUED: len(self._pending)}
+
+    def busy(self) -> bool:
+        with self._condition:
+            return bool(self._running or self._pending)
+
+    def shutdown(self, wait: bool = False):
+        """Cancel every job and stop the workers; results not yet dispatched are dropped."""
+        for job in self.jobs():
+            job._cancelled.set()
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _next_job(self) -> Optional[Job]:
+        # Called with self._condition held: the oldest queued job whose kind is below its limit
+        running_kinds: Dict[str, int] = {}
+        for job in self._running.values():
+            running_kinds[job.kind] = running_kinds.get(job.kind, 0) + 1
+        for job in self._pending:
+            if running_kinds.get(job.kind, 0) < self.limits.get(job.kind, self.kind_limit):
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None and not self._stopped:
+                    self._condition.wait()
+                    job = self._next_job()
+                if self._stopped:
+                    return
+                self._pending.remove(job)
+                job.state = RUNNING
+                self._running[job.id] = job
+            error = self._run(job)
+            # The final result is queued before the job stops counting as active, see _poll()
+            self._results.put((job.on_done, error))
+            with self._condition:
+                del self._running[job.id]
+                job.state = DONE
+                self._condition.notify_all()
+
+    def _run(self, job: Job) -> Optional[Exception]:
+        items = None
+        try:
+            items = iter(job.produce())
+            for item in items:
+                if job.on_item is not None:
+                    self._results.put((job.on_item, item))
+                if job.cancelled:
+                    return JobCancelled(job.title)
+            return None
+        except Exception as e:
+            return JobCancelled(job.title) if job.cancelled else e
+        finally:
+            close = getattr(items, 'close', None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        # Runs on the Tk thread: dispatch everything the workers produced since the last call
+        try:
+            while True:
+                try:
+                    callback, value = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if callback is not None:
+                    callback(value)
+        finally:
+            if self.busy() or not self._results.empty():
+                self.after(self.poll_ms, self._poll)
+            else:
+                self._polling = False
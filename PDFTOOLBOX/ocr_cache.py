@@ -0,0 +1,111 @@
+"""Persistent OCR results keyed by the content of the rendered page.
+
+The key hashes the page pixels together with the DPI, preprocessing options, language,
+Tesseract configuration and Tesseract version, so the same page found in another file (or the
+same file after an unrelated edit) is recognized once, while any change that could alter the
+text misses the cache.
+
+Results live in one SQLite database in WAL mode. Every thread and process opens its own
+connection, so the OCR workers can read and write it concurrently; the least recently used
+results are evicted once the stored text outgrows its budget.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import pytesseract
+
+from paths import cache_root
+
+DEFAULT_OCR_CACHE_BYTES = 256 * 1024 * 1024
+
+# Eviction scans the table, so it is only checked every this many stores per connection
+_EVICT_EVERY = 64
+
+_tesseract_version: Optional[str] = None
+
+
+def default_ocr_cache_path() -> str:
+    return os.path.join(cache_root(), "ocr.sqlite3")
+
+
+def tesseract_version() -> str:
+    global _tesseract_version
+    if _tesseract_version is None:
+        try:
+            _tesseract_version = str(pytesseract.get_tesseract_version())
+        except Exception:
+            _tesseract_version = "unknown"
+    return _tesseract_version
+
+
+def ocr_cache_key(image, dpi: float, lang: Optional[str], config: str, preprocessing: str = "") -> str:
+    """Key of the OCR result of a rendered page (a PIL image, before preprocessing)."""
+    digest = hashlib.sha256(f"{image.mode} {image.width}x{image.height}\n".encode())
+    digest.update(image.tobytes())
+    digest.update(f"\n{dpi:g}|{preprocessing}|{lang or ''}|{config}|{tesseract_version()}".encode())
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """OCR texts by ocr_cache_key; safe to share between threads and worker processes."""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_OCR_CACHE_BYTES):
+        self.path = path or default_ocr_cache_path()
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def get(self, key: str) -> Optional[str]:
+        db = self._connection()
+        row = db.execute("SELECT text FROM ocr WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        db.execute("UPDATE ocr SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, text: str):
+        db = self._connection()
+        db.execute("INSERT OR REPLACE INTO ocr (key, text, size, last_used) VALUES (?, ?, ?, ?)",
+                   (key, text, len(text.encode('utf-8')), time.time()))
+        self._local.stores += 1
+        if self._local.stores % _EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used results until the texts fit in 90% of max_bytes."""
+        db = self._connection()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM ocr").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * 0.9)
+        cutoff = None
+        for last_used, size in db.execute("SELECT last_used, size FROM ocr ORDER BY last_used"):
+            cutoff = last_used
+            excess -= size
+            if excess <= 0:
+                break
+        db.execute("DELETE FROM ocr WHERE last_used <= ?", (cutoff,))
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit: each statement is its own short transaction, so writers hold the lock briefly
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS ocr (key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                       "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS ocr_last_used ON ocr (last_used)")
+            self._local.db = db
+            self._local.stores = 0
+        return db
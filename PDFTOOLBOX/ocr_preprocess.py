@@ -0,0 +1,143 @@
+"""Page rendering and image clean-up before Tesseract, vectorized with NumPy.
+
+Pages are rendered straight to 8-bit grayscale at a resolution chosen from the page size, then
+cropped to their content, binarized with a local (adaptive) threshold and straightened. Tesseract
+gets a third of the bytes of an RGB render, without scanner borders or the uneven lighting and
+skew that cost it both time and accuracy.
+"""
+import math
+from typing import Callable, NamedTuple, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+
+class Preprocessing(NamedTuple):
+    dpi: int = 300  # resolution Tesseract works best at
+    max_side: int = 5000  # longest rendered side in pixels; large pages get a lower resolution
+    crop_borders: bool = True
+    threshold: bool = True
+    deskew: bool = True
+    max_skew: float = 5.0  # degrees searched either way
+
+
+def render_dpi(page, options: Preprocessing) -> int:
+    """Resolution to render a fitz page at: options.dpi, lowered for pages too large for max_side."""
+    longest = max(page.rect.width, page.rect.height) / 72 or 1.0
+    return max(1, min(options.dpi, int(options.max_side / longest)))
+
+
+def render_gray(doc, number: int, options: Preprocessing) -> Tuple[Image.Image, int]:
+    """Render the 0-based page directly to a grayscale PIL image; returns it with its DPI."""
+    page = doc.load_page(number)
+    dpi = render_dpi(page, options)
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY, alpha=False)
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples), dpi
+
+
+def preprocess(image: Image.Image, dpi: int, options: Preprocessing) -> Image.Image:
+    """Apply the enabled steps to a grayscale page image rendered at dpi."""
+    return preprocess_mapped(image, dpi, options)[0]
+
+
+def preprocess_mapped(image: Image.Image, dpi: int, options: Preprocessing) -> Tuple[Image.Image, Callable]:
+    """Like preprocess, also returning a function that maps an (x, y) pixel of the result back to
+    the same point of the input image, to place recognized words on the original page."""
+    gray = np.asarray(image.convert("L"))
+    left = top = 0
+    if options.crop_borders:
+        left, top, right, bottom = content_box(gray, margin=dpi // 10)
+        gray = gray[top:bottom, left:right]
+    if options.threshold:
+        gray = adaptive_threshold(gray, window=dpi // 8)
+    result = Image.fromarray(gray)
+    angle = estimate_skew(gray < 128, options.max_skew) if options.deskew else 0.0
+    if abs(angle) >= 0.1:
+        result = result.rotate(angle, resample=Image.NEAREST if options.threshold else Image.BILINEAR,
+                               expand=True, fillcolor=255)
+    else:
+        angle = 0.0
+    # Image.rotate turns the picture counter-clockwise around its center; undo that, then the crop
+    cos, sin = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    source_center = (gray.shape[1] / 2, gray.shape[0] / 2)
+    result_center = (result.width / 2, result.height / 2)
+
+    def to_source(x: float, y: float) -> Tuple[float, float]:
+        x, y = x - result_center[0], y - result_center[1]
+        return (left + source_center[0] + x * cos - y * sin,
+                top + source_center[1] + x * sin + y * cos)
+
+    return result, to_source
+
+
+def content_box(gray: np.ndarray, margin: int = 30, dark: int = 128, border: float = 0.6) -> Tuple[int, int, int, int]:
+    """(left, top, right, bottom) of the page content, without the dark bands a scanner leaves at the
+    edges and with blank margins trimmed to margin pixels."""
+    height, width = gray.shape
+    ink = gray < dark
+    rows, cols = ink.mean(axis=1), ink.mean(axis=0)
+    top, bottom = _trim(rows, border)
+    left, right = _trim(cols, border)
+    if top >= bottom or left >= right:
+        return 0, 0, width, height
+    ink = ink[top:bottom, left:right]
+    content_rows = np.flatnonzero(ink.any(axis=1))
+    content_cols = np.flatnonzero(ink.any(axis=0))
+    if not len(content_rows):
+        return left, top, right, bottom
+    return (left + max(content_cols[0] - margin, 0), top + max(content_rows[0] - margin, 0),
+            left + min(content_cols[-1] + margin + 1, right - left), top + min(content_rows[-1] + margin + 1, bottom - top))
+
+
+def _trim(fractions: np.ndarray, border: float) -> Tuple[int, int]:
+    # First and last index that is not part of a dark band touching the edge
+    light = np.flatnonzero(fractions <= border)
+    if not len(light):
+        return 0, 0
+    return int(light[0]), int(light[-1]) + 1
+
+
+def adaptive_threshold(gray: np.ndarray, window: int = 37, offset: int = 10) -> np.ndarray:
+    """Black where a pixel is darker than the mean of the window around it by more than offset.
+
+    Local means come from running sums along each axis, so the cost does not depend on the window
+    size, and every intermediate fits in int32 even for an A3 page at 300 DPI.
+    """
+    half = max(window // 2, 1)
+    height, width = gray.shape
+    top = np.clip(np.arange(height) - half, 0, height)
+    bottom = np.clip(np.arange(height) + half + 1, 0, height)
+    left = np.clip(np.arange(width) - half, 0, width)
+    right = np.clip(np.arange(width) + half + 1, 0, width)
+    running = np.zeros((height + 1, width), dtype=np.int32)
+    np.cumsum(gray, axis=0, dtype=np.int32, out=running[1:])
+    columns = running[bottom] - running[top]
+    running = np.zeros((height, width + 1), dtype=np.int32)
+    np.cumsum(columns, axis=1, dtype=np.int32, out=running[:, 1:])
+    sums = running[:, right] - running[:, left]
+    counts = ((bottom - top)[:, None] * (right - left)[None, :]).astype(np.int32)
+    return np.where(gray * counts < sums - offset * counts, 0, 255).astype(np.uint8)
+
+
+def estimate_skew(ink: np.ndarray, max_angle: float = 5.0, step: float = 0.25, samples: int = 200_000) -> float:
+    """Angle in degrees (counter-clockwise) that makes the text lines of a page horizontal.
+
+    Projects the ink onto the vertical axis at each candidate angle: when lines are level the
+    row histogram is sharpest, which maximizes its sum of squares.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > samples:
+        chosen = np.random.default_rng(0).choice(len(ys), samples, replace=False)
+        ys, xs = ys[chosen], xs[chosen]
+    xs = xs.astype(np.float64)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rows = np.round(ys + xs * np.tan(np.radians(angle))).astype(np.int64)
+        counts = np.bincount(rows - rows.min()).astype(np.float64)
+        score = float(np.dot(counts, counts))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return -best_angle
@@ -0,0 +1,213 @@
+"""Page preview rendering with an LRU image cache and background prefetching.
+
+PreviewRenderer renders pages of an already open fitz document to small PIL images. Rendered
+pages are kept in a cache bounded by their pixel bytes, and after each request the pages around
+it are rendered on a background thread, so stepping through a document with Next/Previous is
+served from memory instead of rasterizing on the Tk thread.
+
+request() renders on that thread too. Only the newest request is kept, so dragging a slider
+across hundreds of pages renders the page it stops on rather than every page it passed, and an
+uncached page is delivered twice: a quick low-resolution draft, then the full preview.
+
+fitz documents must not be used from two threads at once; every access goes through one lock.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from profiling import span
+
+DEFAULT_PREVIEW_CACHE_BYTES = 48 * 1024 * 1024
+DEFAULT_PREVIEW_SCALE = 0.3
+
+# Draft renders are this fraction of the preview scale
+DRAFT_FACTOR = 0.35
+
+# deliver(number, image or the render error, final)
+Deliver = Callable[[int, Union[Image.Image, Exception], bool], None]
+
+
+def render_page(doc, number: int, scale: float) -> Image.Image:
+    """Render the 0-based page of an open fitz document to a PIL image at the given zoom."""
+    with span("render page", "fitz", page=number + 1, scale=scale):
+        page = doc.load_page(number)
+        try:
+            pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))  # type: ignore
+        except AttributeError:
+            pix = page.getPixmap(matrix=fitz.Matrix(scale, scale))  # type: ignore
+        mode = "RGB" if pix.n < 4 else "RGBA"
+        return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+
+def image_bytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+class PreviewRenderer:
+    """Cached, prefetching page renderer for one open document.
+
+    get(number) returns the rendered page, from the cache when possible, and queues the
+    `prefetch` pages on either side of it for the background thread, nearest first. A newer
+    request replaces the queued pages, so the thread never works on pages the user has left.
+    request(number, deliver) does the same without blocking the caller on a cache miss. The
+    renderer does not own the document; call close() before closing it. Pass the lock that other
+    users of a shared document hold while using it.
+    """
+
+    def __init__(self, doc, scale: float = DEFAULT_PREVIEW_SCALE,
+                 cache_bytes: int = DEFAULT_PREVIEW_CACHE_BYTES, prefetch: int = 3,
+                 lock: Optional[threading.RLock] = None):
+        self.doc = doc
+        self.scale = scale
+        self.page_count = doc.page_count
+        self.prefetch = prefetch
+        self._cache_limit = cache_bytes
+        self._cache: "OrderedDict[int, Image.Image]" = OrderedDict()
+        self._cached_bytes = 0
+        self._doc_lock = lock or threading.Lock()
+        self._state = threading.Condition()
+        self._pending: List[int] = []
+        self._request: Optional[Tuple[int, int, Deliver]] = None
+        self._generation = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, number: int) -> Image.Image:
+        """The rendered 0-based page; renders on the calling thread only on a cache miss."""
+        image = self.cached(number)
+        if image is None:
+            image = self._render(number)
+        self._queue_neighbours(number)
+        return image
+
+    def request(self, number: int, deliver: Deliver) -> Optional[Image.Image]:
+        """Return the 0-based page if it is cached, otherwise render it on the background thread
+        and pass it to deliver.
+
+        deliver is called from that thread, so a GUI should hand the result over to its own loop.
+        An uncached page is delivered as a draft (final=False) before the full preview; a render
+        error is delivered in place of the image. Every request replaces the previous one, whose
+        remaining results are dropped without being delivered.
+        """
+        with self._state:
+            if self._closed:
+                return None
+            self._generation += 1
+            self._request = None
+            image = self._cache.get(number)
+            if image is None:
+                self._request = (self._generation, number, deliver)
+                self._pending = []  # the neighbours of the previous page
+                self._start_thread()
+                self._state.notify()
+                return None
+            self._cache.move_to_end(number)
+        self._queue_neighbours(number)
+        return image
+
+    def cached(self, number: int) -> Optional[Image.Image]:
+        with self._state:
+            image = self._cache.get(number)
+            if image is not None:
+                self._cache.move_to_end(number)
+            return image
+
+    def close(self):
+        """Stop prefetching and drop the cache; waits for a render in progress to finish."""
+        with self._state:
+            self._closed = True
+            self._pending = []
+            self._request = None
+            self._cache.clear()
+            self._cached_bytes = 0
+            self._state.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _render(self, number: int) -> Image.Image:
+        with self._doc_lock:
+            image = render_page(self.doc, number, self.scale)
+        self._store(number, image)
+        return image
+
+    def _store(self, number: int, image: Image.Image):
+        size = image_bytes(image)
+        with self._state:
+            if self._closed or size > self._cache_limit:
+                return
+            previous = self._cache.pop(number, None)
+            if previous is not None:
+                self._cached_bytes -= image_bytes(previous)
+            self._cache[number] = image
+            self._cached_bytes += size
+            while self._cached_bytes > self._cache_limit:
+                _number, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= image_bytes(evicted)
+
+    def _queue_neighbours(self, number: int):
+        wanted = []
+        for distance in range(1, self.prefetch + 1):
+            # Forward first: paging through a document mostly moves forward
+            for neighbour in (number + distance, number - distance):
+                if 0 <= neighbour < self.page_count:
+                    wanted.append(neighbour)
+        with self._state:
+            if self._closed:
+                return
+            self._pending = [page for page in wanted if page not in self._cache]
+            if self._pending:
+                self._start_thread()
+            self._state.notify()
+
+    def _start_thread(self):
+        # Called with self._state held
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._render_loop, daemon=True)
+            self._thread.start()
+
+    def _is_current(self, generation: int) -> bool:
+        with self._state:
+            return generation == self._generation and not self._closed
+
+    def _render_loop(self):
+        while True:
+            with self._state:
+                while not self._request and not self._pending and not self._closed:
+                    self._state.wait()
+                if self._closed:
+                    return
+                request, self._request = self._request, None
+                if request is None:
+                    number = self._pending.pop(0)
+                    if number in self._cache:
+                        continue
+            if request is not None:
+                self._serve(*request)
+                continue
+            try:
+                self._render(number)
+            except Exception:
+                pass  # a damaged page; reported when the user goes there
+
+    def _serve(self, generation: int, number: int, deliver: Deliver):
+        try:
+            image = self.cached(number)
+            if image is None:
+                with self._doc_lock:
+                    draft = render_page(self.doc, number, self.scale * DRAFT_FACTOR)
+                if not self._is_current(generation):
+                    return
+                deliver(number, draft, False)
+                if not self._is_current(generation):
+                    return  # the user moved on while the draft was shown
+                image = self._render(number)
+        except Exception as e:
+            if self._is_current(generation):
+                deliver(number, e, True)
+            return
+        if self._is_current(generation):
+            deliver(number, image, True)
+            self._queue_neighbours(number)
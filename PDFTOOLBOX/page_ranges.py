@@ -0,0 +1,163 @@
+"""Compact page selections stored as sorted intervals."""
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+PAGE_SYNTAX_HELP = "e.g. 1,3,5 or 2-4, 7-, odd, even, last, -5 (last five), !3 (all but 3)"
+
+
+class PageRangeSet:
+    """A set of 1-based page numbers kept as sorted, non-overlapping inclusive intervals.
+
+    Membership is a binary search, so selecting '1-500000' costs two integers instead of half a
+    million, and callers can walk the selected intervals or the gaps between them directly.
+    Ranges, 'last', '-N' and exclusions stay this compact; 'odd' and 'even' are stored as one
+    interval per page, so 'odd' on a 500,000-page file holds 250,000 of them. Instances are never
+    changed after they are built and hash by their intervals.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]] = ()):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        for start, end in sorted(intervals):
+            if start > end:
+                continue
+            if self._ends and start <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[int]) -> "PageRangeSet":
+        return cls((page, page) for page in pages)
+
+    @classmethod
+    def all_pages(cls, total_pages: int) -> "PageRangeSet":
+        return cls([(1, total_pages)])
+
+    @classmethod
+    def parse(cls, text: str, total_pages: Optional[int] = None) -> "PageRangeSet":
+        """Parse a selection like '1,3-5,odd,!4'; see PAGE_SYNTAX_HELP.
+
+        Tokens after '!' are excluded. A selection made only of exclusions starts from every page.
+        With total_pages the result is validated against the document in the same pass.
+        """
+        included, excluded = [], []
+        for token in text.replace(';', ',').split(','):
+            token = token.strip().lower()
+            if not token:
+                continue
+            target = included
+            if token.startswith('!'):
+                target, token = excluded, token[1:].strip()
+            target.extend(cls._parse_token(token, total_pages))
+        if not included and not excluded:
+            raise ValueError("Please enter at least one page.")
+        if not included:
+            if total_pages is None:
+                raise ValueError("Excluding pages needs the page count.")
+            included = [(1, total_pages)]
+        selection = cls(included) - cls(excluded)
+        if total_pages is not None:
+            selection.validate(total_pages)
+        return selection
+
+    @staticmethod
+    def _parse_token(token: str, total_pages: Optional[int]) -> List[Tuple[int, int]]:
+        def need_total():
+            if total_pages is None:
+                raise ValueError(f"'{token}' needs the page count.")
+            return total_pages
+
+        def number(text: str) -> int:
+            try:
+                return int(text)
+            except ValueError:
+                raise ValueError(f"Invalid page selection: {token}") from None
+
+        if token in ('odd', 'even'):
+            # No interval holds every other page: one per page (see the class docstring)
+            return [(page, page) for page in range(1 if token == 'odd' else 2, need_total() + 1, 2)]
+        if token == 'last':
+            return [(need_total(), need_total())]
+        if token.startswith('-'):
+            count = number(token[1:])
+            if count < 1:
+                raise ValueError(f"Invalid page selection: -{count}")
+            return [(max(need_total() - count + 1, 1), need_total())]
+        if '-' in token:
+            start, end = token.split('-', 1)
+            start = number(start.strip())
+            end = end.strip()
+            end = need_total() if end in ('', 'last') else number(end)
+            if start > end:
+                raise ValueError(f"Invalid page range: {start}-{end}")
+            return [(start, end)]
+        page = number(token)
+        return [(page, page)]
+
+    def validate(self, total_pages: int):
+        """Raise ValueError naming the first page outside 1..total_pages."""
+        if not self._starts:
+            return
+        if self._starts[0] < 1:
+            raise ValueError(f"Page {self._starts[0]} is out of range (1-{total_pages})")
+        if self._ends[-1] > total_pages:
+            raise ValueError(f"Page {max(self._starts[-1], total_pages + 1)} is out of range (1-{total_pages})")
+
+    def __contains__(self, page: int) -> bool:
+        i = bisect_right(self._starts, page) - 1
+        return i >= 0 and page <= self._ends[i]
+
+    def intersects(self, start: int, end: int) -> bool:
+        """Whether any selected page falls in start..end (inclusive)."""
+        i = bisect_right(self._starts, end) - 1
+        return i >= 0 and self._ends[i] >= start
+
+    def __len__(self) -> int:
+        return sum(end - start + 1 for start, end in self.intervals())
+
+    def __bool__(self) -> bool:
+        return bool(self._starts)
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in self.intervals():
+            yield from range(start, end + 1)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PageRangeSet) and self.intervals() == other.intervals()
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.intervals()))
+
+    def __sub__(self, other: "PageRangeSet") -> "PageRangeSet":
+        result = []
+        for start, end in self.intervals():
+            for gap_start, gap_end in other.gaps(start, end):
+                result.append((gap_start, gap_end))
+        return PageRangeSet(result)
+
+    def __or__(self, other: "PageRangeSet") -> "PageRangeSet":
+        return PageRangeSet(self.intervals() + other.intervals())
+
+    def intervals(self) -> List[Tuple[int, int]]:
+        return list(zip(self._starts, self._ends))
+
+    def gaps(self, first: int, last: int) -> Iterator[Tuple[int, int]]:
+        """Yield the unselected intervals within first..last."""
+        page = first
+        i = max(bisect_right(self._starts, first) - 1, 0)
+        while i < len(self._starts) and self._starts[i] <= last:
+            if self._ends[i] >= page:
+                if self._starts[i] > page:
+                    yield page, self._starts[i] - 1
+                page = self._ends[i] + 1
+            i += 1
+        if page <= last:
+            yield page, last
+
+    def __str__(self) -> str:
+        return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in self.intervals())
+
+    def __repr__(self) -> str:
+        return f"PageRangeSet('{self}')"
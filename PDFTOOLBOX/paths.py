@@ -0,0 +1,15 @@
+"""File locations of PDF Toolbox, kept free of other imports so any process can use them cheaply."""
+import os
+
+
+def cache_root() -> str:
+    """Per-user cache directory of PDF Toolbox."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pdf_toolbox")
+
+
+def make_parent_dir(path: str):
+    """Create the directory an output file is about to be written to, if it is missing."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
@@ -0,0 +1,323 @@
+"""Benchmarks of the core operations on a synthetic corpus, for comparing runs.
+
+Every case runs in a fresh process, so its peak memory is its own and no cache carries over
+from an earlier case. Results record wall time, peak RSS and output size per case and tier.
+The startup cases time a new interpreter importing the GUI, opening its window and printing the
+command line help:
+
+    python pdf_benchmark.py --tiers small medium -o before.json
+    python pdf_benchmark.py --tiers small medium -o after.json --compare before.json
+    python pdf_benchmark.py --list
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import fitz  # PyMuPDF
+import PyPDF2
+
+import pdf_operations as ops
+from benchmark_corpus import BENCHMARK_PASSWORD, TIERS, CorpusTier, corpus_paths
+from page_preview import DEFAULT_PREVIEW_SCALE, render_page
+from paths import cache_root
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not recorded
+    resource = None
+
+RESULTS_VERSION = 1
+DEFAULT_REPEAT = 3
+DEFAULT_TIMEOUT = 30 * 60
+
+# case(corpus paths by kind, tier, output directory) -> output paths
+Case = Callable[[Dict[str, str], CorpusTier, str], List[str]]
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _out(directory: str, name: str) -> str:
+    return os.path.join(directory, name)
+
+
+def _preview(corpus, tier, directory):
+    # Every page of the image and font documents at the GUI's preview scale
+    for kind in ("images", "fonts"):
+        with fitz.open(corpus[kind]) as doc:
+            for number in range(doc.page_count):
+                render_page(doc, number, DEFAULT_PREVIEW_SCALE)
+    return []
+
+
+def _ocr(corpus, tier, directory):
+    output_path, _counts = ops.make_searchable(corpus['scanned'], _out(directory, "searchable.pdf"), jobs=1,
+                                               use_cache=False)
+    return [output_path]
+
+
+def _startup(*args: str) -> Case:
+    # A new interpreter, as a user starting the program gets, Python's own start-up included
+    def run(corpus, tier, directory):
+        completed = subprocess.run([sys.executable, *args], cwd=_HERE, capture_output=True, text=True)
+        if completed.returncode:
+            lines = completed.stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"exit code {completed.returncode}")
+        return []
+    return run
+
+
+def _display_missing() -> Optional[str]:
+    if sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        return "No display to open the window on"
+    return None
+
+
+def _tesseract_missing() -> Optional[str]:
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        return f"Tesseract is not available: {e}"
+    return None
+
+
+CASES: Dict[str, Case] = {
+    'merge': lambda corpus, tier, directory: [ops.merge_pdfs(
+        [corpus['pages'], corpus['images'], corpus['fonts'], corpus['outline']], _out(directory, "merged.pdf"))[0]],
+    'delete': lambda corpus, tier, directory: [ops.delete_pages(
+        corpus['pages'], _out(directory, "deleted.pdf"), "odd")],
+    'delete_incremental': lambda corpus, tier, directory: [ops.delete_pages(
+        corpus['pages'], _out(directory, "deleted.pdf"), "odd", incremental=True)],
+    'split_range': lambda corpus, tier, directory: ops.split_pdf(
+        corpus['pages'], _out(directory, "{stem}_{part}.pdf"), "range", start=1, end=tier.pages // 2),
+    'split_every_n': lambda corpus, tier, directory: ops.split_pdf(
+        corpus['pages'], _out(directory, "{stem}_{part}.pdf"), "every_n", n=10),
+    'split_equal_n': lambda corpus, tier, directory: ops.split_pdf(
+        corpus['images'], _out(directory, "{stem}_{part}.pdf"), "equal_n", n=4),
+    'split_bookmarks': lambda corpus, tier, directory: ops.split_pdf(
+        corpus['outline'], _out(directory, "{stem}_{part}.pdf"), "bookmarks", depth=2),
+    'rotate': lambda corpus, tier, directory: [ops.rotate_pages(
+        corpus['fonts'], _out(directory, "rotated.pdf"), 90)],
+    'rotate_incremental': lambda corpus, tier, directory: [ops.rotate_pages(
+        corpus['fonts'], _out(directory, "rotated.pdf"), 90, incremental=True)],
+    'encrypt': lambda corpus, tier, directory: [ops.encrypt_pdf(
+        corpus['pages'], _out(directory, "encrypted.pdf"), "secret")],
+    'decrypt': lambda corpus, tier, directory: [ops.decrypt_pdf(
+        corpus['encrypted'], _out(directory, "decrypted.pdf"), BENCHMARK_PASSWORD)],
+    'metadata': lambda corpus, tier, directory: [ops.save_metadata(
+        corpus['images'], _out(directory, "metadata.pdf"), {'title': "Benchmark", 'author': "pdf_benchmark"})],
+    'metadata_incremental': lambda corpus, tier, directory: [ops.save_metadata(
+        corpus['images'], _out(directory, "metadata.pdf"), {'title': "Benchmark", 'author': "pdf_benchmark"},
+        incremental=True)],
+    'preview': _preview,
+    'ocr': _ocr,
+    'startup_import': _startup("-c", "import pdf_toolbox"),
+    'startup_window': _startup("-c", "import pdf_toolbox; app = pdf_toolbox.PDFToolbox(); app.window.update(); "
+                                     "app.window.destroy()"),
+    'startup_cli': _startup("pdf_toolbox.py", "--help"),
+}
+
+# Cases that do not use the corpus: run once, on the first tier, and without a peak RSS since the
+# work happens in a process of their own
+STARTUP_CASES = {'startup_import', 'startup_window', 'startup_cli'}
+
+# Cases that cannot run on every machine: name -> function returning why not, or None
+REQUIREMENTS: Dict[str, Callable[[], Optional[str]]] = {
+    'ocr': _tesseract_missing,
+    'startup_window': _display_missing,
+}
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident memory of this process in bytes, None where it cannot be measured."""
+    try:
+        # Linux keeps ru_maxrss across exec, so a spawned child would report its parent's peak
+        with open("/proc/self/status", encoding='ascii') as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def _run_case(name: str, corpus: Dict[str, str], tier: str, directory: str, connection):
+    # Runs in a fresh process; everything but the case itself is loaded before the clock starts
+    baseline = peak_rss()
+    try:
+        started = time.perf_counter()
+        outputs = CASES[name](corpus, TIERS[tier], directory)
+        wall = time.perf_counter() - started
+        connection.send({
+            'wall': wall,
+            'peak_rss': None if name in STARTUP_CASES else peak_rss(),
+            'baseline_rss': baseline,
+            'output_bytes': sum(os.path.getsize(path) for path in outputs),
+            'outputs': len(outputs),
+        })
+    except Exception as e:
+        connection.send({'error': f"{e.__class__.__name__}: {e}"})
+    finally:
+        connection.close()
+
+
+def measure(name: str, corpus: Dict[str, str], tier: str, repeat: int = DEFAULT_REPEAT,
+            timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """Run one case repeat times, each in a new process with an empty output directory."""
+    result = {'case': name, 'tier': tier}
+    requirement = REQUIREMENTS.get(name)
+    skipped = requirement() if requirement else None
+    if skipped:
+        return {**result, 'skipped': skipped}
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        directory = tempfile.mkdtemp(prefix=f"pdf_benchmark_{name}_")
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_run_case, args=(name, corpus, tier, directory, sender))
+        try:
+            process.start()
+            sender.close()
+            if not receiver.poll(timeout):
+                process.terminate()
+                return {**result, 'error': f"Timed out after {timeout:.0f}s"}
+            try:
+                run = receiver.recv()
+            except EOFError:  # the process died without reporting, e.g. killed for lack of memory
+                process.join()
+                run = {'error': f"Benchmark process exited with code {process.exitcode}"}
+            process.join()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        if 'error' in run:
+            return {**result, **run}
+        runs.append(run)
+    walls = [run['wall'] for run in runs]
+    rss = [run['peak_rss'] for run in runs if run['peak_rss'] is not None]
+    return {
+        **result,
+        'wall': [round(wall, 4) for wall in walls],
+        'wall_median': round(statistics.median(walls), 4),
+        'wall_min': round(min(walls), 4),
+        'peak_rss': max(rss) if rss else None,
+        'baseline_rss': runs[0]['baseline_rss'],
+        'output_bytes': runs[-1]['output_bytes'],
+        'outputs': runs[-1]['outputs'],
+    }
+
+
+def machine_info() -> dict:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'PyPDF2': PyPDF2.__version__,
+        'PyMuPDF': fitz.VersionBind,
+    }
+
+
+def run_benchmarks(tiers: List[str], cases: List[str], corpus_dir: str, repeat: int = DEFAULT_REPEAT,
+                   timeout: float = DEFAULT_TIMEOUT, report: Callable[[dict], None] = lambda result: None) -> dict:
+    results = []
+    corpus_seconds = {}
+    for tier in tiers:
+        started = time.perf_counter()
+        corpus = corpus_paths(corpus_dir, tier)
+        corpus_seconds[tier] = round(time.perf_counter() - started, 2)
+        for name in cases:
+            if name in STARTUP_CASES and tier != tiers[0]:
+                continue
+            result = measure(name, corpus, tier, repeat, timeout)
+            report(result)
+            results.append(result)
+    return {
+        'version': RESULTS_VERSION,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'machine': machine_info(),
+        'repeat': repeat,
+        'corpus_seconds': corpus_seconds,
+        'results': results,
+    }
+
+
+def describe(result: dict) -> str:
+    label = f"{result['tier']:<7} {result['case']:<22}"
+    if 'skipped' in result:
+        return f"{label} skipped: {result['skipped']}"
+    if 'error' in result:
+        return f"{label} ERROR {result['error']}"
+    rss = f"{result['peak_rss'] / 2**20:8.1f} MB" if result['peak_rss'] is not None else "       n/a"
+    return f"{label} {result['wall_median']:9.3f}s  peak {rss}  output {ops.format_size(result['output_bytes'])}"
+
+
+def compare(baseline: dict, current: dict) -> List[str]:
+    """One line per case measured in both runs: median wall time and peak RSS, before -> after."""
+    before = {(result['tier'], result['case']): result for result in baseline['results'] if 'wall_median' in result}
+    lines = []
+    for result in current['results']:
+        old = before.get((result['tier'], result['case']))
+        if old is None or 'wall_median' not in result:
+            continue
+        ratio = result['wall_median'] / old['wall_median'] if old['wall_median'] else float('inf')
+        line = (f"{result['tier']:<7} {result['case']:<22} {old['wall_median']:9.3f}s -> "
+                f"{result['wall_median']:9.3f}s  x{ratio:5.2f}")
+        if old['peak_rss'] and result['peak_rss']:
+            line += f"  rss x{result['peak_rss'] / old['peak_rss']:5.2f}"
+        lines.append(line)
+    return lines
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="pdf_benchmark", description="Benchmark PDF Toolbox operations.")
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=["small"],
+                        help="Corpus sizes to run (default: small)")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES),
+                        help="Cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Runs per case; the median is reported (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds allowed per run")
+    parser.add_argument("--corpus", default=os.path.join(cache_root(), "benchmark_corpus"),
+                        help="Directory of the generated corpus, reused between runs")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--list", action="store_true", help="List the cases and tiers and exit")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.list:
+        print("Cases: " + ", ".join(CASES))
+        for name, tier in TIERS.items():
+            print(f"Tier {name}: {tier}")
+        return 0
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    results = run_benchmarks(args.tiers, args.cases, args.corpus, max(args.repeat, 1), args.timeout,
+                             report=lambda result: print(describe(result), flush=True))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if baseline is not None:
+        print(f"\nCompared with {args.compare} ({baseline.get('created', 'unknown date')}):")
+        for line in compare(baseline, results) or ["No case and tier measured in both runs."]:
+            print(line)
+    return 1 if any('error' in result for result in results['results']) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Command-line entry point for running PDF Toolbox operations without the GUI.
+
+Examples:
+    python pdf_toolbox.py encrypt "in/*.pdf" -o "out/{stem}.enc.pdf" --user-password secret --jobs 32
+    python pdf_toolbox.py split report.pdf -o "parts/{stem}_{part}.pdf" --mode every_n --n 10
+    python pdf_toolbox.py merge -o merged.pdf a.pdf b.pdf c.pdf
+    python pdf_toolbox.py ocr "scans/*.pdf" -o "searchable/{stem}.pdf" --lang deu
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+import pdf_operations as ops
+from page_ranges import PAGE_SYNTAX_HELP
+from profiling import configure_from_environment, tracer
+from progress import Progress
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="pdf_toolbox", description="Headless PDF Toolbox operations.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, help_text, template_help="Output path template, e.g. 'out/{stem}.pdf'", output_required=True):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("inputs", nargs="+", help="Input PDF files or glob patterns")
+        sub.add_argument("-o", "--output", required=output_required, help=template_help)
+        sub.add_argument("-j", "--jobs", type=int, default=ops.default_jobs(),
+                         help="Number of worker processes (default: all cores)")
+        add_progress_option(sub)
+        return sub
+
+    def add_progress_option(sub):
+        sub.add_argument("--progress-json", action="store_true",
+                         help="Print progress, per-file results and a summary as JSON lines instead of text")
+
+    merge = subparsers.add_parser("merge", help="Merge inputs into one PDF, in the given order")
+    merge.add_argument("inputs", nargs="+", help="Input PDF files or glob patterns")
+    merge.add_argument("-o", "--output", required=True, help="Merged output file")
+    merge.add_argument("--no-dedupe", action="store_true",
+                       help="Keep every input's copy of shared fonts, images and color profiles")
+    add_progress_option(merge)
+
+    def add_incremental_options(sub):
+        sub.add_argument("--incremental", action="store_true",
+                         help="Append an incremental update instead of rewriting the whole file")
+        sub.add_argument("--in-place", action="store_true",
+                         help="Append the update to the input files themselves (implies --incremental, no -o)")
+
+    delete = add_command("delete", "Delete pages", output_required=False)
+    add_incremental_options(delete)
+    delete.add_argument("--pages", required=True, help=f"Pages to delete, {PAGE_SYNTAX_HELP}")
+
+    rotate = add_command("rotate", "Rotate pages", output_required=False)
+    add_incremental_options(rotate)
+    rotate.add_argument("--angle", type=int, choices=(90, 180, 270), default=90)
+    rotate.add_argument("--pages", default="", help=f"Pages to rotate (default: all), {PAGE_SYNTAX_HELP}")
+
+    split = add_command("split", "Split into several files",
+                        "Output path template per part, e.g. 'out/{stem}_{part}.pdf' ({start}, {end} and the "
+                        "bookmark {title} also available)")
+    split.add_argument("--mode", choices=ops.SPLIT_MODES, default="range")
+    split.add_argument("--start", type=int, help="First page for --mode range")
+    split.add_argument("--end", type=int, help="Last page for --mode range")
+    split.add_argument("--n", type=int, help="N for --mode every_n / equal_n")
+    split.add_argument("--depth", type=int, default=1,
+                       help="Outline levels to split at for --mode bookmarks (default: 1, 0 for all levels)")
+
+    encrypt = add_command("encrypt", "Encrypt with a password")
+    encrypt.add_argument("--user-password", required=True)
+    encrypt.add_argument("--owner-password")
+    encrypt.add_argument("--no-print", action="store_true", help="Disallow printing")
+    encrypt.add_argument("--no-copy", action="store_true", help="Disallow copying")
+    encrypt.add_argument("--no-edit", action="store_true", help="Disallow editing")
+
+    decrypt = add_command("decrypt", "Remove password protection")
+    decrypt.add_argument("--password", action="append", default=[],
+                         help="Candidate password; repeat to try several")
+    decrypt.add_argument("--password-file", help="File with one candidate password per line")
+
+    metadata = add_command("metadata", "Set Info dictionary entries", output_required=False)
+    for key in ops.METADATA_KEYS:
+        metadata.add_argument(f"--{key}", help=f"New {key} (left unchanged when omitted)")
+    add_incremental_options(metadata)
+    metadata.add_argument("--template", action="store_true",
+                          help="Expand {stem}, {name}, {index} and the current {title}/{author}/... in the values")
+
+    ocr = add_command("ocr", "Add an invisible OCR text layer to scanned pages")
+    ocr.add_argument("--lang", help="Tesseract language(s), e.g. 'eng' or 'deu+eng'")
+    ocr.add_argument("--dpi", type=int, default=None, help="Resolution to recognize at (default: 300)")
+    ocr.add_argument("--force", action="store_true", help="OCR pages that already have a text layer too")
+    ocr.add_argument("--no-cache", action="store_true", help="Do not reuse or store results in the OCR cache")
+
+    return parser
+
+
+def operation_options(args) -> dict:
+    if args.command == "delete":
+        return {'pages': args.pages, 'incremental': args.incremental or args.in_place}
+    if args.command == "rotate":
+        return {'angle': args.angle, 'pages': args.pages, 'incremental': args.incremental or args.in_place}
+    if args.command == "split":
+        return {'mode': args.mode, 'start': args.start, 'end': args.end, 'n': args.n, 'depth': args.depth}
+    if args.command == "encrypt":
+        return {
+            'user_password': args.user_password,
+            'owner_password': args.owner_password,
+            'allow_print': not args.no_print,
+            'allow_copy': not args.no_copy,
+            'allow_edit': not args.no_edit,
+        }
+    if args.command == "decrypt":
+        passwords = list(args.password)
+        if args.password_file:
+            with open(args.password_file, encoding='utf-8') as f:
+                passwords.extend(line.rstrip('\r\n') for line in f if line.rstrip('\r\n'))
+        return {'passwords': passwords}
+    if args.command == "ocr":
+        # Imported here: preprocessing brings in fitz, NumPy and Pillow, which no other command needs
+        from ocr_preprocess import Preprocessing
+        return {
+            'lang': args.lang,
+            'preprocessing': Preprocessing() if args.dpi is None else Preprocessing(dpi=args.dpi),
+            'force': args.force,
+            'use_cache': not args.no_cache,
+        }
+    if args.command == "metadata":
+        return {
+            'metadata': {key: getattr(args, key) for key in ops.METADATA_KEYS if getattr(args, key) is not None},
+            'incremental': args.incremental or args.in_place,
+            'templated': args.template,
+        }
+    return {}
+
+
+def emit_event(event: dict):
+    print(json.dumps(event), flush=True)
+
+
+def result_event(result: ops.BatchResult) -> dict:
+    snapshot = result.progress
+    return {
+        'event': "file",
+        'input': result.input_path,
+        'ok': result.ok,
+        'outputs': result.outputs,
+        'error': result.error,
+        'elapsed': round(result.elapsed, 3),
+        'pages': snapshot.pages if snapshot else 0,
+        'bytes': snapshot.bytes if snapshot else 0,
+        'stages': {name: round(seconds, 4) for name, seconds in snapshot.stages.items()} if snapshot else {},
+        'detail': result.detail,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # PDFTOOLBOX_TRACE=trace.json records the run for a bug report (see profiling.py)
+    configure_from_environment()
+    with tracer.job(args.command):  # not the arguments, which may hold passwords
+        return run_command(args)
+
+
+def run_command(args: argparse.Namespace) -> int:
+    inputs = ops.expand_inputs(args.inputs)
+    if not inputs:
+        print("No input files matched.", file=sys.stderr)
+        return 2
+    # Progress events go to stdout as JSON lines, at most one per second
+    listener = (lambda snapshot: emit_event(snapshot.to_event())) if args.progress_json else None
+    progress = Progress(args.command, listener=listener, interval=1.0)
+
+    if args.command == "merge":
+        try:
+            _output, stats = ops.merge_pdfs(inputs, args.output, dedupe=not args.no_dedupe, progress=progress)
+        except Exception as e:
+            print(f"ERROR merging PDFs: {e}", file=sys.stderr)
+            return 1
+        if args.progress_json:
+            emit_event({**progress.finish().to_event("done"), 'output': args.output, **stats})
+            return 0
+        print(f"OK merged {len(inputs)} files -> {args.output} ({stats['pages']} pages, "
+              f"{stats['duplicates']} duplicate resources shared, {ops.format_size(stats['saved'])} saved)")
+        return 0
+
+    options = operation_options(args)
+    in_place = getattr(args, 'in_place', False)
+    if bool(args.output) == in_place:
+        print("Please give either -o/--output or --in-place.", file=sys.stderr)
+        return 2
+    if args.command == "decrypt" and not options['passwords']:
+        print("Please give --password or --password-file.", file=sys.stderr)
+        return 2
+
+    failures = 0
+    output_template = None if in_place else args.output
+    if args.command in ("split", "ocr") and len(inputs) == 1:
+        # A single document: spread its parts or pages over the workers instead of the files
+        options['jobs'] = args.jobs
+        args.jobs = 1
+    for result in ops.run_batch(args.command, inputs, output_template, args.jobs, options, progress=progress):
+        if not result.ok:
+            failures += 1
+        if args.progress_json:
+            emit_event(result_event(result))
+        elif result.ok:
+            print(f"OK {result.input_path} -> {', '.join(result.outputs)} ({result.elapsed:.2f}s"
+                  f"{', ' + result.describe_detail() if result.detail else ''})")
+        else:
+            print(f"ERROR {result.input_path}: {result.error}", file=sys.stderr)
+    if args.progress_json:
+        emit_event({**progress.finish().to_event("done"), 'failed': failures})
+    else:
+        summary = progress.snapshot(finished=True)
+        details = "; ".join(part for part in (summary.describe(), summary.describe_stages()) if part)
+        print(f"{len(inputs) - failures}/{len(inputs)} files processed" + (f" ({details})" if details else ""),
+              file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
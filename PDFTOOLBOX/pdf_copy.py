@@ -0,0 +1,627 @@
+"""Copy pages between PDFs by serializing the source objects directly.
+
+PageCopier writes page ranges of one document to new files. It keeps the source object numbers in
+every file it writes, so an object shared by many pages (an embedded font, a logo image, a form
+XObject) serializes to the same bytes in each output. Those bytes are cached across files:
+splitting a report into one file per page encodes each font once instead of once per part.
+
+StreamingMerger appends whole documents to one output file, writing each input's objects as soon
+as they are read and closing the input before the next one is opened. Objects are fingerprinted
+by content from the bottom up, so a font, logo or ICC profile repeated across inputs is written
+once and shared by all of them.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from io import BytesIO
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (ArrayObject, ByteStringObject, DictionaryObject, IndirectObject, NameObject, NullObject,
+                            NumberObject, PdfObject, StreamObject, TextStringObject)
+
+from pdf_incremental import object_count, xref_subsections
+from pdf_pages import PageIndex
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# How many levels of references below an object are followed to fingerprint it when merging
+_FINGERPRINT_DEPTH = 16
+
+# Form entries carried over from the first input that has them; the /Fields of all inputs are joined
+_FORM_KEYS = ("/DA", "/DR", "/Q", "/SigFlags", "/NeedAppearances")
+
+
+def _destination_key(value) -> Optional[Tuple[str, object]]:
+    """Key of a named destination: names (/Dests dictionary) and strings (/Names tree) are separate."""
+    if isinstance(value, NameObject):
+        return "name", str(value)
+    if isinstance(value, ByteStringObject):
+        return "string", bytes(value)
+    if isinstance(value, TextStringObject):
+        try:
+            return "string", value.get_original_bytes()
+        except Exception:
+            return "string", str(value).encode("utf-8")
+    return None
+
+
+def _tree_items(node, key: str, depth: int = 0) -> Iterator[Tuple[object, object]]:
+    """(key, raw value) pairs of a name tree (key '/Names') or number tree (key '/Nums')."""
+    node = node.get_object() if node is not None else None
+    if not isinstance(node, DictionaryObject) or depth > 32:
+        return
+    if key in node:
+        entries = node[key]  # array items stay unresolved references
+        for i in range(0, len(entries) - 1, 2):
+            yield entries[i], entries[i + 1]
+    for kid in node.get("/Kids", []):
+        yield from _tree_items(kid, key, depth + 1)
+
+
+class _PdfFile:
+    """An output PDF written one object at a time and finished with a classic xref table."""
+
+    def __init__(self, output_path: str, header: bytes = b"%PDF-1.7"):
+        self._out = open(output_path, 'wb')
+        self._out.write(header + b"\n%\xe2\xe3\xcf\xd3\n")
+        self._offsets: Dict[int, Tuple[int, int]] = {}
+
+    def write_object(self, num: int, gen: int, body: bytes):
+        self._offsets[num] = (self._out.tell(), gen)
+        self._out.write(b"%d %d obj\n" % (num, gen))
+        self._out.write(body)
+        self._out.write(b"\nendobj\n")
+
+    def finish(self, root_num: int, size: int):
+        out = self._out
+        xref_offset = out.tell()
+        out.write(b"xref\n0 1\n0000000000 65535 f\r\n")
+        for run in xref_subsections(sorted(self._offsets.items())):
+            out.write(b"%d %d\n" % (run[0][0], len(run)))
+            for _num, (offset, gen) in run:
+                out.write(b"%010d %05d n\r\n" % (offset, gen))
+        out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, root_num, xref_offset))
+        out.close()
+
+    def close(self):
+        self._out.close()
+
+
+class _ObjectSerializer:
+    """Serialize the objects of one source document, collecting the references each one makes.
+
+    References to page tree nodes, and to pages that are not being copied, are written as null so
+    a stray link cannot drag the rest of the document along.
+    """
+
+    def __init__(self, reader: PdfReader):
+        self.reader = reader
+        self.index = PageIndex.of(reader)
+        self.tree_numbers: Set[int] = self.index.node_numbers | {ref.idnum for ref in self.index.refs}
+
+    def ref_id(self, ref: IndirectObject) -> Tuple[int, int]:
+        """Object and generation number ref is written as in the output."""
+        return ref.idnum, ref.generation
+
+    def page_body(self, number: int, parent_num: int, included: Set[int]) -> Tuple[bytes, List[IndirectObject]]:
+        # Pages get a new /Parent, so attributes they inherited from the source tree are written
+        # into the page itself
+        page = self.reader.get_object(self.index.refs[number])
+        entries = [(key, page.raw_get(key)) for key in page if key != "/Parent"]
+        entries.extend(self.index.inherited(number).items())
+        buf = BytesIO()
+        refs: List[IndirectObject] = []
+        buf.write(b"<<\n/Parent %d 0 R\n" % parent_num)
+        for key, value in entries:
+            NameObject(key).write_to_stream(buf, None)
+            buf.write(b" ")
+            self._write(value, buf, refs, included)
+            buf.write(b"\n")
+        buf.write(b">>")
+        return buf.getvalue(), refs
+
+    def object_body(self, ref: IndirectObject, included: Set[int],
+                    overrides: Optional[Dict[str, Optional[bytes]]] = None) -> Tuple[bytes, List[IndirectObject], bool]:
+        """Serialize the object ref points to as (bytes, references, whether the bytes depend on included).
+
+        overrides replaces entries of a dictionary with ready-made bytes, or drops them when None.
+        """
+        buf = BytesIO()
+        refs: List[IndirectObject] = []
+        obj = self.reader.get_object(ref)
+        if overrides and isinstance(obj, DictionaryObject) and not isinstance(obj, StreamObject):
+            buf.write(b"<<\n")
+            part_dependent = self._write_entries(obj, buf, refs, included, skip=overrides)
+            for key, value in overrides.items():
+                if value is not None:
+                    buf.write(b"%s %s\n" % (key.encode("latin-1"), value))
+            buf.write(b">>")
+        else:
+            part_dependent = self._write(obj, buf, refs, included)
+        return buf.getvalue(), refs, part_dependent
+
+    def _write(self, obj, buf, refs: List[IndirectObject], included: Set[int]) -> bool:
+        """Serialize obj into buf, collecting the references it makes; True if the bytes depend on included."""
+        if isinstance(obj, IndirectObject):
+            if obj.idnum in self.tree_numbers and obj.idnum not in included:
+                buf.write(b"null")
+                return True
+            if self.reader.get_object(obj) is None:
+                buf.write(b"null")
+                return False
+            refs.append(obj)
+            buf.write(b"%d %d R" % self.ref_id(obj))
+            return obj.idnum in self.tree_numbers
+        if isinstance(obj, StreamObject):
+            buf.write(b"<<\n")
+            part_dependent = self._write_entries(obj, buf, refs, included, skip=("/Length",))
+            # The encoded data is copied as is: nothing is decompressed or re-encoded
+            data = obj._data
+            buf.write(b"/Length %d\n>>\nstream\n" % len(data))
+            buf.write(data)
+            buf.write(b"\nendstream")
+            return part_dependent
+        if isinstance(obj, DictionaryObject):
+            buf.write(b"<<\n")
+            part_dependent = self._write_entries(obj, buf, refs, included)
+            buf.write(b">>")
+            return part_dependent
+        if isinstance(obj, ArrayObject):
+            part_dependent = False
+            buf.write(b"[")
+            for item in obj:
+                buf.write(b" ")
+                part_dependent |= self._write(item, buf, refs, included)
+            buf.write(b" ]")
+            return part_dependent
+        (obj if obj is not None else NullObject()).write_to_stream(buf, None)
+        return False
+
+    def _write_entries(self, obj: DictionaryObject, buf, refs, included, skip=()) -> bool:
+        part_dependent = False
+        for key in obj:
+            if key in skip:
+                continue
+            key.write_to_stream(buf, None)
+            buf.write(b" ")
+            part_dependent |= self._write(obj.raw_get(key), buf, refs, included)
+            buf.write(b"\n")
+        return part_dependent
+
+
+class PageCopier(_ObjectSerializer):
+    """Write runs of pages from reader into standalone PDFs, reusing serialized objects between them.
+
+    Objects that do not point at a page are cached by object number up to cache_bytes; references
+    to pages outside the file being written (links, annotation owners) are written as null.
+    """
+
+    def __init__(self, reader: PdfReader, cache_bytes: int = DEFAULT_CACHE_BYTES):
+        super().__init__(reader)
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[int, Tuple[bytes, List[IndirectObject]]]" = OrderedDict()
+        self._cached_bytes = 0
+        self._next_number = object_count(reader)
+        self._header = reader.pdf_header.encode("latin-1") if reader.pdf_header else b"%PDF-1.7"
+
+    def write_pages(self, first: int, stop: int, output_path: str) -> str:
+        """Write the 0-based pages first..stop-1 to output_path."""
+        page_refs = self.index.refs[first:stop]
+        part_pages = {ref.idnum for ref in page_refs}
+        catalog_num, pages_num = self._next_number, self._next_number + 1
+        output = _PdfFile(output_path, self._header)
+        try:
+            seen = set(part_pages)
+            pending: List[IndirectObject] = []
+
+            def emit(ref, body, refs):
+                output.write_object(ref.idnum, ref.generation, body)
+                for child in refs:
+                    if child.idnum not in seen:
+                        seen.add(child.idnum)
+                        pending.append(child)
+
+            for number in range(first, stop):
+                emit(self.index.refs[number], *self.page_body(number, pages_num, part_pages))
+            while pending:
+                ref = pending.pop()
+                emit(ref, *self._cached_body(ref, part_pages))
+
+            kids = b" ".join(b"%d %d R" % (ref.idnum, ref.generation) for ref in page_refs)
+            output.write_object(pages_num, 0, b"<< /Type /Pages /Kids [ %s ] /Count %d >>" % (kids, len(page_refs)))
+            output.write_object(catalog_num, 0, b"<< /Type /Catalog /Pages %d 0 R >>" % pages_num)
+            output.finish(catalog_num, pages_num + 1)
+        except BaseException:
+            output.close()
+            raise
+        return output_path
+
+    def _cached_body(self, ref: IndirectObject, part_pages: Set[int]) -> Tuple[bytes, List[IndirectObject]]:
+        cached = self._cache.get(ref.idnum)
+        if cached is not None:
+            self._cache.move_to_end(ref.idnum)
+            return cached
+        body, refs, part_dependent = self.object_body(ref, part_pages)
+        if not part_dependent and len(body) <= self.cache_bytes:
+            self._cache[ref.idnum] = (body, refs)
+            self._cached_bytes += len(body)
+            while self._cached_bytes > self.cache_bytes:
+                _num, (data, _refs) = self._cache.popitem(last=False)
+                self._cached_bytes -= len(data)
+        return body, refs
+
+
+class _RenumberedSource(_ObjectSerializer):
+    """A source document whose objects get fresh numbers in a shared output.
+
+    With a shared_objects table, objects are numbered bottom-up by content: an object whose bytes,
+    with its references already renumbered this way, match an object written earlier (by this or
+    an earlier input) gets that object's number and is not written again.
+    """
+
+    def __init__(self, reader: PdfReader, allocate: Callable[[], int], shared_objects: Optional[Dict[bytes, int]] = None):
+        super().__init__(reader)
+        self._allocate = allocate
+        self._numbers: Dict[int, int] = {}
+        self._shared_objects = shared_objects
+        self._shared: Set[int] = set()
+        self._in_progress: Set[int] = set()
+        # Bodies serialized while numbering, kept until the object itself is written
+        self._bodies: Dict[int, Tuple[bytes, List[IndirectObject]]] = {}
+        self._duplicates: Set[int] = set()
+        self.bytes_saved = 0
+        # Named destinations that clash with another input's and are written under a new name
+        self.renamed_destinations: Dict[Tuple[str, object], PdfObject] = {}
+
+    def ref_id(self, ref: IndirectObject) -> Tuple[int, int]:
+        return self.number(ref), 0
+
+    def number(self, ref: IndirectObject) -> int:
+        num = self._numbers.get(ref.idnum)
+        if num is None:
+            if ref.idnum in self._in_progress:
+                # A reference cycle: the object cannot be fingerprinted, so it gets its own number
+                num = self._allocate()
+            else:
+                num = self._shared_number(ref)
+                num = self._numbers.get(ref.idnum, num)
+                if num is None:
+                    num = self._allocate()
+            self._numbers[ref.idnum] = num
+        return num
+
+    def _shared_number(self, ref: IndirectObject) -> Optional[int]:
+        if (self._shared_objects is None or ref.idnum in self.tree_numbers
+                or len(self._in_progress) >= _FINGERPRINT_DEPTH):
+            return None
+        self._in_progress.add(ref.idnum)
+        try:
+            # Serializing numbers the referenced objects first, so their shared numbers are in body
+            body, refs, part_dependent = self.object_body(ref, set())
+        finally:
+            self._in_progress.discard(ref.idnum)
+        if part_dependent or ref.idnum in self._numbers:
+            return None
+        if any(child.idnum not in self._shared for child in refs):
+            self._bodies[ref.idnum] = (body, refs)
+            return None
+        digest = hashlib.sha256(body).digest()
+        self._shared.add(ref.idnum)
+        num = self._shared_objects.get(digest)
+        if num is not None:
+            self._duplicates.add(ref.idnum)
+            self.bytes_saved += len(body)
+            return num
+        num = self._shared_objects[digest] = self._allocate()
+        self._bodies[ref.idnum] = (body, refs)
+        return num
+
+    @property
+    def duplicates(self) -> int:
+        return len(self._duplicates)
+
+    def is_duplicate(self, ref: IndirectObject) -> bool:
+        """Whether ref shares an object that was already written."""
+        return ref.idnum in self._duplicates
+
+    def take_body(self, ref: IndirectObject, included: Set[int]) -> Tuple[bytes, List[IndirectObject]]:
+        stored = self._bodies.pop(ref.idnum, None)
+        if stored is not None:
+            return stored
+        body, refs, _part_dependent = self.object_body(ref, included)
+        return body, refs
+
+    def alias(self, ref: IndirectObject, num: int):
+        """Write references to ref as references to the output object num."""
+        self._numbers[ref.idnum] = num
+
+    def serialize(self, value, included: Set[int]) -> Tuple[bytes, List[IndirectObject]]:
+        """Bytes of a raw value as written in the output, with the references it makes."""
+        buf = BytesIO()
+        refs: List[IndirectObject] = []
+        self._write(value, buf, refs, included)
+        return buf.getvalue(), refs
+
+    def _write_entries(self, obj: DictionaryObject, buf, refs, included, skip=()) -> bool:
+        # Links, bookmarks and GoTo actions follow renamed destinations; GoToR names another file's
+        if self.renamed_destinations:
+            key = "/Dest" if "/Dest" in obj else "/D" if "/D" in obj and obj.get("/S") == "/GoTo" else None
+            renamed = self.renamed_destinations.get(_destination_key(obj.raw_get(key))) if key else None
+            if renamed is not None:
+                copy = DictionaryObject({name: obj.raw_get(name) for name in obj})
+                copy[NameObject(key)] = renamed
+                obj = copy
+        return super()._write_entries(obj, buf, refs, included, skip)
+
+
+class StreamingMerger:
+    """Append documents to one output PDF, writing every input's objects as they are read.
+
+    Only one input is open at a time and nothing but object offsets, page numbers and the small
+    document-level tables is kept once an input is done, so memory and file handles stay flat
+    however many files are merged. The bookmarks of all inputs are chained into one outline, as
+    PdfMerger does. Named destinations, page labels and form fields are merged into one catalog;
+    a destination name already used by an earlier input gets the input's number as a prefix, and
+    the links, bookmarks and actions of that input are rewritten to match.
+
+    With dedupe, objects with the same content (after their references are deduplicated) are
+    written once; duplicates and bytes_saved count what was left out.
+    """
+
+    _PAGES_NUM, _CATALOG_NUM = 1, 2
+
+    def __init__(self, output_path: str, dedupe: bool = True):
+        self.output_path = output_path
+        self._output = _PdfFile(output_path)
+        # Content digest -> output object number of every shareable object written so far
+        self._shared_objects: Optional[Dict[bytes, int]] = {} if dedupe else None
+        self.pages = 0
+        self.duplicates = 0
+        self.bytes_saved = 0
+        self._next_num = 3
+        self._page_nums: List[int] = []
+        self._outline_num: Optional[int] = None
+        self._outline_first: Optional[int] = None
+        self._outline_last: Optional[int] = None
+        self._outline_count = 0
+        # The last top-level bookmark written so far still needs the /Next of the following input
+        self._unlinked_bookmark: Optional[bytes] = None
+        self._inputs = 0
+        # Destination key (see _destination_key) -> (name as written, destination as written)
+        self._destinations: Dict[Tuple[str, object], Tuple[bytes, bytes]] = {}
+        # (first page, label dictionary) of every input, None for inputs without page labels
+        self._page_labels: List[Tuple[int, Optional[bytes]]] = []
+        self._form_fields: List[bytes] = []
+        self._form_entries: Dict[str, bytes] = {}
+        self._lang: Optional[bytes] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._output.close()
+            os.remove(self.output_path)
+
+    def _allocate(self) -> int:
+        num = self._next_num
+        self._next_num += 1
+        return num
+
+    def append(self, input_path: str) -> int:
+        """Copy every page and bookmark of input_path; returns the number of pages added."""
+        with open(input_path, 'rb') as input_file:
+            reader = PdfReader(input_file)
+            if reader.is_encrypted and not reader.decrypt(""):
+                raise ValueError(f"{os.path.basename(input_path)} is password protected; decrypt it first.")
+            source = _RenumberedSource(reader, self._allocate, self._shared_objects)
+            included = {ref.idnum for ref in source.index.refs}
+            seen = set(included)
+            pending: List[IndirectObject] = []
+            self._inputs += 1
+
+            def follow(refs):
+                for child in refs:
+                    if child.idnum not in seen:
+                        seen.add(child.idnum)
+                        pending.append(child)
+
+            def drain():
+                while pending:
+                    ref = pending.pop()
+                    if source.is_duplicate(ref):
+                        continue
+                    body, refs = source.take_body(ref, included)
+                    self._output.write_object(source.number(ref), 0, body)
+                    follow(refs)
+
+            # Names are settled first: pages carry the links that have to use the new ones
+            root = reader.trailer["/Root"]
+            self._copy_destinations(source, root, included, follow)
+            self._copy_document_entries(source, root, included, follow)
+            # Each page is written together with what it uses, so little is held at any time
+            for number, ref in enumerate(source.index.refs):
+                num = source.number(ref)
+                self._page_nums.append(num)
+                body, refs = source.page_body(number, self._PAGES_NUM, included)
+                self._output.write_object(num, 0, body)
+                follow(refs)
+                drain()
+            self._copy_outline(source, included, seen, follow)
+            drain()
+            self.pages += len(source.index.refs)
+            self.duplicates += source.duplicates
+            self.bytes_saved += source.bytes_saved
+            return len(source.index.refs)
+
+    def _copy_outline(self, source: _RenumberedSource, included: Set[int], seen: Set[int], follow):
+        root = source.reader.trailer["/Root"]
+        if "/Outlines" not in root or "/First" not in root["/Outlines"]:
+            return
+        if self._outline_num is None:
+            self._outline_num = self._allocate()
+        outlines_ref = root.raw_get("/Outlines")
+        if isinstance(outlines_ref, IndirectObject):
+            source.alias(outlines_ref, self._outline_num)
+            seen.add(outlines_ref.idnum)
+
+        # Collect the bookmarks first so the traversal below does not copy them a second time
+        items: List[Tuple[IndirectObject, bool]] = []
+        stack = [(root["/Outlines"].raw_get("/First"), True)]
+        while stack:
+            ref, top_level = stack.pop()
+            if not isinstance(ref, IndirectObject) or ref.idnum in seen:
+                continue
+            seen.add(ref.idnum)
+            items.append((ref, top_level))
+            item = ref.get_object()
+            if "/Next" in item:
+                stack.append((item.raw_get("/Next"), top_level))
+            if "/First" in item:
+                stack.append((item.raw_get("/First"), False))
+
+        top_level_nums = [source.number(ref) for ref, top_level in items if top_level]
+        for ref, top_level in items:
+            item = ref.get_object()
+            num = source.number(ref)
+            overrides: Dict[str, Optional[bytes]] = {}
+            if top_level:
+                overrides["/Parent"] = b"%d 0 R" % self._outline_num
+                self._outline_count += 1 + max(int(item["/Count"]) if "/Count" in item else 0, 0)
+                if num == top_level_nums[0]:
+                    overrides["/Prev"] = b"%d 0 R" % self._outline_last if self._outline_last else None
+                    self._link_bookmark(num)
+                    if self._outline_first is None:
+                        self._outline_first = num
+                if num == top_level_nums[-1]:
+                    overrides["/Next"] = None
+            body, refs, _part_dependent = source.object_body(ref, included, overrides)
+            if top_level and num == top_level_nums[-1]:
+                self._outline_last, self._unlinked_bookmark = num, body
+            else:
+                self._output.write_object(num, 0, body)
+            follow(refs)
+
+    def _link_bookmark(self, next_num: Optional[int]):
+        """Write the held-back last top-level bookmark, pointing its /Next at next_num."""
+        if self._unlinked_bookmark is None:
+            return
+        body = self._unlinked_bookmark
+        if next_num is not None:
+            # object_body ends a dictionary with '>>', so the entry goes in front of it
+            body = body[:-2] + b"/Next %d 0 R\n>>" % next_num
+        self._output.write_object(self._outline_last, 0, body)
+        self._unlinked_bookmark = None
+
+    def _copy_destinations(self, source: _RenumberedSource, root: DictionaryObject, included: Set[int], follow):
+        entries = []
+        if "/Dests" in root and isinstance(root["/Dests"], DictionaryObject):
+            dests = root["/Dests"]
+            entries.extend((NameObject(name), dests.raw_get(name)) for name in dests)
+        if "/Names" in root and isinstance(root["/Names"], DictionaryObject) and "/Dests" in root["/Names"]:
+            entries.extend(_tree_items(root["/Names"].raw_get("/Dests"), "/Names"))
+        own = set()
+        for name, value in entries:
+            key = _destination_key(name)
+            if key is None or key in own:
+                continue
+            own.add(key)
+            if key in self._destinations:
+                name = self._unused_name(name)
+                source.renamed_destinations[key] = name
+                key = _destination_key(name)
+            body, refs = source.serialize(value, included)
+            buf = BytesIO()
+            name.write_to_stream(buf, None)
+            self._destinations[key] = (buf.getvalue(), body)
+            follow(refs)
+
+    def _unused_name(self, name):
+        # The input's number in front of the name, then a counter if that is taken too
+        for attempt in range(1, 1 << 16):
+            prefix = f"{self._inputs}_" if attempt == 1 else f"{self._inputs}.{attempt}_"
+            if isinstance(name, NameObject):
+                candidate = NameObject(f"/{prefix}{name[1:]}")
+            else:
+                candidate = ByteStringObject(prefix.encode("ascii") + _destination_key(name)[1])
+            if _destination_key(candidate) not in self._destinations:
+                return candidate
+        raise ValueError(f"Too many inputs share the destination name {name}.")
+
+    def _copy_document_entries(self, source: _RenumberedSource, root: DictionaryObject, included: Set[int], follow):
+        def serialize(value) -> bytes:
+            body, refs = source.serialize(value, included)
+            follow(refs)
+            return body
+
+        labels = [(int(start), value) for start, value in _tree_items(root.raw_get("/PageLabels"), "/Nums")
+                  if isinstance(start, NumberObject)] if "/PageLabels" in root else []
+        if labels and labels[0][0] != 0:
+            self._page_labels.append((self.pages, None))
+        self._page_labels.extend((self.pages + start, serialize(value)) for start, value in labels)
+        if not labels:
+            self._page_labels.append((self.pages, None))
+        if self._lang is None and "/Lang" in root:
+            self._lang = serialize(root.raw_get("/Lang"))
+        form = root["/AcroForm"] if "/AcroForm" in root else None
+        if isinstance(form, DictionaryObject):
+            self._form_fields.extend(serialize(field) for field in form.get("/Fields", []))
+            for key in _FORM_KEYS:
+                if key in form and key not in self._form_entries:
+                    self._form_entries[key] = serialize(form.raw_get(key))
+            if form.get("/NeedAppearances"):
+                self._form_entries["/NeedAppearances"] = b"true"
+
+    def close(self) -> str:
+        """Write the page tree, outline, catalog and xref; the output is complete afterwards."""
+        output = self._output
+        kids = b" ".join(b"%d 0 R" % num for num in self._page_nums)
+        output.write_object(self._PAGES_NUM, 0, b"<< /Type /Pages /Kids [ %s ] /Count %d >>" % (kids, len(self._page_nums)))
+        catalog = b"<< /Type /Catalog /Pages %d 0 R" % self._PAGES_NUM
+        if self._outline_num is not None:
+            self._link_bookmark(None)
+            if self._outline_first is not None:
+                outline = b"<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>" % (
+                    self._outline_first, self._outline_last, self._outline_count)
+            else:
+                outline = b"<< /Type /Outlines /Count 0 >>"
+            output.write_object(self._outline_num, 0, outline)
+            catalog += b" /Outlines %d 0 R" % self._outline_num
+        catalog += self._write_document_entries()
+        output.write_object(self._CATALOG_NUM, 0, catalog + b" >>")
+        output.finish(self._CATALOG_NUM, self._next_num)
+        return self.output_path
+
+    def _write_document_entries(self) -> bytes:
+        """Write the merged destinations, page labels and form; returns their catalog entries."""
+        output = self._output
+        entries = b""
+        for kind, catalog_entry in (("name", b" /Dests %d 0 R"), ("string", b" /Names << /Dests %d 0 R >>")):
+            rows = sorted((key[1], name, body) for key, (name, body) in self._destinations.items() if key[0] == kind)
+            if not rows:
+                continue
+            num = self._allocate()
+            if kind == "name":
+                body = b"<<\n%s\n>>" % b"\n".join(b"%s %s" % (name, dest) for _key, name, dest in rows)
+            else:
+                # A single leaf holds every name, in the byte order readers search them by
+                body = b"<< /Names [\n%s\n] >>" % b"\n".join(b"%s %s" % (name, dest) for _key, name, dest in rows)
+            output.write_object(num, 0, body)
+            entries += catalog_entry % num
+        if any(label is not None for _start, label in self._page_labels):
+            num = self._allocate()
+            nums = b"\n".join(b"%d %s" % (start, label or b"<< /S /D >>") for start, label in self._page_labels)
+            output.write_object(num, 0, b"<< /Nums [\n%s\n] >>" % nums)
+            entries += b" /PageLabels %d 0 R" % num
+        if self._form_fields or self._form_entries:
+            num = self._allocate()
+            form = b"<< /Fields [ %s ]" % b" ".join(self._form_fields)
+            form += b"".join(b" %s %s" % (key.encode("latin-1"), value) for key, value in self._form_entries.items())
+            output.write_object(num, 0, form + b" >>")
+            entries += b" /AcroForm %d 0 R" % num
+        if self._lang is not None:
+            entries += b" /Lang %s" % self._lang
+        return entries
@@ -0,0 +1,299 @@
+"""Incremental updates: append changed objects, a new xref section and trailer to an existing PDF.
+
+The original bytes are left untouched, so the cost of a save depends on what changed rather than on
+the size of the document.
+"""
+import os
+import re
+import shutil
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, PdfObject
+
+from page_ranges import PageRangeSet
+from pdf_pages import INHERITABLE_KEYS
+
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+
+# Trailer keys that describe the previous xref section itself and must not be carried over
+_SECTION_KEYS = {"/Prev", "/XRefStm", "/Type", "/W", "/Index", "/Length", "/Filter", "/DecodeParms", "/Size"}
+
+
+def object_count(reader: PdfReader) -> int:
+    """The /Size a new xref section must cover: one past the highest object number in use."""
+    # PyPDF2 drops /Size from trailers read out of xref streams, so also count the entries
+    numbers = [num for entries in reader.xref.values() for num in entries]
+    numbers.extend(reader.xref_objStm)
+    return max([int(reader.trailer.get("/Size", 0))] + [num + 1 for num in numbers])
+
+
+def xref_subsections(rows):
+    """Group rows sorted by object number (first item) into runs of consecutive numbers."""
+    run = []
+    for row in rows:
+        if run and row[0] != run[-1][0] + 1:
+            yield run
+            run = []
+        run.append(row)
+    if run:
+        yield run
+
+
+class UnsupportedUpdate(ValueError):
+    """The file cannot be updated incrementally (encrypted, damaged xref, unusual page tree)."""
+
+
+class IncrementalUpdate:
+    """Collect object changes for one PDF and append them as a single update section.
+
+    Use as a context manager; the source is read through an open file handle so only the xref
+    tables and the objects that are actually touched get parsed.
+    """
+
+    def __init__(self, input_path: str):
+        self.input_path = input_path
+        self._file = open(input_path, 'rb')
+        try:
+            self.reader = PdfReader(self._file)
+            if self.reader.is_encrypted:
+                raise UnsupportedUpdate("Incremental updates are not supported for encrypted PDFs.")
+            self._startxref, self._xref_is_stream = self._find_last_xref()
+        except Exception:
+            self._file.close()
+            raise
+        self._objects: Dict[int, Tuple[int, Optional[PdfObject]]] = {}
+        self._size = object_count(self.reader)
+        self._trailer_updates: Dict[str, PdfObject] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _find_last_xref(self) -> Tuple[int, bool]:
+        self._file.seek(0, os.SEEK_END)
+        file_size = self._file.tell()
+        self._file.seek(max(file_size - 4096, 0))
+        matches = _STARTXREF_RE.findall(self._file.read())
+        if not matches:
+            raise UnsupportedUpdate("Could not find the cross-reference section.")
+        offset = int(matches[-1])
+        self._file.seek(offset)
+        head = self._file.read(32).lstrip()
+        if head.startswith(b"xref"):
+            return offset, False
+        if re.match(rb"\d+\s+\d+\s+obj", head):
+            return offset, True
+        raise UnsupportedUpdate("The cross-reference offset is damaged; a full rewrite is needed.")
+
+    # Recording changes
+    def update(self, ref: IndirectObject, obj: PdfObject):
+        """Replace the object ref points to."""
+        self._objects[ref.idnum] = (ref.generation, obj)
+
+    def add(self, obj: PdfObject) -> IndirectObject:
+        """Add a new object and return a reference to it."""
+        num = self._size
+        self._size += 1
+        self._objects[num] = (0, obj)
+        return IndirectObject(num, 0, self.reader)
+
+    def free(self, ref: IndirectObject):
+        """Mark the object ref points to as deleted."""
+        self._objects[ref.idnum] = (ref.generation, None)
+
+    def set_trailer(self, key: str, value: PdfObject):
+        self._trailer_updates[key] = value
+
+    def get_object(self, ref: IndirectObject) -> PdfObject:
+        """The current version of an object, including changes recorded in this update."""
+        if ref.idnum in self._objects:
+            obj = self._objects[ref.idnum][1]
+            if obj is None:
+                raise UnsupportedUpdate(f"Object {ref.idnum} was deleted in this update.")
+            return obj
+        return self.reader.get_object(ref)
+
+    # Page tree editing
+    def _pages_root(self) -> IndirectObject:
+        root = self.reader.trailer["/Root"]
+        pages = root.raw_get("/Pages") if "/Pages" in root else None
+        if not isinstance(pages, IndirectObject):
+            raise UnsupportedUpdate("The page tree root is not an indirect object.")
+        return pages
+
+    def page_count(self) -> int:
+        return int(self.get_object(self._pages_root())["/Count"])
+
+    def _kids(self, node) -> List[IndirectObject]:
+        kids = node["/Kids"] if "/Kids" in node else []
+        if not all(isinstance(kid, IndirectObject) for kid in kids):
+            raise UnsupportedUpdate("The page tree contains direct page objects.")
+        return list(kids)
+
+    def walk_pages(self, pages: Optional[PageRangeSet] = None) -> Iterator[Tuple[int, IndirectObject, List[IndirectObject], dict]]:
+        """Yield (0-based index, page ref, ancestor node refs, inherited attributes) in document order.
+
+        With a selection of 1-based pages, only those pages are yielded and subtrees that contain
+        none of them are skipped using their /Count.
+        """
+        def wanted(first, count):
+            return pages is None or pages.intersects(first + 1, first + count)
+
+        visited = set()
+
+        def visit(ref, first, ancestors, inherited):
+            if ref.idnum in visited:
+                raise UnsupportedUpdate("The page tree contains a cycle.")
+            visited.add(ref.idnum)
+            node = self.get_object(ref)
+            if "/Kids" not in node:
+                yield first, ref, ancestors, inherited
+                return
+            inherited = dict(inherited)
+            for key in INHERITABLE_KEYS:
+                if key in node:
+                    inherited[key] = node.raw_get(key)
+            for kid in self._kids(node):
+                kid_node = self.get_object(kid)
+                count = int(kid_node["/Count"]) if "/Kids" in kid_node else 1
+                if count and wanted(first, count):
+                    yield from visit(kid, first, ancestors + [ref], inherited)
+                first += count
+
+        yield from visit(self._pages_root(), 0, [], {})
+
+    def rotate_pages(self, pages: PageRangeSet, angle: int):
+        """Turn the given 1-based pages clockwise by angle (a multiple of 90)."""
+        for _index, ref, _ancestors, inherited in self.walk_pages(pages):
+            page = DictionaryObject(self.get_object(ref))
+            current = page["/Rotate"] if "/Rotate" in page else inherited.get("/Rotate", NumberObject(0)).get_object()
+            page[NameObject("/Rotate")] = NumberObject((int(current) + angle) % 360)
+            self.update(ref, page)
+
+    def delete_pages(self, pages: PageRangeSet):
+        """Drop the given 1-based pages from the page tree and free their objects."""
+        removed: Dict[int, set] = {}
+        deleted_below: Dict[int, int] = {}
+        nodes: Dict[int, IndirectObject] = {}
+        parents: Dict[int, IndirectObject] = {}
+        for _index, ref, ancestors, _inherited in self.walk_pages(pages):
+            removed.setdefault(ancestors[-1].idnum, set()).add(ref.idnum)
+            for child, ancestor in zip(ancestors[1:] + [ref], ancestors):
+                parents[child.idnum] = ancestor
+                nodes[ancestor.idnum] = ancestor
+                deleted_below[ancestor.idnum] = deleted_below.get(ancestor.idnum, 0) + 1
+            self.free(ref)
+
+        root = self._pages_root()
+        # Deepest nodes first so emptied intermediate nodes can be removed from their parents
+        pending = sorted(nodes, key=lambda num: -self._depth(num, parents))
+        for num in pending:
+            ref = nodes[num]
+            node = DictionaryObject(self.get_object(ref))
+            if num in removed:
+                node[NameObject("/Kids")] = ArrayObject(kid for kid in self._kids(node) if kid.idnum not in removed[num])
+            node[NameObject("/Count")] = NumberObject(int(node["/Count"]) - deleted_below[num])
+            if not node["/Kids"] and num != root.idnum:
+                self.free(ref)
+                removed.setdefault(parents[num].idnum, set()).add(num)
+            else:
+                self.update(ref, node)
+
+    @staticmethod
+    def _depth(num, parents) -> int:
+        depth = 0
+        while num in parents:
+            num = parents[num].idnum
+            depth += 1
+        return depth
+
+    # Writing
+    def write(self, output_path: Optional[str] = None) -> str:
+        """Append the update to output_path (a copy of the input) or to the input itself when omitted."""
+        output_path = output_path or self.input_path
+        if os.path.abspath(output_path) != os.path.abspath(self.input_path):
+            shutil.copyfile(self.input_path, output_path)
+        with open(output_path, 'ab') as out:
+            base = out.tell()
+            buf = BytesIO()
+            buf.write(b"\n")
+            offsets = {}
+            for num in sorted(self._objects):
+                gen, obj = self._objects[num]
+                if obj is None:
+                    continue
+                offsets[num] = base + buf.tell()
+                buf.write(b"%d %d obj\n" % (num, gen))
+                obj.write_to_stream(buf, None)
+                buf.write(b"\nendobj\n")
+            xref_offset = base + buf.tell()
+            if self._xref_is_stream:
+                self._write_xref_stream(buf, offsets, xref_offset)
+            else:
+                self._write_xref_table(buf, offsets)
+            buf.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+            out.write(buf.getvalue())
+        return output_path
+
+    def _trailer(self) -> DictionaryObject:
+        trailer = DictionaryObject()
+        for key, value in self.reader.trailer.items():
+            if key not in _SECTION_KEYS:
+                trailer[NameObject(key)] = self.reader.trailer.raw_get(key)
+        for key, value in self._trailer_updates.items():
+            trailer[NameObject(key)] = value
+        trailer[NameObject("/Prev")] = NumberObject(self._startxref)
+        return trailer
+
+    def _entries(self, offsets):
+        """Yield (num, type, field2, field3) rows: type 1 is in use at an offset, type 0 is free."""
+        for num in sorted(self._objects):
+            gen, obj = self._objects[num]
+            if obj is None:
+                yield num, 0, 0, min(gen + 1, 65535)
+            else:
+                yield num, 1, offsets[num], gen
+
+    def _write_xref_table(self, buf, offsets):
+        # Start with the object 0 entry so readers do not take the table for a mis-indexed one
+        buf.write(b"xref\n0 1\n0000000000 65535 f\r\n")
+        for run in xref_subsections(self._entries(offsets)):
+            buf.write(b"%d %d\n" % (run[0][0], len(run)))
+            for _num, kind, field2, gen in run:
+                buf.write(b"%010d %05d %s\r\n" % (field2, gen, b"n" if kind else b"f"))
+        trailer = self._trailer()
+        trailer[NameObject("/Size")] = NumberObject(self._size)
+        buf.write(b"trailer\n")
+        trailer.write_to_stream(buf, None)
+        buf.write(b"\n")
+
+    def _write_xref_stream(self, buf, offsets, xref_offset):
+        # The xref stream is itself an object of this section
+        xref_num = self._size
+        rows = list(self._entries(offsets)) + [(xref_num, 1, xref_offset, 0)]
+        offset_width = max(4, (xref_offset.bit_length() + 7) // 8)
+        data = BytesIO()
+        index = ArrayObject()
+        for run in xref_subsections(rows):
+            index.extend([NumberObject(run[0][0]), NumberObject(len(run))])
+            for _num, kind, field2, field3 in run:
+                data.write(bytes([kind]) + field2.to_bytes(offset_width, "big") + field3.to_bytes(2, "big"))
+        data = data.getvalue()
+        stream_dict = self._trailer()
+        stream_dict[NameObject("/Type")] = NameObject("/XRef")
+        stream_dict[NameObject("/Size")] = NumberObject(xref_num + 1)
+        stream_dict[NameObject("/W")] = ArrayObject([NumberObject(1), NumberObject(offset_width), NumberObject(2)])
+        stream_dict[NameObject("/Index")] = index
+        stream_dict[NameObject("/Length")] = NumberObject(len(data))
+        buf.write(b"%d 0 obj\n" % xref_num)
+        stream_dict.write_to_stream(buf, None)
+        buf.write(b"\nstream\n")
+        buf.write(data)
+        buf.write(b"\nendstream\nendobj\n")
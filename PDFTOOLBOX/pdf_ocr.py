@@ -0,0 +1,419 @@
+"""Whole-document OCR as a render -> recognize pipeline.
+
+A thread renders pages into a bounded queue while Tesseract runs on a process pool, so rendering
+overlaps recognition, memory holds only a few rendered pages at a time, and results stream back
+as each page finishes rather than when the whole document is done.
+
+Each page is classified first. Born-digital pages already carry their text and are read from
+the text layer in microseconds; only scanned pages are rendered, and of those only the ones
+missing from the OCR cache (see ocr_cache) are sent to Tesseract. Scanned pages are rendered in
+grayscale and cleaned up by ocr_preprocess in the worker before recognition.
+
+iter_searchable/make_searchable use the recognized words to give scanned pages an invisible text
+layer, appended to a copy of the input in incremental updates as pages finish.
+"""
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+import fitz  # PyMuPDF
+import pytesseract
+
+from ocr_cache import OcrCache, ocr_cache_key
+from ocr_preprocess import Preprocessing, preprocess, preprocess_mapped, render_gray
+from paths import make_parent_dir
+from profiling import span
+from progress import WRITE, Progress
+
+# Page kinds returned by classify_page, also used as OcrPage.source
+TEXT_LAYER = "text"
+SCANNED = "ocr"
+BLANK = "blank"
+
+# Fewer characters than this is a page number or a stamp, not a text layer worth keeping
+MIN_TEXT_CHARS = 20
+# Share of undecodable characters beyond which a text layer is considered garbage
+MAX_UNDECODABLE = 0.1
+
+
+# Save the searchable output after this many pages got a text layer
+DEFAULT_SAVE_EVERY = 16
+
+# Embedded for words the built-in Helvetica cannot encode (it covers Windows-1252): Noto Sans when
+# the optional pymupdf-fonts package is installed, else PyMuPDF's own Droid Sans Fallback, which
+# also covers CJK but adds about 1.7 MB to the output, once
+UNICODE_FONTS = ("notos", "cjk")
+_unicode_fonts: Dict[str, Optional[fitz.Font]] = {}
+
+
+class OcrWord(NamedTuple):
+    text: str
+    x0: float  # start of the baseline, in points of the page as displayed
+    y0: float
+    x1: float  # end of the baseline
+    y1: float
+    height: float  # in points
+
+
+class OcrPage(NamedTuple):
+    page: int  # 0-based
+    text: str
+    elapsed: float  # seconds spent recognizing the page
+    source: str = SCANNED  # TEXT_LAYER, SCANNED or BLANK
+    cached: bool = False  # OCR text taken from the cache
+    words: Tuple[OcrWord, ...] = ()  # only for scanned pages, and only when words were asked for
+
+
+class _Settings(NamedTuple):
+    preprocessing: Preprocessing
+    lang: Optional[str]
+    config: str
+    words: bool
+
+    def cache_key(self, image, dpi: int) -> str:
+        return ocr_cache_key(image, dpi, self.lang, self.config,
+                             f"{self.preprocessing!r}{'|words' if self.words else ''}")
+
+
+def classify_page(page) -> str:
+    """Whether a fitz page has a usable text layer (TEXT_LAYER), needs OCR (SCANNED) or is BLANK.
+
+    Pages without fonts have no text at all and are decided by their images alone. Otherwise the
+    text has to be long enough, mostly decodable (fonts without a Unicode mapping extract as
+    U+FFFD) and, on a page covered by an image, cover more than a stamp would.
+    """
+    area = abs(page.rect) or 1.0
+    image_cover = min(sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info()) / area, 1.0)
+    if not page.get_fonts():
+        return SCANNED if image_cover > 0.1 else BLANK
+    blocks = [block for block in page.get_text("blocks") if block[6] == 0]
+    text = "".join(block[4] for block in blocks)
+    chars = len(text) - text.count(" ") - text.count("\n")
+    if text.count("\ufffd") > MAX_UNDECODABLE * max(chars, 1):
+        return SCANNED
+    if chars < MIN_TEXT_CHARS:
+        if image_cover > 0.1:
+            return SCANNED
+        return TEXT_LAYER if chars else BLANK
+    text_cover = sum(abs(fitz.Rect(block[:4]) & page.rect) for block in blocks) / area
+    if image_cover > 0.8 and text_cover < 0.05:
+        return SCANNED
+    return TEXT_LAYER
+
+
+def ocr_page(doc, number: int, preprocessing: Preprocessing = Preprocessing(), lang: Optional[str] = None,
+             config: str = "", force: bool = False, cache: Optional[OcrCache] = None,
+             words: bool = False, lock: Optional[threading.RLock] = None) -> OcrPage:
+    """Text of one page of an open fitz document: from its text layer when usable, else by OCR.
+
+    With words, scanned pages also come with the position of every recognized word. lock, the
+    lock of a shared document, is held while the page is read and rendered but not during OCR.
+    """
+    settings = _Settings(preprocessing, lang, config, words)
+    with lock or nullcontext():
+        item = _prepare(doc, number, settings, force, cache)
+    return item if isinstance(item, OcrPage) else _recognize(*item, settings, cache)
+
+
+def _prepare(doc, number: int, settings: _Settings, force: bool, cache: Optional[OcrCache]):
+    """The finished OcrPage when no OCR is needed, else (number, image, dpi, cache key)."""
+    page = doc.load_page(number)
+    kind = SCANNED if force else classify_page(page)
+    if kind != SCANNED:
+        return OcrPage(number, page.get_text() if kind == TEXT_LAYER else "", 0.0, kind)
+    with span("render for OCR", "fitz", page=number + 1):
+        image, dpi = render_gray(doc, number, settings.preprocessing)
+    key = settings.cache_key(image, dpi) if cache else None
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        return _from_cache(number, cached, settings.words)
+    return number, image, dpi, key
+
+
+def default_ocr_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def iter_ocr(input_path: str, pages: Optional[Iterable[int]] = None, jobs: Optional[int] = None,
+             preprocessing: Preprocessing = Preprocessing(), lang: Optional[str] = None, config: str = "",
+             force: bool = False, use_cache: bool = True, cache_path: Optional[str] = None,
+             words: bool = False) -> Iterator[OcrPage]:
+    """OCR the given 0-based pages (all when None), yielding each page as it finishes.
+
+    Pages with a usable text layer are read from it unless force is set. With use_cache, scanned
+    pages already recognized with the same settings come from the OCR cache at cache_path (the
+    per-user default when None) and new results are added to it. Pages come back in completion
+    order, not page order. Closing the generator early stops the rendering thread and drops the
+    pages that have not been started. jobs=1 recognizes on the calling thread without a pool,
+    for callers that already run one document per process.
+    """
+    jobs = max(1, jobs or default_ocr_jobs())
+    settings = _Settings(preprocessing, lang, config, words)
+    # Enough rendered pages to keep every worker busy while the next ones render, and no more
+    rendered = queue.Queue(maxsize=jobs * 2)
+    stop = threading.Event()
+    finished = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                rendered.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def render():
+        cache = OcrCache(cache_path) if use_cache else None
+        try:
+            with fitz.open(input_path) as doc:
+                for number in (range(doc.page_count) if pages is None else pages):
+                    if stop.is_set():
+                        return
+                    put(_prepare(doc, number, settings, force, cache))
+        except Exception as e:
+            put(e)
+        finally:
+            if cache:
+                cache.close()
+            put(finished)
+
+    threading.Thread(target=render, daemon=True).start()
+    if jobs == 1:
+        cache = OcrCache(cache_path) if use_cache else None
+        try:
+            while True:
+                item = rendered.get()
+                if item is finished:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item if isinstance(item, OcrPage) else _recognize(*item, settings, cache)
+        finally:
+            stop.set()
+            if cache:
+                cache.close()
+
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=_init_ocr_worker,
+                                   initargs=(cache_path if use_cache else None, use_cache))
+    try:
+        in_flight = set()
+        rendering = True
+        while rendering or in_flight:
+            # Hand rendered pages to idle workers; only block on the renderer when nothing is running
+            while rendering and len(in_flight) < jobs:
+                try:
+                    item = rendered.get(block=not in_flight)
+                except queue.Empty:
+                    break
+                if item is finished:
+                    rendering = False
+                elif isinstance(item, Exception):
+                    raise item
+                elif isinstance(item, OcrPage):
+                    yield item
+                else:
+                    in_flight.add(executor.submit(_recognize_in_worker, *item, settings))
+            if not in_flight:
+                continue
+            done, in_flight = wait(in_flight, timeout=0.05 if rendering else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_searchable(input_path: str, output_path: str, jobs: Optional[int] = None,
+                    save_every: int = DEFAULT_SAVE_EVERY, progress: Optional[Progress] = None,
+                    **ocr_options) -> Iterator[OcrPage]:
+    """Write a copy of input_path whose scanned pages carry an invisible OCR text layer.
+
+    Yields every page as it is processed (see iter_ocr for ocr_options). The copy is made first and
+    text layers are appended to it as incremental updates every save_every pages, so neither the
+    rendered pages nor the whole output are held in memory. The partial output is removed when
+    OCR fails or the generator is closed early. progress counts pages, with the recognition time of
+    each under the "ocr" stage.
+    """
+    if os.path.abspath(input_path) == os.path.abspath(output_path):
+        raise ValueError(f"Output path would overwrite the input file: {input_path}")
+    progress = progress or Progress()
+    make_parent_dir(output_path)
+    shutil.copyfile(input_path, output_path)
+    try:
+        with fitz.open(output_path) as doc:
+            if doc.needs_pass:
+                raise ValueError("The PDF is encrypted; decrypt it first.")
+            progress.expect(pages=doc.page_count)
+            incremental = doc.can_save_incrementally()
+            unsaved = 0
+            for result in iter_ocr(input_path, jobs=jobs, words=True, **ocr_options):
+                if result.words:
+                    add_text_layer(doc.load_page(result.page), result.words)
+                    unsaved += 1
+                    if incremental and unsaved >= save_every:
+                        with progress.stage(WRITE):
+                            doc.saveIncr()
+                        unsaved = 0
+                progress.add_stage_time("ocr", result.elapsed)
+                progress.advance(pages=1)
+                yield result
+            with progress.stage(WRITE):
+                if unsaved and incremental:
+                    doc.saveIncr()
+                elif unsaved:
+                    # A damaged file cannot take an update; rewrite it once at the end
+                    temp_path = f"{output_path}.{os.getpid()}.tmp"
+                    doc.save(temp_path, garbage=1)
+        if unsaved and not incremental:
+            os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+
+def make_searchable(input_path: str, output_path: str, jobs: Optional[int] = 1, progress: Optional[Progress] = None,
+                    **ocr_options) -> Tuple[str, dict]:
+    """Batch form of iter_searchable: returns the output path and how the pages were handled."""
+    counts = {'pages': 0, 'ocr': 0, 'cached': 0}
+    for result in iter_searchable(input_path, output_path, jobs=jobs, progress=progress, **ocr_options):
+        counts['pages'] += 1
+        counts['ocr'] += result.source == SCANNED
+        counts['cached'] += result.cached
+    return output_path, counts
+
+
+def add_text_layer(page, words: Iterable[OcrWord], fontname: str = "helv"):
+    """Write words onto a fitz page as invisible text stretched over where they appear.
+
+    Text drawn in render mode 3 is neither filled nor stroked: viewers can search and select it
+    but show the scanned image underneath. Words the built-in font fontname can encode use it;
+    others (Turkish, Cyrillic, Greek, CJK, ...) use the first of UNICODE_FONTS that has all their
+    glyphs, embedded once per document.
+    """
+    derotate = page.derotation_matrix
+    shape = page.new_shape()
+    inserted = set()
+    for word in words:
+        name, font = text_font(word.text, fontname)
+        if font is not None and name not in inserted:
+            page.insert_font(fontname=name, fontbuffer=font.buffer)
+            inserted.add(name)
+        # Word positions are measured on the page as displayed; drawing uses unrotated coordinates
+        start = fitz.Point(word.x0, word.y0) * derotate
+        end = fitz.Point(word.x1, word.y1) * derotate
+        length = abs(end - start)
+        if font is not None:
+            natural = font.text_length(word.text, fontsize=word.height)
+        else:
+            natural = fitz.get_text_length(word.text, fontname=name, fontsize=word.height)
+        if not length or not natural or word.height <= 0:
+            continue
+        dx, dy = (end.x - start.x) / length, (end.y - start.y) / length
+        stretch = length / natural
+        shape.insert_text(start, word.text, fontsize=word.height, fontname=name, render_mode=3,
+                          morph=(start, fitz.Matrix(dx * stretch, -dy * stretch, dy, dx, 0, 0)))
+    shape.commit()
+
+
+def text_font(text: str, fontname: str = "helv") -> Tuple[str, Optional[fitz.Font]]:
+    """(resource name, font to embed or None) to write text with: the built-in fontname when
+    Windows-1252 encodes it, else a Unicode font, preferring one with a glyph for every character."""
+    try:
+        text.encode("cp1252")
+        return fontname, None
+    except UnicodeEncodeError:
+        pass
+    fallback = None
+    for name in UNICODE_FONTS:
+        if name not in _unicode_fonts:
+            try:
+                _unicode_fonts[name] = fitz.Font(name)
+            except Exception:  # e.g. notos without pymupdf-fonts
+                _unicode_fonts[name] = None
+        font = _unicode_fonts[name]
+        if font is None:
+            continue
+        if all(font.has_glyph(ord(char)) for char in text):
+            return f"ocr{name}", font
+        fallback = fallback or (f"ocr{name}", font)
+    return fallback or (fontname, None)
+
+
+# OCR cache of the worker processes, opened once per process
+_worker_cache: Optional[OcrCache] = None
+
+
+def _init_ocr_worker(cache_path: Optional[str], use_cache: bool):
+    global _worker_cache
+    # One Tesseract thread per worker: the pool already uses every core
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    _worker_cache = OcrCache(cache_path) if use_cache else None
+
+
+def _recognize_in_worker(number: int, image, dpi: int, key: Optional[str], settings: _Settings) -> OcrPage:
+    return _recognize(number, image, dpi, key, settings, _worker_cache)
+
+
+def _recognize(number: int, image, dpi: int, key: Optional[str], settings: _Settings,
+               cache: Optional[OcrCache] = None) -> OcrPage:
+    started = time.perf_counter()
+    config = f"--dpi {dpi} {settings.config}".strip()
+    if not settings.words:
+        with span("preprocess", "ocr", page=number + 1):
+            image = preprocess(image, dpi, settings.preprocessing)
+        with span("tesseract", "ocr", page=number + 1):
+            text = pytesseract.image_to_string(image, lang=settings.lang, config=config)
+        if cache and key:
+            cache.put(key, text)
+        return OcrPage(number, text, time.perf_counter() - started, SCANNED)
+    with span("preprocess", "ocr", page=number + 1):
+        image, to_source = preprocess_mapped(image, dpi, settings.preprocessing)
+    with span("tesseract", "ocr", page=number + 1):
+        data = pytesseract.image_to_data(image, lang=settings.lang, config=config,
+                                         output_type=pytesseract.Output.DICT)
+    text, words = _read_words(data, to_source, 72 / dpi)
+    if cache and key:
+        cache.put(key, json.dumps({'text': text, 'words': words}))
+    return OcrPage(number, text, time.perf_counter() - started, SCANNED, False, words)
+
+
+def _read_words(data: dict, to_source, points_per_pixel: float) -> Tuple[str, Tuple[OcrWord, ...]]:
+    """Plain text and page-positioned words from pytesseract.image_to_data output."""
+    words = []
+    paragraphs = []
+    lines = {}
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        if not word or float(data['conf'][i]) < 0:
+            continue
+        paragraph = (data['block_num'][i], data['par_num'][i])
+        line = paragraph + (data['line_num'][i],)
+        if line not in lines:
+            if not paragraphs or paragraphs[-1][0] != paragraph:
+                paragraphs.append((paragraph, []))
+            lines[line] = []
+            paragraphs[-1][1].append(lines[line])
+        lines[line].append(word)
+        left, top, width, height = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
+        x0, y0 = to_source(left, top + height)
+        x1, y1 = to_source(left + width, top + height)
+        words.append(OcrWord(word, x0 * points_per_pixel, y0 * points_per_pixel,
+                             x1 * points_per_pixel, y1 * points_per_pixel, height * points_per_pixel))
+    text = "\n\n".join("\n".join(" ".join(line) for line in paragraph_lines) for _key, paragraph_lines in paragraphs)
+    return text, tuple(words)
+
+
+def _from_cache(number: int, cached: str, words: bool) -> OcrPage:
+    if not words:
+        return OcrPage(number, cached, 0.0, SCANNED, True)
+    payload = json.loads(cached)
+    return OcrPage(number, payload['text'], 0.0, SCANNED, True, tuple(OcrWord(*word) for word in payload['words']))
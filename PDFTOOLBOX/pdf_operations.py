@@ -0,0 +1,713 @@
+"""GUI-free PDF operations shared by the Tk toolbox and the command line."""
+import glob
+import multiprocessing
+import os
+import re
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from contextlib import nullcontext
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.constants import UserAccessPermissions
+from PyPDF2.generic import DictionaryObject, IndirectObject, NameObject, create_string_object
+
+from page_ranges import PageRangeSet
+from paths import make_parent_dir
+from pdf_copy import PageCopier, StreamingMerger
+from pdf_incremental import IncrementalUpdate, UnsupportedUpdate
+from pdf_pages import PageIndex, outline_entries
+from profiling import span
+from progress import PARSE, TRANSFORM, WRITE, Progress, ProgressSnapshot
+
+SPLIT_MODES = ("range", "every_n", "equal_n", "bookmarks")
+
+METADATA_KEYS = {
+    'title': '/Title',
+    'author': '/Author',
+    'subject': '/Subject',
+    'keywords': '/Keywords',
+}
+
+
+# Page selection helpers
+def parse_page_numbers(input_str: str, total_pages: Optional[int] = None) -> PageRangeSet:
+    """Parse page numbers from string like '1,3,5' or '2-4' or '1,3-5,7' (plus odd/even/last/-N/!N)"""
+    return PageRangeSet.parse(input_str, total_pages)
+
+
+def validate_page_numbers(pages, total_pages: int):
+    if not isinstance(pages, PageRangeSet):
+        pages = PageRangeSet.from_pages(pages)
+    pages.validate(total_pages)
+
+
+def page_selection(pages, total_pages: int) -> PageRangeSet:
+    """Resolve a page string, PageRangeSet or iterable of page numbers against the document."""
+    if isinstance(pages, str):
+        return PageRangeSet.parse(pages, total_pages)
+    if not isinstance(pages, PageRangeSet):
+        pages = PageRangeSet.from_pages(pages)
+    pages.validate(total_pages)
+    return pages
+
+
+# Single-document operations
+def merge_pdfs(input_paths: List[str], output_path: str, dedupe: bool = True,
+               progress: Optional[Progress] = None) -> Tuple[str, dict]:
+    """Merge input_paths in order, streaming one input at a time so memory does not grow with the count.
+
+    With dedupe, fonts, images and color profiles repeated across inputs are written once. Returns
+    (output_path, {'pages': ..., 'duplicates': ..., 'saved': bytes}).
+    """
+    progress = progress or Progress()
+    progress.expect(files=len(input_paths))
+    written = 0
+    make_parent_dir(output_path)
+    # A merge stopped partway (an error, or a cancelled job) removes the unfinished output
+    with StreamingMerger(output_path, dedupe) as merger:
+        for pdf in input_paths:
+            progress.check()
+            # Inputs are read and written object by object, so the whole copy counts as one stage
+            with progress.stage(WRITE):
+                pages = merger.append(pdf)
+            size = os.path.getsize(output_path)
+            progress.advance(pages=pages, files=1, num_bytes=size - written)
+            written = size
+        progress.check()
+    return output_path, {'pages': merger.pages, 'duplicates': merger.duplicates, 'saved': merger.bytes_saved}
+
+
+def _read(input_path: str, progress: Progress) -> PdfReader:
+    with progress.stage(PARSE):
+        reader = PdfReader(input_path)
+        progress.expect(pages=len(reader.pages))
+    return reader
+
+
+def _write(writer: PdfWriter, output_path: str, progress: Progress) -> str:
+    # Written beside the target and then moved over it, so a failed or cancelled write never leaves
+    # a truncated file, least of all the input itself when it is rewritten in place
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    make_parent_dir(output_path)
+    try:
+        with progress.output(temp_path) as output_file:
+            writer.write(output_file)
+        progress.check()
+        if os.path.exists(output_path):
+            shutil.copymode(output_path, temp_path)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return output_path
+
+
+def _write_update(update: IncrementalUpdate, output_path: str, pages: int, progress: Progress) -> str:
+    # Counted only here: an update that turns out to be unsupported falls back to a full rewrite
+    progress.expect(pages=pages)
+    progress.check()
+    make_parent_dir(output_path)
+    with progress.stage(WRITE):
+        output_path = update.write(output_path)
+    progress.advance(pages=pages)
+    return output_path
+
+
+def open_incremental(input_path: str, progress: Optional[Progress] = None) -> Optional[IncrementalUpdate]:
+    """An IncrementalUpdate for input_path, or None when the file needs a full rewrite."""
+    try:
+        with progress.stage(PARSE) if progress else nullcontext():
+            return IncrementalUpdate(input_path)
+    except UnsupportedUpdate:
+        return None
+
+
+def delete_pages(input_path: str, output_path: str, pages, incremental: bool = False,
+                 progress: Optional[Progress] = None) -> str:
+    """Write input_path without the given 1-based pages ('1,3-5', a PageRangeSet or a list).
+
+    incremental drops the pages from the page tree in an appended update instead of copying
+    every remaining page into a new file.
+    """
+    progress = progress or Progress()
+    if incremental:
+        update = open_incremental(input_path, progress)
+        if update:
+            with update:
+                try:
+                    total_pages = update.page_count()
+                    with progress.stage(TRANSFORM):
+                        update.delete_pages(_deletion(pages, total_pages))
+                    return _write_update(update, output_path, total_pages, progress)
+                except UnsupportedUpdate:
+                    pass  # unusual page tree: fall back to a full rewrite
+
+    reader = _read(input_path, progress)
+    total_pages = len(reader.pages)
+    selection = _deletion(pages, total_pages)
+
+    # Copy the runs of pages between deleted ranges
+    with progress.stage(TRANSFORM):
+        writer = PdfWriter()
+        for start, end in selection.gaps(1, total_pages):
+            for i in range(start - 1, end):
+                writer.add_page(reader.pages[i])
+    _write(writer, output_path, progress)
+    progress.advance(pages=total_pages)
+    return output_path
+
+
+def _deletion(pages, total_pages: int) -> PageRangeSet:
+    selection = page_selection(pages, total_pages)
+    if len(selection) >= total_pages:
+        raise ValueError("Cannot delete every page of the document.")
+    return selection
+
+
+def rotate_pages(input_path: str, output_path: str, angle: int, pages=None, incremental: bool = False,
+                 progress: Optional[Progress] = None) -> str:
+    """Rotate the given 1-based pages (all pages when empty) clockwise by angle.
+
+    incremental rewrites only the /Rotate of the touched pages in an appended update.
+    """
+    angle = int(angle)
+    if angle % 90:
+        raise ValueError("Rotation angle must be a multiple of 90.")
+    if isinstance(pages, str) and not pages.strip():
+        pages = None
+    progress = progress or Progress()
+    if incremental:
+        update = open_incremental(input_path, progress)
+        if update:
+            with update:
+                try:
+                    total_pages = update.page_count()
+                    selection = page_selection(pages, total_pages) if pages else PageRangeSet.all_pages(total_pages)
+                    with progress.stage(TRANSFORM):
+                        update.rotate_pages(selection, angle)
+                    return _write_update(update, output_path, total_pages, progress)
+                except UnsupportedUpdate:
+                    pass  # unusual page tree: fall back to a full rewrite
+
+    reader = _read(input_path, progress)
+    total_pages = len(reader.pages)
+    selection = page_selection(pages, total_pages) if pages else PageRangeSet.all_pages(total_pages)
+
+    with progress.stage(TRANSFORM):
+        for page_num in selection:
+            reader.pages[page_num - 1].rotate(angle)
+        writer = PdfWriter()
+        for page in reader.pages:
+            writer.add_page(page)
+    _write(writer, output_path, progress)
+    progress.advance(pages=total_pages)
+    return output_path
+
+
+class SplitPart(NamedTuple):
+    first: int  # 0-based
+    stop: int  # exclusive
+    label: str
+    title: str  # bookmark title in bookmarks mode, the label otherwise
+
+
+def plan_split(reader: PdfReader, mode: str, start=None, end=None, n=None, depth: Optional[int] = 1) -> List[SplitPart]:
+    """Return the parts of a split with 0-based, stop-exclusive pages.
+
+    In bookmarks mode the document is split at every bookmark down to depth outline levels
+    (all levels when depth is None or 0).
+    """
+    total_pages = len(PageIndex.of(reader))
+    parts = []
+    if mode == "range":
+        start_page = int(start)
+        end_page = int(end)
+        if start_page < 1 or end_page > total_pages or start_page > end_page:
+            raise ValueError(f"Invalid page range. PDF has {total_pages} pages.")
+        label = f"Pages {start_page}-{end_page}"
+        parts.append(SplitPart(start_page - 1, end_page, label, label))
+    elif mode == "every_n":
+        n = int(n)
+        if n < 1:
+            raise ValueError("N must be at least 1.")
+        for part, i in enumerate(range(0, total_pages, n), start=1):
+            stop = min(i + n, total_pages)
+            label = f"Part {part} (pages {i+1}-{stop})"
+            parts.append(SplitPart(i, stop, label, label))
+    elif mode == "equal_n":
+        n = int(n)
+        if n < 1 or n > total_pages:
+            raise ValueError(f"N must be between 1 and {total_pages}.")
+        pages_per_part = total_pages // n
+        extra = total_pages % n
+        first = 0
+        for part in range(1, n + 1):
+            stop = first + pages_per_part + (1 if part <= extra else 0)
+            label = f"Part {part} (pages {first+1}-{stop})"
+            parts.append(SplitPart(first, stop, label, label))
+            first = stop
+    elif mode == "bookmarks":
+        # The first bookmark on a page names the part, so a chapter wins over its first section
+        titles = {}
+        for entry in outline_entries(reader, depth or None):
+            if entry.page is not None and entry.page not in titles:
+                titles[entry.page] = entry.title.strip() or f"Section {len(titles) + 1}"
+        if not titles:
+            raise ValueError("No bookmarks found in this PDF.")
+        titles.setdefault(0, "Front matter")
+        boundaries = sorted(titles) + [total_pages]
+        for first, stop in zip(boundaries, boundaries[1:]):
+            parts.append(SplitPart(first, stop, f"{titles[first]} (pages {first+1}-{stop})", titles[first]))
+    else:
+        raise ValueError(f"Unknown split mode: {mode}")
+    return parts
+
+
+def split_pdf(input_path: str, output_template: str, mode: str = "range", start=None, end=None, n=None,
+              jobs: int = 1, depth: Optional[int] = 1, progress: Optional[Progress] = None) -> List[str]:
+    """Split input_path into the parts planned for mode; output_template may use {part}, {start}, {end}, {title}.
+
+    Returns the output paths in part order, however the workers finished them.
+    """
+    return [output_path for _part, _label, output_path
+            in sorted(iter_split(input_path, output_template, mode, start, end, n, jobs, depth, progress))]
+
+
+def iter_split(input_path: str, output_template: str, mode: str = "range", start=None, end=None, n=None,
+               jobs: int = 1, depth: Optional[int] = 1, progress: Optional[Progress] = None) -> Iterator[Tuple[int, str, str]]:
+    """Write every part of a split without prompting, yielding (part number, label, output path) as parts finish.
+
+    The parts are planned from one parse of the source. With jobs > 1 they are written by worker
+    processes that each open the source once and take contiguous runs of parts, so every page is
+    read by exactly one worker. Objects shared between parts (fonts, images) are serialized once per
+    process and reused by every part that references them.
+    """
+    progress = progress or Progress()
+    with open(input_path, 'rb') as input_file:
+        with progress.stage(PARSE):
+            reader = PdfReader(input_file)
+            parts = plan_split(reader, mode, start, end, n, depth)
+        progress.expect(pages=sum(stop - first for first, stop, _label, _title in parts), files=len(parts))
+        planned = []
+        used = set()
+        for part, (first, stop, label, title) in enumerate(parts, start=1):
+            output_path = format_output_path(output_template, input_path, part=part, start=first + 1, end=stop,
+                                             title=safe_file_name(title))
+            if os.path.abspath(output_path) in used:
+                raise ValueError(f"Several parts would be written to {output_path}; add {{part}} to the file name template.")
+            used.add(os.path.abspath(output_path))
+            planned.append((part, first, stop, label, output_path))
+        jobs = min(jobs or 1, len(planned))
+        if jobs <= 1:
+            copier = PageCopier(reader)
+            for part, first, stop, label, output_path in planned:
+                # Parts are serialized straight into their files, so each counts as one write
+                with progress.stage(WRITE):
+                    make_parent_dir(output_path)
+                    copier.write_pages(first, stop, output_path)
+                progress.advance(pages=stop - first, files=1, num_bytes=os.path.getsize(output_path))
+                yield part, label, output_path
+            return
+
+    # A few chunks per worker keeps the pool busy when parts differ in size
+    chunk_count = min(len(planned), jobs * 4)
+    chunks = [planned[i * len(planned) // chunk_count:(i + 1) * len(planned) // chunk_count] for i in range(chunk_count)]
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=jobs, mp_context=context,
+                                   initializer=_open_split_source, initargs=(input_path,))
+    try:
+        for future in as_completed([executor.submit(_write_split_chunk, chunk) for chunk in chunks]):
+            for part, label, output_path, pages, seconds in future.result():
+                progress.add_stage_time(WRITE, seconds)
+                progress.advance(pages=pages, files=1, num_bytes=os.path.getsize(output_path))
+                yield part, label, output_path
+    finally:
+        # Closing the generator early (a cancelled job) drops the chunks not yet started
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Source document of the split worker processes, opened once per process
+_split_source: Optional[PageCopier] = None
+
+
+def _open_split_source(input_path: str):
+    global _split_source
+    _split_source = PageCopier(PdfReader(open(input_path, 'rb')))
+
+
+def _write_split_chunk(chunk) -> List[Tuple[int, str, str, int, float]]:
+    written = []
+    for part, first, stop, label, output_path in chunk:
+        started = time.perf_counter()
+        make_parent_dir(output_path)
+        _split_source.write_pages(first, stop, output_path)
+        written.append((part, label, output_path, stop - first, time.perf_counter() - started))
+    return written
+
+
+def encryption_permissions(allow_print=True, allow_copy=True, allow_edit=True) -> int:
+    permissions = UserAccessPermissions((2**31 - 1) - 3)
+    if not allow_print:
+        permissions &= ~(UserAccessPermissions.PRINT | UserAccessPermissions.PRINT_TO_REPRESENTATION)
+    if not allow_copy:
+        permissions &= ~(UserAccessPermissions.EXTRACT | UserAccessPermissions.EXTRACT_TEXT_AND_GRAPHICS)
+    if not allow_edit:
+        permissions &= ~(UserAccessPermissions.MODIFY | UserAccessPermissions.ADD_OR_MODIFY
+                         | UserAccessPermissions.ASSEMBLE_DOC)
+    return permissions
+
+
+def encrypt_pdf(input_path: str, output_path: str, user_password: str, owner_password: Optional[str] = None,
+                allow_print=True, allow_copy=True, allow_edit=True, progress: Optional[Progress] = None) -> str:
+    if not user_password:
+        raise ValueError("A user password is required.")
+    progress = progress or Progress()
+    reader = _read(input_path, progress)
+    with progress.stage(TRANSFORM):
+        writer = PdfWriter()
+        for page in reader.pages:
+            writer.add_page(page)
+        writer.encrypt(
+            user_password,
+            owner_password,
+            permissions_flag=encryption_permissions(allow_print, allow_copy, allow_edit),
+        )
+    _write(writer, output_path, progress)
+    progress.advance(pages=len(reader.pages))
+    return output_path
+
+
+# Candidate passwords that opened files in this process, counted so the usual ones are tried first
+_password_hits: Dict[str, int] = {}
+
+
+def unlock_reader(reader: PdfReader, passwords: List[str]) -> str:
+    """Decrypt reader with the first candidate that works and return that password."""
+    for password in sorted(passwords, key=lambda p: -_password_hits.get(p, 0)):
+        if reader.decrypt(password):
+            _password_hits[password] = _password_hits.get(password, 0) + 1
+            return password
+    if len(passwords) == 1:
+        raise ValueError("Incorrect password.")
+    raise ValueError(f"None of the {len(passwords)} candidate passwords opened this PDF.")
+
+
+def decrypt_pdf(input_path: str, output_path: str, password: Optional[str] = None,
+                passwords: Optional[List[str]] = None, progress: Optional[Progress] = None) -> str:
+    return _decrypt_pdf(input_path, output_path, password, passwords, progress)[0]
+
+
+def _decrypt_pdf(input_path, output_path, password=None, passwords=None, progress=None) -> Tuple[str, dict]:
+    candidates = ([password] if password else []) + [p for p in passwords or [] if p != password]
+    if not candidates:
+        raise ValueError("Please enter at least one password.")
+    progress = progress or Progress()
+    started = time.perf_counter()
+    with progress.stage(PARSE):
+        reader = PdfReader(input_path)
+        if not reader.is_encrypted:
+            raise ValueError("This PDF is not encrypted.")
+        used = unlock_reader(reader, candidates)
+        progress.expect(pages=len(reader.pages))
+    unlocked = time.perf_counter()
+    with progress.stage(TRANSFORM):
+        writer = PdfWriter()
+        for page in reader.pages:
+            writer.add_page(page)
+    _write(writer, output_path, progress)
+    progress.advance(pages=len(reader.pages))
+    detail = {
+        'password': candidates.index(used) + 1,
+        'unlock': unlocked - started,
+        'write': time.perf_counter() - unlocked,
+    }
+    return output_path, detail
+
+
+def file_fingerprint(path: str) -> Optional[Tuple[str, int, int]]:
+    """Identify a file by path, size and modification time; None when it cannot be read."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+class PasswordCache:
+    """Remembers which candidate password opened which file so re-runs try it first."""
+
+    def __init__(self):
+        self._passwords = {}
+
+    def order(self, input_path: str, passwords: List[str]) -> List[str]:
+        known = self._passwords.get(file_fingerprint(input_path))
+        if known not in passwords:
+            return list(passwords)
+        return [known] + [p for p in passwords if p != known]
+
+    def record(self, input_path: str, password: str):
+        fingerprint = file_fingerprint(input_path)
+        if fingerprint:
+            self._passwords[fingerprint] = password
+
+
+def read_metadata(input_path: str) -> Dict[str, str]:
+    # Reading through a file handle parses only the trailer and Info objects
+    with open(input_path, 'rb') as input_file:
+        return reader_metadata(PdfReader(input_file))
+
+
+def reader_metadata(reader: PdfReader) -> Dict[str, str]:
+    info = reader.metadata
+    if not info:
+        return {key: "" for key in METADATA_KEYS}
+    return {key: info[pdf_key] if pdf_key in info else "" for key, pdf_key in METADATA_KEYS.items()}
+
+
+def save_metadata(input_path: str, output_path: str, metadata: Dict[str, str], incremental: bool = False,
+                  templated: bool = False, progress: Optional[Progress] = None) -> str:
+    """Write input_path with its Info entries replaced; metadata keys are title/author/subject/keywords.
+
+    incremental appends an update section to the original bytes instead of rewriting every page
+    (encrypted or damaged files still get a full rewrite). templated expands file fields and the
+    current values in each entry, e.g. '{stem}' or '{title} (rev. 2)'.
+    """
+    if templated:
+        fields = {**file_fields(input_path), **read_metadata(input_path)}
+        metadata = {key: _expand_metadata(key, value, fields) for key, value in metadata.items()}
+    progress = progress or Progress()
+    if incremental:
+        update = open_incremental(input_path, progress)
+        if update:
+            with update:
+                with progress.stage(TRANSFORM):
+                    _set_info_incremental(update, metadata)
+                return _write_update(update, output_path, 0, progress)
+
+    reader = _read(input_path, progress)
+    with progress.stage(TRANSFORM):
+        writer = PdfWriter()
+        for page in reader.pages:
+            writer.add_page(page)
+        if reader.metadata:
+            # Only text entries: PyPDF2 refuses to copy null or other non-string values
+            writer.add_metadata({key: value for key, value in reader.metadata.items() if isinstance(value, str)})
+        writer.add_metadata({METADATA_KEYS[key]: value for key, value in metadata.items()})
+    _write(writer, output_path, progress)
+    progress.advance(pages=len(reader.pages))
+    return output_path
+
+
+def _expand_metadata(key: str, value: str, fields: Dict[str, object]) -> str:
+    try:
+        return value.format(**fields)
+    except KeyError as e:
+        raise ValueError(f"Unknown placeholder {{{e.args[0]}}} in the {key} {value!r}; "
+                         f"write {{{{ and }}}} for literal braces.") from None
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"Invalid template in the {key} {value!r} ({e}); write {{{{ and }}}} for literal braces.") from None
+
+
+def _set_info_incremental(update: IncrementalUpdate, metadata: Dict[str, str]):
+    info_ref = update.reader.trailer.raw_get('/Info') if '/Info' in update.reader.trailer else None
+    info = DictionaryObject()
+    if info_ref is not None:
+        info.update(info_ref.get_object())
+    for key, value in metadata.items():
+        info[NameObject(METADATA_KEYS[key])] = create_string_object(value)
+    if isinstance(info_ref, IndirectObject):
+        update.update(info_ref, info)
+    else:
+        update.set_trailer('/Info', update.add(info))
+
+
+def make_searchable(input_path: str, output_path: str, **options) -> Tuple[str, dict]:
+    """pdf_ocr.make_searchable, imported on first use so other operations do not load fitz and pytesseract."""
+    from pdf_ocr import make_searchable as make_file_searchable
+    return make_file_searchable(input_path, output_path, **options)
+
+
+# Batch execution
+OPERATIONS = {
+    'delete': delete_pages,
+    'rotate': rotate_pages,
+    'split': split_pdf,
+    'encrypt': encrypt_pdf,
+    'decrypt': _decrypt_pdf,
+    'metadata': save_metadata,
+    'ocr': make_searchable,
+}
+
+# Operations that expand the output template themselves because they write several files
+MULTI_OUTPUT_OPERATIONS = {'split'}
+
+
+class BatchResult(NamedTuple):
+    input_path: str
+    outputs: List[str]
+    error: Optional[str]
+    elapsed: float
+    detail: Optional[dict] = None
+    progress: Optional[ProgressSnapshot] = None  # pages, bytes written and time per stage
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def describe_detail(self) -> str:
+        """Human-readable operation details, e.g. 'password 2, unlock 0.03s, write 0.20s'."""
+        return ", ".join(f"{key} {value:.2f}s" if isinstance(value, float) else f"{key} {value}"
+                         for key, value in (self.detail or {}).items())
+
+
+def format_size(num_bytes: int) -> str:
+    """Format a byte count for messages, e.g. '1.4 MB'."""
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes} {unit}" if unit == "bytes" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+
+def expand_inputs(patterns: Iterable[str]) -> List[str]:
+    """Expand file names and glob patterns, keeping the given order and dropping duplicates."""
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                paths.append(path)
+    return paths
+
+
+def file_fields(input_path: str, index: int = 1) -> Dict[str, object]:
+    name = os.path.basename(input_path)
+    stem, ext = os.path.splitext(name)
+    return {'stem': stem, 'name': name, 'ext': ext, 'dir': os.path.dirname(input_path) or '.', 'index': index}
+
+
+_UNSAFE_FILE_NAME_CHARS = re.compile(r'[\x00-\x1f<>:"/\\|?*]+')
+
+
+def safe_file_name(text: str, max_length: int = 80) -> str:
+    """Turn free text such as a bookmark title into something usable as (part of) a file name."""
+    name = _UNSAFE_FILE_NAME_CHARS.sub("_", text).strip(" .")
+    return name[:max_length].rstrip(" .") or "untitled"
+
+
+def format_output_path(template: str, input_path: str, index: int = 1, **fields) -> str:
+    """Expand an output template such as 'out/{stem}.enc.pdf' for input_path.
+
+    Available fields: {stem}, {name}, {ext}, {dir}, {index} plus any extra keyword fields. Missing
+    directories are created by the operation once it writes the file.
+    """
+    output_path = template.format(**file_fields(input_path, index), **fields)
+    if os.path.abspath(output_path) == os.path.abspath(input_path):
+        raise ValueError(f"Output path would overwrite the input file: {input_path}")
+    return output_path
+
+
+def run_operation(operation: str, input_path: str, output_template: Optional[str], index: int = 1, options=None,
+                  listener=None) -> BatchResult:
+    """Run one operation on one file, returning errors as part of the result instead of raising.
+
+    Operations return an output path, a list of paths, or a (paths, detail dict) tuple.
+    An output_template of None updates the input in place (used with incremental=True).
+    listener gets progress snapshots of the file while it is processed.
+    """
+    started = time.perf_counter()
+    progress = Progress(os.path.basename(input_path), listener=listener)
+    try:
+        func = OPERATIONS[operation]
+        with span(operation, "operation", file=input_path):
+            if operation in MULTI_OUTPUT_OPERATIONS:
+                outputs = func(input_path, output_template, progress=progress, **(options or {}))
+            else:
+                if output_template is None:
+                    output_path = input_path
+                else:
+                    output_path = format_output_path(output_template, input_path, index=index)
+                outputs = func(input_path, output_path, progress=progress, **(options or {}))
+        detail = None
+        if isinstance(outputs, tuple):
+            outputs, detail = outputs
+        if isinstance(outputs, str):
+            outputs = [outputs]
+        return BatchResult(input_path, outputs, None, time.perf_counter() - started, detail, progress.snapshot(True))
+    except Exception as e:
+        return BatchResult(input_path, [], str(e) or e.__class__.__name__, time.perf_counter() - started,
+                           progress=progress.snapshot())
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def run_batch(operation: str, input_paths: List[str], output_template: Optional[str], jobs: Optional[int] = None,
+              options=None, per_file_options: Optional[Dict[str, dict]] = None,
+              progress: Optional[Progress] = None) -> Iterator[BatchResult]:
+    """Run operation over input_paths on a process pool, yielding results as files complete.
+
+    per_file_options maps an input path to options that override the shared ones for that file.
+    progress counts files as they complete, with the pages, bytes and stage times of each.
+    """
+    def file_options(input_path):
+        if per_file_options and input_path in per_file_options:
+            return {**(options or {}), **per_file_options[input_path]}
+        return options
+
+    if progress is not None:
+        progress.expect(files=len(input_paths))
+        return _counted(_run_batch(operation, input_paths, output_template, jobs, file_options, progress.listener),
+                        progress)
+    return _run_batch(operation, input_paths, output_template, jobs, file_options)
+
+
+def _counted(results: Iterator[BatchResult], progress: Progress) -> Iterator[BatchResult]:
+    try:
+        for result in results:
+            if result.progress:
+                progress.add_stages(result.progress.stages)
+                progress.advance(pages=result.progress.pages, files=1, num_bytes=result.progress.bytes)
+            else:
+                progress.advance(files=1)
+            yield result
+    finally:
+        results.close()
+
+
+def _run_batch(operation, input_paths, output_template, jobs, file_options, listener=None) -> Iterator[BatchResult]:
+    jobs = min(jobs or default_jobs(), max(len(input_paths), 1))
+    if jobs <= 1:
+        # Files processed here can also report their own pages as they go
+        for index, input_path in enumerate(input_paths, start=1):
+            yield run_operation(operation, input_path, output_template, index, file_options(input_path), listener)
+        return
+
+    # Spawned workers do not inherit Tk or thread state from the parent process
+    context = multiprocessing.get_context("spawn")
+    tasks = iter(enumerate(input_paths, start=1))
+    executor = ProcessPoolExecutor(max_workers=jobs, mp_context=context)
+    try:
+        pending = set()
+        # Keep a bounded number of files in flight so huge batches do not queue every task up front
+        for index, input_path in tasks:
+            pending.add(executor.submit(run_operation, operation, input_path, output_template, index,
+                                        file_options(input_path)))
+            if len(pending) >= jobs * 4:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                for index, input_path in tasks:
+                    pending.add(executor.submit(run_operation, operation, input_path, output_template, index,
+                                                file_options(input_path)))
+                    break
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,144 @@
+"""Page tree index and outline (bookmark) traversal shared by the operations that resolve destinations.
+
+The index is built with one walk of the page tree and then answers "which page does this reference
+point to" with a dictionary lookup, so resolving thousands of bookmarks or links stays linear.
+"""
+from typing import Iterator, List, NamedTuple, Optional
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, Destination, DictionaryObject, IndirectObject, NumberObject
+
+INHERITABLE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+class OutlineEntry(NamedTuple):
+    level: int  # 1 for top-level bookmarks
+    title: str
+    page: Optional[int]  # 0-based, None when the destination does not resolve to a page
+
+
+class PageIndex:
+    """Page references of one document in order, with their inherited attributes.
+
+    Unlike reader.pages this walks the raw page tree, so the page dictionaries are left untouched
+    and each page only inherits from its own ancestors. Use PageIndex.of(reader) to share one
+    index between everything that works on the same reader.
+    """
+
+    @classmethod
+    def of(cls, reader: PdfReader) -> "PageIndex":
+        # Kept on the reader itself: the index references the reader, so a weak mapping keyed by
+        # the reader would never let either go
+        index = getattr(reader, "_toolbox_page_index", None)
+        if index is None:
+            index = cls(reader)
+            reader._toolbox_page_index = index
+        return index
+
+    def __init__(self, reader: PdfReader):
+        self.reader = reader
+        self.refs: List[IndirectObject] = []
+        self.node_numbers = set()
+        self._inherited: List[dict] = []
+        self._named: Optional[dict] = None
+        root = reader.trailer["/Root"]
+        stack = [(root.raw_get("/Pages"), {})]
+        visited = set()
+        while stack:
+            ref, inherited = stack.pop()
+            if not isinstance(ref, IndirectObject):
+                # Direct page objects cannot be referenced; let PyPDF2 flatten such trees
+                self._from_flattened_pages()
+                break
+            if ref.idnum in visited:
+                continue  # a damaged tree that points back at itself
+            visited.add(ref.idnum)
+            node = reader.get_object(ref)
+            if "/Kids" not in node:
+                self.refs.append(ref)
+                self._inherited.append(inherited)
+                continue
+            self.node_numbers.add(ref.idnum)
+            inherited = dict(inherited)
+            for key in INHERITABLE_KEYS:
+                if key in node:
+                    inherited[key] = node.raw_get(key)
+            stack.extend((kid, inherited) for kid in reversed(node["/Kids"]))
+        self._numbers = {ref.idnum: number for number, ref in enumerate(self.refs)}
+
+    def _from_flattened_pages(self):
+        self.refs = [page.indirect_reference for page in self.reader.pages]
+        self._inherited = [{} for _ref in self.refs]
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+    def inherited(self, number: int) -> dict:
+        """Raw inherited values (/Resources, /MediaBox, ...) the 0-based page does not set itself."""
+        page = self.reader.get_object(self.refs[number])
+        return {key: value for key, value in self._inherited[number].items() if key not in page}
+
+    def page_number(self, destination) -> Optional[int]:
+        """0-based page a destination points to: a page reference, an explicit destination array,
+        a named destination or a GoTo target. None when it does not resolve to a page."""
+        if isinstance(destination, IndirectObject):
+            if destination.idnum in self._numbers:
+                return self._numbers[destination.idnum]
+            destination = destination.get_object()
+        if isinstance(destination, Destination):
+            return self.page_number(destination.page)
+        if isinstance(destination, (str, bytes)):
+            name = destination.decode("latin-1") if isinstance(destination, bytes) else str(destination)
+            target = self._named_destinations().get(name)
+            return self.page_number(target) if target is not None else None
+        if isinstance(destination, DictionaryObject) and "/D" in destination:
+            return self.page_number(destination.raw_get("/D"))
+        if isinstance(destination, ArrayObject) and destination:
+            target = destination[0]
+            if isinstance(target, NumberObject):
+                return int(target) if 0 <= int(target) < len(self.refs) else None
+            return self.page_number(target) if isinstance(target, IndirectObject) else None
+        return None
+
+    def _named_destinations(self) -> dict:
+        if self._named is None:
+            try:
+                self._named = self.reader.named_destinations
+            except Exception:
+                self._named = {}
+        return self._named
+
+
+def outline_entries(reader: PdfReader, max_depth: Optional[int] = None) -> Iterator[OutlineEntry]:
+    """Yield the bookmarks in document order down to max_depth levels (all levels when None)."""
+    index = PageIndex.of(reader)
+    root = reader.trailer["/Root"]
+    if "/Outlines" not in root or "/First" not in root["/Outlines"]:
+        return
+    stack = [(root["/Outlines"].raw_get("/First"), 1)]
+    visited = set()
+    while stack:
+        ref, level = stack.pop()
+        key = ref.idnum if isinstance(ref, IndirectObject) else id(ref)
+        if key in visited:
+            continue  # a damaged outline that loops
+        visited.add(key)
+        item = ref.get_object()
+        if not isinstance(item, DictionaryObject):
+            continue
+        # Siblings go below the children on the stack so each chapter is followed by its sections
+        if "/Next" in item:
+            stack.append((item.raw_get("/Next"), level))
+        if "/First" in item and (max_depth is None or level < max_depth):
+            stack.append((item.raw_get("/First"), level + 1))
+        yield OutlineEntry(level, str(item["/Title"]) if "/Title" in item else "", index.page_number(_target(item)))
+
+
+def _target(item: DictionaryObject):
+    if "/Dest" in item:
+        return item.raw_get("/Dest")
+    if "/A" in item:
+        action = item["/A"]
+        if isinstance(action, DictionaryObject) and "/S" in action and action["/S"] == "/GoTo" and "/D" in action:
+            return action.raw_get("/D")
+    return None
@@ -1,1026 +1,1555 @@
-import tkinter as tk
-import ttkbootstrap as tb
-from ttkbootstrap.constants import *
-from tkinter import ttk, filedialog, messagebox, simpledialog
-from PyPDF2 import PdfReader, PdfWriter, PdfMerger
-import os
-from typing import List, Tuple
-import fitz  # PyMuPDF
-from PIL import Image, ImageTk
-from tkinterdnd2 import DND_FILES, TkinterDnD
-import pytesseract
-import threading
-
-class PDFToolbox:
-    def __init__(self):
-        self.window = tb.Window(themename="darkly")
-        self.window.title("PDF Toolbox - Advanced PDF Operations")
-        self.window.geometry("700x600")
-        self.window.resizable(True, True)
-        self.history = []
-        self.history_pointer = -1
-        self.create_undo_redo_buttons()
-        self.selected_files = []
-        self.setup_ui()
-        self.create_progress_bar()
-        
-    def setup_ui(self):
-        # Create notebook for tabs
-        notebook = ttk.Notebook(self.window)
-        notebook.pack(fill='both', expand=True, padx=10, pady=10)
-        
-        # Create tabs
-        self.merge_tab = ttk.Frame(notebook)
-        self.delete_tab = ttk.Frame(notebook)
-        self.split_tab = ttk.Frame(notebook)
-        self.encrypt_tab = ttk.Frame(notebook)
-        self.rotate_tab = ttk.Frame(notebook)
-        self.metadata_tab = ttk.Frame(notebook)
-        
-        notebook.add(self.merge_tab, text="Merge PDFs")
-        notebook.add(self.delete_tab, text="Delete Pages")
-        notebook.add(self.split_tab, text="Split PDF")
-        notebook.add(self.encrypt_tab, text="Encrypt/Decrypt")
-        notebook.add(self.rotate_tab, text="Rotate Pages")
-        notebook.add(self.metadata_tab, text="Metadata Editor")
-        
-        self.setup_merge_tab()
-        self.setup_delete_tab()
-        self.setup_split_tab()
-        self.setup_encrypt_tab()
-        self.setup_rotate_tab()
-        self.setup_metadata_tab()
-    
-    def setup_merge_tab(self):
-        # Title
-        title_label = tb.Label(self.merge_tab, text="Merge PDFs with Reordering", font=("Helvetica", 14, "bold"))
-        title_label.pack(pady=10)
-        
-        # File selection frame
-        file_frame = tb.Labelframe(self.merge_tab, text="Select PDF Files", padding=10)
-        file_frame.pack(fill='x', padx=10, pady=5)
-        
-        select_btn = tb.Button(file_frame, text="Select PDF Files", command=self.select_files_for_merge)
-        select_btn.pack(pady=5)
-        
-        # Files listbox with scrollbar
-        list_frame = tb.Frame(file_frame)
-        list_frame.pack(fill='both', expand=True, pady=5)
-        
-        self.files_listbox = tk.Listbox(list_frame, height=8, bg="#222", fg="#eee", selectbackground="#444", selectforeground="#fff", highlightbackground="#333", relief="flat")
-        scrollbar = tb.Scrollbar(list_frame, orient="vertical", command=self.files_listbox.yview)
-        self.files_listbox.configure(yscrollcommand=scrollbar.set)
-        
-        self.files_listbox.pack(side="left", fill="both", expand=True, padx=(0, 2))
-        scrollbar.pack(side="right", fill="y")
-        
-        # Reorder buttons
-        reorder_frame = tb.Frame(file_frame)
-        reorder_frame.pack(pady=5)
-        
-        tb.Button(reorder_frame, text="Move Up", command=self.move_file_up).pack(side="left", padx=2)
-        tb.Button(reorder_frame, text="Move Down", command=self.move_file_down).pack(side="left", padx=2)
-        tb.Button(reorder_frame, text="Remove", command=self.remove_file).pack(side="left", padx=2)
-        tb.Button(reorder_frame, text="Clear All", command=self.clear_files).pack(side="left", padx=2)
-        
-        # Merge button
-        merge_btn = tb.Button(self.merge_tab, text="Merge PDFs", command=self.merge_pdfs_with_reordering)
-        merge_btn.pack(pady=10)
-    
-    def setup_delete_tab(self):
-        # Title
-        title_label = tb.Label(self.delete_tab, text="Delete Pages from PDF", font=("Helvetica", 14, "bold"))
-        title_label.pack(pady=10)
-        
-        # File selection
-        file_frame = tb.Labelframe(self.delete_tab, text="Select PDF File", padding=10)
-        file_frame.pack(fill='x', padx=10, pady=5)
-        
-        self.delete_file_path = tb.StringVar()
-        tb.Button(file_frame, text="Select PDF", command=self.select_file_for_delete).pack(pady=5)
-        tb.Label(file_frame, textvariable=self.delete_file_path, wraplength=400).pack(pady=5)
-        
-        # PDF Preview (thumbnail)
-        self.delete_preview_label = tb.Label(self.delete_tab)
-        self.delete_preview_label.pack(pady=5)
-        # OCR button
-        self.ocr_btn = tb.Button(self.delete_tab, text="🧠 OCR This Page", command=self.ocr_current_page)  # type: ignore
-        self.ocr_btn.pack(pady=2)
-        
-        # Multi-page preview navigation
-        nav_frame = tb.Frame(self.delete_tab)
-        nav_frame.pack(pady=2)
-        self.delete_page_num = tb.IntVar(value=1)
-        self.delete_total_pages = 1
-        self.delete_pdf_doc = None
-        self.delete_pdf_path = None
-        self.delete_prev_btn = tb.Button(nav_frame, text="Previous", command=self.delete_prev_page, state="disabled")
-        self.delete_prev_btn.pack(side="left", padx=2)
-        self.delete_page_label = tb.Label(nav_frame, text="Page 1/1")
-        self.delete_page_label.pack(side="left", padx=4)
-        self.delete_next_btn = tb.Button(nav_frame, text="Next", command=self.delete_next_page, state="disabled")
-        self.delete_next_btn.pack(side="left", padx=2)
-        self.delete_slider = ttk.Scale(nav_frame, from_=1, to=1, orient="horizontal", command=self.delete_slider_move, state="disabled", length=200)
-        self.delete_slider.pack(side="left", padx=8)
-        
-        # Page selection
-        page_frame = tb.Labelframe(self.delete_tab, text="Select Pages to Delete", padding=10)
-        page_frame.pack(fill='x', padx=10, pady=5)
-        
-        tb.Label(page_frame, text="Enter page numbers to delete (e.g., 1,3,5 or 2-4):").pack(pady=5)
-        self.pages_to_delete = tb.StringVar()
-        tb.Entry(page_frame, textvariable=self.pages_to_delete, width=40).pack(pady=5)
-        
-        # Delete button
-        delete_btn = tb.Button(self.delete_tab, text="Delete Pages", command=self.delete_pages)
-        delete_btn.pack(pady=10)
-    
-    def setup_split_tab(self):
-        # Title
-        title_label = tb.Label(self.split_tab, text="Split PDF by Page Range or Smart Suggestions", font=("Helvetica", 14, "bold"))
-        title_label.pack(pady=10)
-        
-        # File selection
-        file_frame = tb.Labelframe(self.split_tab, text="Select PDF File", padding=10)
-        file_frame.pack(fill='x', padx=10, pady=5)
-        
-        self.split_file_path = tb.StringVar()
-        tb.Button(file_frame, text="Select PDF", command=self.select_file_for_split).pack(pady=5)
-        tb.Label(file_frame, textvariable=self.split_file_path, wraplength=400).pack(pady=5)
-        
-        # Split mode selection
-        mode_frame = tb.Labelframe(self.split_tab, text="Split Mode", padding=10)
-        mode_frame.pack(fill='x', padx=10, pady=5)
-        self.split_mode = tb.StringVar(value="range")
-        tb.Radiobutton(mode_frame, text="By Page Range", variable=self.split_mode, value="range", command=self.update_split_mode).pack(anchor="w")
-        tb.Radiobutton(mode_frame, text="Every N Pages", variable=self.split_mode, value="every_n", command=self.update_split_mode).pack(anchor="w")
-        tb.Radiobutton(mode_frame, text="Into N Equal Parts", variable=self.split_mode, value="equal_n", command=self.update_split_mode).pack(anchor="w")
-        tb.Radiobutton(mode_frame, text="By Bookmarks (if present)", variable=self.split_mode, value="bookmarks", command=self.update_split_mode).pack(anchor="w")
-        
-        # Page range
-        self.range_frame = tb.Labelframe(self.split_tab, text="Page Range", padding=10)
-        self.range_frame.pack(fill='x', padx=10, pady=5)
-        range_input_frame = tb.Frame(self.range_frame)
-        range_input_frame.pack(pady=5)
-        tb.Label(range_input_frame, text="From page:").pack(side="left", padx=5)
-        self.start_page = tb.StringVar()
-        tb.Entry(range_input_frame, textvariable=self.start_page, width=10).pack(side="left", padx=5)
-        tb.Label(range_input_frame, text="To page:").pack(side="left", padx=5)
-        self.end_page = tb.StringVar()
-        tb.Entry(range_input_frame, textvariable=self.end_page, width=10).pack(side="left", padx=5)
-        
-        # Every N pages
-        self.every_n_frame = tb.Labelframe(self.split_tab, text="Split Every N Pages", padding=10)
-        self.every_n_frame.pack(fill='x', padx=10, pady=5)
-        self.every_n_label = tb.Label(self.every_n_frame, text="N:")
-        self.every_n_label.pack(side="left", padx=5)
-        self.every_n_var = tb.StringVar()
-        self.every_n_entry = tb.Entry(self.every_n_frame, textvariable=self.every_n_var, width=10)
-        self.every_n_entry.pack(side="left", padx=5)
-        
-        # Equal N parts
-        self.equal_n_frame = tb.Labelframe(self.split_tab, text="Split Into N Equal Parts", padding=10)
-        self.equal_n_frame.pack(fill='x', padx=10, pady=5)
-        self.equal_n_label = tb.Label(self.equal_n_frame, text="N:")
-        self.equal_n_label.pack(side="left", padx=5)
-        self.equal_n_var = tb.StringVar()
-        self.equal_n_entry = tb.Entry(self.equal_n_frame, textvariable=self.equal_n_var, width=10)
-        self.equal_n_entry.pack(side="left", padx=5)
-        
-        # Bookmarks info
-        self.bookmarks_frame = tb.Labelframe(self.split_tab, text="Split by Bookmarks", padding=10)
-        self.bookmarks_frame.pack(fill='x', padx=10, pady=5)
-        self.bookmarks_label = tb.Label(self.bookmarks_frame, text="Splits at top-level bookmarks if present.")
-        self.bookmarks_label.pack(padx=5, pady=5)
-        
-        # Split button
-        split_btn = tb.Button(self.split_tab, text="Split PDF", command=self.smart_split_pdf)
-        split_btn.pack(pady=10)
-        self.update_split_mode()
-    
-    def setup_encrypt_tab(self):
-        # Title
-        title_label = tb.Label(self.encrypt_tab, text="Encrypt/Decrypt PDF", font=("Helvetica", 14, "bold"))
-        title_label.pack(pady=10)
-        
-        # File selection
-        file_frame = tb.Labelframe(self.encrypt_tab, text="Select PDF File(s)", padding=10)
-        file_frame.pack(fill='x', padx=10, pady=5)
-        
-        self.encrypt_file_paths = []
-        tb.Button(file_frame, text="Select PDF(s)", command=self.select_files_for_encrypt).pack(pady=5)
-        self.encrypt_files_label = tb.Label(file_frame, text="No file selected", wraplength=400)
-        self.encrypt_files_label.pack(pady=5)
-        
-        # Password
-        password_frame = tb.Labelframe(self.encrypt_tab, text="Password", padding=10)
-        password_frame.pack(fill='x', padx=10, pady=5)
-        self.password_var = tb.StringVar()
-        self.owner_password_var = tb.StringVar()
-        tb.Label(password_frame, text="User Password:").pack(pady=2)
-        tb.Entry(password_frame, textvariable=self.password_var, show="*", width=30).pack(pady=2)
-        tb.Label(password_frame, text="Owner Password (optional):").pack(pady=2)
-        tb.Entry(password_frame, textvariable=self.owner_password_var, show="*", width=30).pack(pady=2)
-        # Permissions
-        perm_frame = tb.Labelframe(self.encrypt_tab, text="Restrict Permissions", padding=10)
-        perm_frame.pack(fill='x', padx=10, pady=5)
-        self.perm_print = tb.BooleanVar(value=False)
-        self.perm_copy = tb.BooleanVar(value=False)
-        self.perm_edit = tb.BooleanVar(value=False)
-        tb.Checkbutton(perm_frame, text="Disallow Printing", variable=self.perm_print).pack(anchor='w')
-        tb.Checkbutton(perm_frame, text="Disallow Copying", variable=self.perm_copy).pack(anchor='w')
-        tb.Checkbutton(perm_frame, text="Disallow Editing", variable=self.perm_edit).pack(anchor='w')
-        
-        # Buttons
-        button_frame = tb.Frame(self.encrypt_tab)
-        button_frame.pack(pady=10)
-        
-        tb.Button(button_frame, text="Encrypt PDF(s)", command=self.encrypt_pdf_batch).pack(side="left", padx=5)
-        tb.Button(button_frame, text="Decrypt PDF", command=self.decrypt_pdf).pack(side="left", padx=5)
-    
-    def setup_rotate_tab(self):
-        # Title
-        title_label = tb.Label(self.rotate_tab, text="Rotate PDF Pages (Batch)", font=("Helvetica", 14, "bold"))
-        title_label.pack(pady=10)
-        
-        # File selection
-        file_frame = tb.Labelframe(self.rotate_tab, text="Select PDF File(s)", padding=10)
-        file_frame.pack(fill='x', padx=10, pady=5)
-
-        self.rotate_file_paths = []
-        tb.Button(file_frame, text="Select PDF(s)", command=self.select_files_for_rotate if hasattr(self, 'select_files_for_rotate') else lambda: None).pack(pady=5)
-        self.rotate_files_label = tb.Label(file_frame, text="No file selected", wraplength=400)
-        self.rotate_files_label.pack(pady=5)
-
-        # Page selection
-        page_frame = tb.Labelframe(self.rotate_tab, text="Page Selection", padding=10)
-        page_frame.pack(fill='x', padx=10, pady=5)
-        
-        tb.Label(page_frame, text="Enter page numbers to rotate (e.g., 1,3,5 or 2-4, leave empty for all):").pack(pady=5)
-        self.pages_to_rotate = tb.StringVar()
-        tb.Entry(page_frame, textvariable=self.pages_to_rotate, width=40).pack(pady=5)
-        
-        # Rotation angle
-        angle_frame = tb.Labelframe(self.rotate_tab, text="Rotation Angle", padding=10)
-        angle_frame.pack(fill='x', padx=10, pady=5)
-        
-        self.rotation_angle = tb.StringVar(value="90")
-        tb.Radiobutton(angle_frame, text="90° Clockwise", variable=self.rotation_angle, value="90").pack(anchor="w")
-        tb.Radiobutton(angle_frame, text="180°", variable=self.rotation_angle, value="180").pack(anchor="w")
-        tb.Radiobutton(angle_frame, text="270° Clockwise (90° Counter-clockwise)", variable=self.rotation_angle, value="270").pack(anchor="w")
-        
-        # Rotate button
-        rotate_btn = tb.Button(self.rotate_tab, text="Rotate PDF(s)", command=self.rotate_pages_batch)
-        rotate_btn.pack(pady=10)
-    
-    def setup_metadata_tab(self):
-        # Title
-        title_label = tb.Label(self.metadata_tab, text="PDF Metadata Editor", font=("Helvetica", 14, "bold"))
-        title_label.pack(pady=10)
-        # File selection
-        file_frame = tb.Labelframe(self.metadata_tab, text="Select PDF File", padding=10)
-        file_frame.pack(fill='x', padx=10, pady=5)
-        self.meta_file_path = tb.StringVar()
-        tb.Button(file_frame, text="Select PDF", command=self.select_file_for_metadata).pack(pady=5)
-        tb.Label(file_frame, textvariable=self.meta_file_path, wraplength=400).pack(pady=5)
-        # Metadata fields
-        meta_frame = tb.Labelframe(self.metadata_tab, text="Edit Metadata", padding=10)
-        meta_frame.pack(fill='x', padx=10, pady=5)
-        self.meta_title = tb.StringVar()
-        self.meta_author = tb.StringVar()
-        self.meta_subject = tb.StringVar()
-        self.meta_keywords = tb.StringVar()
-        tb.Label(meta_frame, text="Title:").grid(row=0, column=0, sticky='e', padx=5, pady=2)
-        tb.Entry(meta_frame, textvariable=self.meta_title, width=40).grid(row=0, column=1, padx=5, pady=2)
-        tb.Label(meta_frame, text="Author:").grid(row=1, column=0, sticky='e', padx=5, pady=2)
-        tb.Entry(meta_frame, textvariable=self.meta_author, width=40).grid(row=1, column=1, padx=5, pady=2)
-        tb.Label(meta_frame, text="Subject:").grid(row=2, column=0, sticky='e', padx=5, pady=2)
-        tb.Entry(meta_frame, textvariable=self.meta_subject, width=40).grid(row=2, column=1, padx=5, pady=2)
-        tb.Label(meta_frame, text="Keywords:").grid(row=3, column=0, sticky='e', padx=5, pady=2)
-        tb.Entry(meta_frame, textvariable=self.meta_keywords, width=40).grid(row=3, column=1, padx=5, pady=2)
-        # Buttons
-        btn_frame = tb.Frame(self.metadata_tab)
-        btn_frame.pack(pady=10)
-        tb.Button(btn_frame, text="Save Metadata", command=self.save_metadata).pack(side='left', padx=5)
-        tb.Button(btn_frame, text="Clear Metadata", command=self.clear_metadata).pack(side='left', padx=5)
-    
-    def create_undo_redo_buttons(self):
-        # Place Undo/Redo buttons at the top left
-        top_frame = ttk.Frame(self.window)
-        top_frame.pack(fill='x', side='top', anchor='nw')
-        self.undo_btn = tb.Button(top_frame, text="Undo", command=self.undo_action)
-        self.undo_btn.pack(side='left', padx=5, pady=5)
-        self.redo_btn = tb.Button(top_frame, text="Redo", command=self.redo_action)
-        self.redo_btn.pack(side='left', padx=5, pady=5)
-        self.update_undo_redo_buttons()
-    def update_undo_redo_buttons(self):
-        self.undo_btn.config(state="normal" if self.history_pointer >= 0 else "disabled")
-        self.redo_btn.config(state="normal" if self.history_pointer < len(self.history) - 1 else "disabled")
-    def add_history(self, action, file_path):
-        # Remove any redo history
-        self.history = self.history[:self.history_pointer+1]
-        self.history.append((action, file_path))
-        self.history_pointer += 1
-        self.update_undo_redo_buttons()
-    def undo_action(self):
-        if self.history_pointer >= 0:
-            action, file_path = self.history[self.history_pointer]
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    messagebox.showinfo("Undo", f"Undid {action}. Deleted {os.path.basename(file_path)}.")
-                except Exception as e:
-                    messagebox.showerror("Undo Error", f"Failed to delete {file_path}: {e}")
-            self.history_pointer -= 1
-            self.update_undo_redo_buttons()
-    def redo_action(self):
-        if self.history_pointer < len(self.history) - 1:
-            self.history_pointer += 1
-            action, file_path = self.history[self.history_pointer]
-            messagebox.showinfo("Redo", f"Redo: {action} (file {os.path.basename(file_path)})")
-            self.update_undo_redo_buttons()
-    
-    def create_progress_bar(self):
-        bottom_frame = ttk.Frame(self.window)
-        bottom_frame.pack(fill='x', side='bottom', anchor='s')
-        self.progress = ttk.Progressbar(bottom_frame, mode='indeterminate')
-        self.progress.pack(fill='x', padx=10, pady=2)
-        self.status_label = ttk.Label(bottom_frame, text="Ready")
-        self.status_label.pack(side='left', padx=10)
-    def start_progress(self, status="Processing..."):
-        self.progress.start(10)
-        self.status_label.config(text=status)
-        self.window.update_idletasks()
-    def stop_progress(self, status="Done"):
-        self.progress.stop()
-        self.status_label.config(text=status)
-        self.window.update_idletasks()
-    
-    # File selection methods
-    def select_files_for_merge(self):
-        files = filedialog.askopenfilenames(
-            title="Select PDF files to merge",
-            filetypes=[("PDF Files", "*.pdf")]
-        )
-        if files:
-            self.selected_files.extend(files)
-            self.update_files_listbox()
-    
-    def select_file_for_delete(self):
-        file_path = filedialog.askopenfilename(
-            title="Select PDF file",
-            filetypes=[("PDF Files", "*.pdf")]
-        )
-        if file_path:
-            self.delete_file_path.set(file_path)
-            self.delete_pdf_path = file_path
-            try:
-                self.delete_pdf_doc = fitz.open(file_path)
-                self.delete_total_pages = self.delete_pdf_doc.page_count
-            except Exception:
-                self.delete_pdf_doc = None
-                self.delete_total_pages = 1
-            self.delete_page_num.set(1)
-            self.update_delete_preview()
-    
-    def select_file_for_split(self):
-        file_path = filedialog.askopenfilename(
-            title="Select PDF file",
-            filetypes=[("PDF Files", "*.pdf")]
-        )
-        if file_path:
-            self.split_file_path.set(file_path)
-    
-    def select_files_for_encrypt(self):
-        files = filedialog.askopenfilenames(
-            title="Select PDF file(s)",
-            filetypes=[("PDF Files", "*.pdf")]
-        )
-        if files:
-            self.encrypt_file_paths = list(files)
-            self.encrypt_files_label.config(text="\n".join([os.path.basename(f) for f in self.encrypt_file_paths]))
-        else:
-            self.encrypt_file_paths = []
-            self.encrypt_files_label.config(text="No file selected")
-    
-    def select_file_for_rotate(self):  # type: ignore
-        file_path = filedialog.askopenfilename(
-            title="Select PDF file",
-            filetypes=[("PDF Files", "*.pdf")]
-        )
-        if file_path:
-            self.rotate_file_path = tb.StringVar(value=file_path)  # type: ignore
-    
-    def select_file_for_metadata(self):
-        file_path = filedialog.askopenfilename(
-            title="Select PDF file",
-            filetypes=[("PDF Files", "*.pdf")]
-        )
-        if file_path:
-            self.meta_file_path.set(file_path)
-            try:
-                reader = PdfReader(file_path)
-                info = reader.metadata
-                self.meta_title.set(info.title if info.title else "")  # type: ignore
-                self.meta_author.set(info.author if info.author else "")  # type: ignore
-                self.meta_subject.set(info.subject if info.subject else "")  # type: ignore
-                self.meta_keywords.set(info.keywords if info.keywords else "")  # type: ignore
-            except Exception:
-                self.meta_title.set("")
-                self.meta_author.set("")
-                self.meta_subject.set("")
-                self.meta_keywords.set("")
-    
-    # Merge with reordering methods
-    def update_files_listbox(self):
-        self.files_listbox.delete(0, tk.END)
-        for file_path in self.selected_files:
-            self.files_listbox.insert(tk.END, os.path.basename(file_path))
-    
-    def move_file_up(self):
-        selection = self.files_listbox.curselection()
-        if selection and selection[0] > 0:
-            index = selection[0]
-            self.selected_files[index], self.selected_files[index-1] = self.selected_files[index-1], self.selected_files[index]
-            self.update_files_listbox()
-            self.files_listbox.selection_set(index-1)
-    
-    def move_file_down(self):
-        selection = self.files_listbox.curselection()
-        if selection and selection[0] < len(self.selected_files) - 1:
-            index = selection[0]
-            self.selected_files[index], self.selected_files[index+1] = self.selected_files[index+1], self.selected_files[index]
-            self.update_files_listbox()
-            self.files_listbox.selection_set(index+1)
-    
-    def remove_file(self):
-        selection = self.files_listbox.curselection()
-        if selection:
-            index = selection[0]
-            del self.selected_files[index]
-            self.update_files_listbox()
-    
-    def clear_files(self):
-        self.selected_files.clear()
-        self.update_files_listbox()
-    
-    def merge_pdfs_with_reordering(self):
-        if not self.selected_files:
-            messagebox.showwarning("Warning", "Please select at least one PDF file.")
-            return
-        
-        save_path = filedialog.asksaveasfilename(
-            defaultextension=".pdf",
-            filetypes=[("PDF Files", "*.pdf")],
-            title="Save Merged PDF As"
-        )
-        
-        if save_path:
-            def do_merge():
-                self.start_progress("Merging PDFs...")
-                try:
-                    merger = PdfMerger()
-                    for pdf in self.selected_files:
-                        merger.append(pdf)
-                    merger.write(save_path)
-                    merger.close()
-                    messagebox.showinfo("Success", "PDFs merged successfully!")
-                    self.add_history('Merge PDFs', save_path)
-                except Exception as e:
-                    messagebox.showerror("Error", f"Error merging PDFs: {str(e)}")
-                self.stop_progress("Ready")
-            threading.Thread(target=do_merge).start()
-    
-    # Delete pages method
-    def delete_pages(self):
-        file_path = self.delete_file_path.get()
-        if not file_path:
-            messagebox.showwarning("Warning", "Please select a PDF file.")
-            return
-        
-        pages_input = self.pages_to_delete.get().strip()
-        if not pages_input:
-            messagebox.showwarning("Warning", "Please enter page numbers to delete.")
-            return
-        
-        try:
-            # Parse page numbers
-            pages_to_delete = self.parse_page_numbers(pages_input)
-            
-            # Read PDF
-            reader = PdfReader(file_path)
-            total_pages = len(reader.pages)
-            
-            # Validate page numbers
-            for page_num in pages_to_delete:
-                if page_num < 1 or page_num > total_pages:
-                    messagebox.showerror("Error", f"Page {page_num} is out of range (1-{total_pages})")
-                    return
-            
-            # Create new PDF without deleted pages
-            writer = PdfWriter()
-            for i in range(total_pages):
-                if i + 1 not in pages_to_delete:
-                    writer.add_page(reader.pages[i])
-            
-            # Save
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")],
-                title="Save PDF As"
-            )
-            
-            if save_path:
-                with open(save_path, 'wb') as output_file:
-                    writer.write(output_file)
-                messagebox.showinfo("Success", f"Pages {pages_to_delete} deleted successfully!")
-                self.add_history('Delete Pages', save_path)
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error deleting pages: {str(e)}")
-    
-    # Split PDF method
-    def update_split_mode(self):
-        mode = self.split_mode.get()
-        self.range_frame.pack_forget()
-        self.every_n_frame.pack_forget()
-        self.equal_n_frame.pack_forget()
-        self.bookmarks_frame.pack_forget()
-        if mode == "range":
-            self.range_frame.pack(fill='x', padx=10, pady=5)
-        elif mode == "every_n":
-            self.every_n_frame.pack(fill='x', padx=10, pady=5)
-        elif mode == "equal_n":
-            self.equal_n_frame.pack(fill='x', padx=10, pady=5)
-        elif mode == "bookmarks":
-            self.bookmarks_frame.pack(fill='x', padx=10, pady=5)
-    
-    def smart_split_pdf(self):
-        file_path = self.split_file_path.get()
-        if not file_path:
-            messagebox.showwarning("Warning", "Please select a PDF file.")
-            return
-        mode = self.split_mode.get()
-        try:
-            reader = PdfReader(file_path)
-            total_pages = len(reader.pages)
-            results = []
-            if mode == "range":
-                start = self.start_page.get().strip()
-                end = self.end_page.get().strip()
-                if not start or not end:
-                    messagebox.showwarning("Warning", "Please enter start and end page numbers.")
-                    return
-                start_page = int(start)
-                end_page = int(end)
-                if start_page < 1 or end_page > total_pages or start_page > end_page:
-                    messagebox.showerror("Error", f"Invalid page range. PDF has {total_pages} pages.")
-                    return
-                writer = PdfWriter()
-                for i in range(start_page - 1, end_page):
-                    writer.add_page(reader.pages[i])
-                save_path = filedialog.asksaveasfilename(
-                    defaultextension=".pdf",
-                    filetypes=[("PDF Files", "*.pdf")],
-                    title="Save Split PDF As"
-                )
-                if save_path:
-                    with open(save_path, 'wb') as output_file:
-                        writer.write(output_file)
-                    results.append(f"Pages {start_page}-{end_page}: Success")
-                    self.add_history('Split PDF (Range)', save_path)
-            elif mode == "every_n":
-                n = int(self.every_n_var.get())
-                part = 1
-                for i in range(0, total_pages, n):
-                    writer = PdfWriter()
-                    for j in range(i, min(i + n, total_pages)):
-                        writer.add_page(reader.pages[j])
-                    save_path = filedialog.asksaveasfilename(
-                        defaultextension=".pdf",
-                        filetypes=[("PDF Files", "*.pdf")],
-                        title=f"Save Part {part} (pages {i+1}-{min(i+n, total_pages)})"
-                    )
-                    if save_path:
-                        with open(save_path, 'wb') as output_file:
-                            writer.write(output_file)
-                        results.append(f"Part {part} (pages {i+1}-{min(i+n, total_pages)}): Success")
-                        self.add_history('Split PDF (Every N)', save_path)
-                    part += 1
-            elif mode == "equal_n":
-                n = int(self.equal_n_var.get())
-                pages_per_part = total_pages // n
-                extra = total_pages % n
-                start = 0
-                for part in range(1, n+1):
-                    end = start + pages_per_part + (1 if part <= extra else 0)
-                    writer = PdfWriter()
-                    for j in range(start, end):
-                        writer.add_page(reader.pages[j])
-                    save_path = filedialog.asksaveasfilename(
-                        defaultextension=".pdf",
-                        filetypes=[("PDF Files", "*.pdf")],
-                        title=f"Save Part {part} (pages {start+1}-{end})"
-                    )
-                    if save_path:
-                        with open(save_path, 'wb') as output_file:
-                            writer.write(output_file)
-                        results.append(f"Part {part} (pages {start+1}-{end}): Success")
-                        self.add_history('Split PDF (Equal N)', save_path)
-                    start = end
-            elif mode == "bookmarks":
-                # Find top-level bookmarks (outlines)
-                outlines = []
-                try:
-                    outlines = reader.outline
-                except Exception:
-                    pass
-                if not outlines:
-                    messagebox.showinfo("No Bookmarks", "No bookmarks found in this PDF.")
-                    return
-                # Only handle top-level bookmarks
-                page_indices = []
-                for item in outlines:
-                    if hasattr(item, 'page') and item.page is not None:  # type: ignore
-                        page_indices.append(item.page)  # type: ignore
-                page_indices = sorted(set(page_indices))
-                page_indices.append(total_pages)  # Add end
-                for idx in range(len(page_indices)-1):
-                    start = page_indices[idx]
-                    end = page_indices[idx+1]
-                    writer = PdfWriter()
-                    for j in range(start, end):
-                        writer.add_page(reader.pages[j])
-                    save_path = filedialog.asksaveasfilename(
-                        defaultextension=".pdf",
-                        filetypes=[("PDF Files", "*.pdf")],
-                        title=f"Save Section {idx+1} (pages {start+1}-{end})"
-                    )
-                    if save_path:
-                        with open(save_path, 'wb') as output_file:
-                            writer.write(output_file)
-                        results.append(f"Section {idx+1} (pages {start+1}-{end}): Success")
-                        self.add_history('Split PDF (Bookmarks)', save_path)
-            if results:
-                messagebox.showinfo("Split Results", "\n".join(results))
-        except Exception as e:
-            messagebox.showerror("Error", f"Error splitting PDF: {str(e)}")
-    
-    # Encrypt/Decrypt methods
-    def encrypt_pdf(self):
-        file_path = self.encrypt_file_path.get()  # type: ignore
-        if not file_path:
-            messagebox.showwarning("Warning", "Please select a PDF file.")
-            return
-        
-        password = self.password_var.get()
-        if not password:
-            messagebox.showwarning("Warning", "Please enter a password.")
-            return
-        
-        try:
-            # Read PDF
-            reader = PdfReader(file_path)
-            writer = PdfWriter()
-            
-            # Add all pages
-            for page in reader.pages:
-                writer.add_page(page)
-            
-            # Encrypt
-            writer.encrypt(password)
-            
-            # Save
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")],
-                title="Save Encrypted PDF As"
-            )
-            
-            if save_path:
-                with open(save_path, 'wb') as output_file:
-                    writer.write(output_file)
-                messagebox.showinfo("Success", "PDF encrypted successfully!")
-                self.add_history('Encrypt PDF', save_path)
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error encrypting PDF: {str(e)}")
-    
-    def decrypt_pdf(self):
-        file_path = self.encrypt_file_path.get()  # type: ignore
-        if not file_path:
-            messagebox.showwarning("Warning", "Please select a PDF file.")
-            return
-        
-        password = self.password_var.get()
-        if not password:
-            messagebox.showwarning("Warning", "Please enter the password.")
-            return
-        
-        try:
-            # Read PDF
-            reader = PdfReader(file_path)
-            
-            # Try to decrypt
-            if reader.is_encrypted:
-                reader.decrypt(password)
-            else:
-                messagebox.showinfo("Info", "This PDF is not encrypted.")
-                return
-            
-            # Create new PDF
-            writer = PdfWriter()
-            for page in reader.pages:
-                writer.add_page(page)
-            
-            # Save
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")],
-                title="Save Decrypted PDF As"
-            )
-            
-            if save_path:
-                with open(save_path, 'wb') as output_file:
-                    writer.write(output_file)
-                messagebox.showinfo("Success", "PDF decrypted successfully!")
-                self.add_history('Decrypt PDF', save_path)
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error decrypting PDF: {str(e)}")
-    
-    def encrypt_pdf_batch(self):
-        file_paths = self.encrypt_file_paths
-        if not file_paths:
-            messagebox.showwarning("Warning", "Please select at least one PDF file.")
-            return
-        user_password = self.password_var.get()
-        owner_password = self.owner_password_var.get() or None
-        if not user_password:
-            messagebox.showwarning("Warning", "Please enter a user password.")
-            return
-        # Permissions
-        from PyPDF2.constants import Permissions  # type: ignore
-        permissions = set()  # type: ignore
-        if not self.perm_print.get():
-            permissions.add(Permissions.PRINTING)  # type: ignore
-        if not self.perm_copy.get():
-            permissions.add(Permissions.COPYING)  # type: ignore
-        if not self.perm_edit.get():
-            permissions.add(Permissions.MODIFYING)  # type: ignore
-        results = []
-        for file_path in file_paths:
-            try:
-                reader = PdfReader(file_path)
-                writer = PdfWriter()
-                for page in reader.pages:
-                    writer.add_page(page)
-                # Advanced encryption
-                writer.encrypt(
-                    user_password,
-                    owner_password,
-                    permissions=permissions if permissions else None  # type: ignore
-                )  # type: ignore
-                save_path = filedialog.asksaveasfilename(
-                    defaultextension=".pdf",
-                    filetypes=[("PDF Files", "*.pdf")],
-                    title=f"Save Encrypted PDF As (for {os.path.basename(file_path)})"
-                )
-                if save_path:
-                    with open(save_path, 'wb') as output_file:
-                        writer.write(output_file)
-                    results.append(f"{os.path.basename(file_path)}: Success")
-                    self.add_history('Batch Encrypt PDF', save_path)
-                else:
-                    results.append(f"{os.path.basename(file_path)}: Skipped (no save path)")
-            except Exception as e:
-                results.append(f"{os.path.basename(file_path)}: Error - {str(e)}")
-        messagebox.showinfo("Batch Encryption Results", "\n".join(results))
-    
-    # Rotate pages method
-    def rotate_pages(self):
-        file_path = self.rotate_file_path.get()  # type: ignore
-        if not file_path:
-            messagebox.showwarning("Warning", "Please select a PDF file.")
-            return
-        
-        pages_input = self.pages_to_rotate.get().strip()
-        angle = int(self.rotation_angle.get())
-        
-        try:
-            # Read PDF
-            reader = PdfReader(file_path)
-            total_pages = len(reader.pages)
-            
-            # Determine which pages to rotate
-            if pages_input:
-                pages_to_rotate = self.parse_page_numbers(pages_input)
-                # Validate page numbers
-                for page_num in pages_to_rotate:
-                    if page_num < 1 or page_num > total_pages:
-                        messagebox.showerror("Error", f"Page {page_num} is out of range (1-{total_pages})")
-                        return
-            else:
-                # Rotate all pages
-                pages_to_rotate = list(range(1, total_pages + 1))
-            
-            # Create new PDF with rotated pages
-            writer = PdfWriter()
-            for i in range(total_pages):
-                page = reader.pages[i]
-                if i + 1 in pages_to_rotate:
-                    page.rotate(angle)
-                writer.add_page(page)
-            
-            # Save
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")],
-                title="Save Rotated PDF As"
-            )
-            
-            if save_path:
-                with open(save_path, 'wb') as output_file:
-                    writer.write(output_file)
-                messagebox.showinfo("Success", f"Pages rotated successfully!")
-                self.add_history('Rotate PDF', save_path)
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error rotating pages: {str(e)}")
-    
-    def rotate_pages_batch(self):
-        file_paths = self.rotate_file_paths
-        if not file_paths:
-            messagebox.showwarning("Warning", "Please select at least one PDF file.")
-            return
-        pages_input = self.pages_to_rotate.get().strip()
-        angle = int(self.rotation_angle.get())
-        results = []
-        for file_path in file_paths:
-            try:
-                reader = PdfReader(file_path)
-                total_pages = len(reader.pages)
-                if pages_input:
-                    pages_to_rotate = self.parse_page_numbers(pages_input)
-                    for page_num in pages_to_rotate:
-                        if page_num < 1 or page_num > total_pages:
-                            results.append(f"{os.path.basename(file_path)}: Page {page_num} out of range")
-                            continue
-                else:
-                    pages_to_rotate = list(range(1, total_pages + 1))
-                writer = PdfWriter()
-                for i in range(total_pages):
-                    page = reader.pages[i]
-                    if i + 1 in pages_to_rotate:
-                        page.rotate(angle)
-                    writer.add_page(page)
-                save_path = filedialog.asksaveasfilename(
-                    defaultextension=".pdf",
-                    filetypes=[("PDF Files", "*.pdf")],
-                    title=f"Save Rotated PDF As (for {os.path.basename(file_path)})"
-                )
-                if save_path:
-                    with open(save_path, 'wb') as output_file:
-                        writer.write(output_file)
-                    results.append(f"{os.path.basename(file_path)}: Success")
-                    self.add_history('Batch Rotate PDF', save_path)
-                else:
-                    results.append(f"{os.path.basename(file_path)}: Skipped (no save path)")
-            except Exception as e:
-                results.append(f"{os.path.basename(file_path)}: Error - {str(e)}")
-        messagebox.showinfo("Batch Rotation Results", "\n".join(results))
-    
-    # Utility method to parse page numbers
-    def parse_page_numbers(self, input_str: str) -> List[int]:
-        """Parse page numbers from string like '1,3,5' or '2-4' or '1,3-5,7'"""
-        pages = set()
-        parts = input_str.split(',')
-        
-        for part in parts:
-            part = part.strip()
-            if '-' in part:
-                start, end = part.split('-')
-                start = int(start.strip())
-                end = int(end.strip())
-                pages.update(range(start, end + 1))
-            else:
-                pages.add(int(part))
-        
-        return sorted(list(pages))
-    
-    def update_delete_preview(self):
-        page_num = self.delete_page_num.get()
-        total = self.delete_total_pages
-        self.delete_page_label.config(text=f"Page {page_num}/{total}")
-        self.delete_slider.config(from_=1, to=total, state="normal" if total > 1 else "disabled")
-        self.delete_slider.set(page_num)
-        self.delete_prev_btn.config(state="normal" if page_num > 1 else "disabled")
-        self.delete_next_btn.config(state="normal" if page_num < total else "disabled")
-        if self.delete_pdf_doc:
-            self.show_pdf_preview(self.delete_pdf_path, self.delete_preview_label, page_num-1)
-        else:
-            self.delete_preview_label.config(text="Preview unavailable")
-    def delete_prev_page(self):
-        if self.delete_page_num.get() > 1:
-            self.delete_page_num.set(self.delete_page_num.get() - 1)
-            self.update_delete_preview()
-    def delete_next_page(self):
-        if self.delete_page_num.get() < self.delete_total_pages:
-            self.delete_page_num.set(self.delete_page_num.get() + 1)
-            self.update_delete_preview()
-    def delete_slider_move(self, val):
-        val = int(float(val))
-        if val != self.delete_page_num.get():
-            self.delete_page_num.set(val)
-            self.update_delete_preview()
-    
-    def show_pdf_preview(self, file_path, label_widget, page_number=0):
-        try:
-            doc = fitz.open(file_path)
-            page = doc.load_page(page_number)
-            try:
-                pix = page.get_pixmap(matrix=fitz.Matrix(0.3, 0.3))  # type: ignore
-            except AttributeError:
-                pix = page.getPixmap(matrix=fitz.Matrix(0.3, 0.3))  # type: ignore
-            mode = "RGB" if pix.n < 4 else "RGBA"
-            img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
-            img_tk = ImageTk.PhotoImage(img)
-            label_widget.configure(image=img_tk, text="")  # type: ignore
-            label_widget.image = img_tk  # type: ignore
-        except Exception as e:
-            label_widget.configure(text=f"Preview unavailable: {e}", image=None)  # type: ignore
-            label_widget.image = None  # type: ignore
-    
-    def ocr_current_page(self):
-        file_path = self.delete_pdf_path
-        page_num = self.delete_page_num.get() - 1
-        try:
-            doc = fitz.open(file_path)
-            page = doc.load_page(page_num)
-            try:
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-            except AttributeError:
-                pix = page.getPixmap(matrix=fitz.Matrix(2, 2))
-            mode = "RGB" if pix.n < 4 else "RGBA"
-            img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
-            text = pytesseract.image_to_string(img)
-            self.show_ocr_result(text)
-        except Exception as e:
-            messagebox.showerror("OCR Error", f"Failed to extract text: {e}")
-
-    def show_ocr_result(self, text):
-        ocr_win = tb.Toplevel(self.window)
-        ocr_win.title("OCR Result")
-        ocr_win.geometry("600x400")
-        text_widget = tb.Text(ocr_win, wrap="word")
-        text_widget.insert("1.0", text)
-        text_widget.pack(fill="both", expand=True)
-        def save_txt():
-            save_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text Files", "*.txt")], title="Save OCR Text As")
-            if save_path:
-                with open(save_path, 'w', encoding='utf-8') as f:
-                    f.write(text_widget.get("1.0", "end-1c"))
-        save_btn = tb.Button(ocr_win, text="Save as .txt", command=save_txt)
-        save_btn.pack(pady=5)
-    
-    def save_metadata(self):
-        file_path = self.meta_file_path.get()
-        if not file_path:
-            messagebox.showwarning("Warning", "Please select a PDF file.")
-            return
-        try:
-            reader = PdfReader(file_path)
-            writer = PdfWriter()
-            for page in reader.pages:
-                writer.add_page(page)
-            metadata = {
-                '/Title': self.meta_title.get(),
-                '/Author': self.meta_author.get(),
-                '/Subject': self.meta_subject.get(),
-                '/Keywords': self.meta_keywords.get(),
-            }
-            writer.add_metadata(metadata)
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")],
-                title="Save PDF with New Metadata"
-            )
-            if save_path:
-                with open(save_path, 'wb') as output_file:
-                    writer.write(output_file)
-                messagebox.showinfo("Success", "Metadata saved successfully!")
-                self.add_history('Save Metadata', save_path)
-        except Exception as e:
-            messagebox.showerror("Error", f"Error saving metadata: {e}")
-    def clear_metadata(self):
-        self.meta_title.set("")
-        self.meta_author.set("")
-        self.meta_subject.set("")
-        self.meta_keywords.set("")
-    
-    def run(self):
-        self.window.mainloop()
-
-if __name__ == "__main__":
-    app = PDFToolbox()
-    app.run()
+import tkinter as tk
+import ttkbootstrap as tb
+from ttkbootstrap.constants import *
+from tkinter import ttk, filedialog, messagebox, simpledialog
+import os
+import importlib
+import threading
+import time
+import queue
+import sys
+from page_ranges import PAGE_SYNTAX_HELP, PageRangeSet
+from job_scheduler import JobCancelled, JobScheduler, SchedulerFull
+from progress import Progress
+from profiling import CPROFILE, TRACEMALLOC, configure_from_environment, tracer
+
+SPLIT_NAME_TEMPLATES = {
+    "range": "{stem}_part{part}.pdf",
+    "bookmarks": "{stem}_{part:02d}_{title}.pdf",
+}
+
+class LazyModule:
+    """A module imported on first attribute access, so startup does not wait for fitz, PyPDF2 or pytesseract."""
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def __getattr__(self, attribute):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+ops = LazyModule("pdf_operations")
+pdf_ocr = LazyModule("pdf_ocr")
+page_preview = LazyModule("page_preview")
+thumbnails = LazyModule("thumbnails")
+document_pool = LazyModule("document_pool")
+
+class ThumbnailGrid:
+    """Scrollable grid of page thumbnails for picking pages.
+
+    Only the rows in view have canvas items and images; scrolling drops the rows that leave the
+    view and asks the thumbnail pool for the ones that enter it, so a 5,000-page document costs
+    no more memory than a screenful. Click toggles a page, Shift+click selects a range.
+    """
+    PAD = 6
+    LABEL_HEIGHT = 16
+    
+    def __init__(self, parent, pool, page_count, selected, on_change):
+        self.pool = pool
+        self.page_count = page_count
+        self.selected = set(selected)
+        self.on_change = on_change
+        self.anchor = None
+        self.cell_width = pool.size[0] + 2 * self.PAD
+        self.cell_height = pool.size[1] + self.LABEL_HEIGHT + 2 * self.PAD
+        self.columns = 0
+        self.cells = {}  # page -> {'frame': item, 'image': item or None, 'photo': PhotoImage}
+        self.polling = False
+        self.canvas = tk.Canvas(parent, bg="#222", highlightthickness=0)
+        scrollbar = tb.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.bind("<Configure>", self.layout)
+        self.canvas.bind("<Button-1>", self.click)
+        self.canvas.bind("<Shift-Button-1>", lambda event: self.click(event, extend=True))
+        self.canvas.bind("<MouseWheel>", lambda event: self.yview("scroll", -1 if event.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda event: self.yview("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.yview("scroll", 1, "units"))
+    
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.refresh()
+    
+    def layout(self, event=None):
+        columns = max(1, self.canvas.winfo_width() // self.cell_width)
+        if columns != self.columns:
+            self.columns = columns
+            for page in list(self.cells):
+                self.drop_cell(page)
+        rows = -(-self.page_count // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, self.columns * self.cell_width, rows * self.cell_height),
+                              yscrollincrement=self.cell_height // 2)
+        self.refresh()
+    
+    def visible_pages(self):
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first = int(top // self.cell_height) * self.columns + 1
+        last = (int(bottom // self.cell_height) + 1) * self.columns
+        return range(max(first, 1), min(last, self.page_count) + 1)
+    
+    def refresh(self):
+        if not self.columns:
+            return
+        visible = self.visible_pages()
+        for page in list(self.cells):
+            if page not in visible:
+                self.drop_cell(page)
+        for page in visible:
+            if page not in self.cells:
+                self.draw_cell(page)
+        # Pages scrolled past before their turn came are not worth rendering any more
+        self.pool.cancel(page - 1 for page in visible)
+        cached = self.pool.request(page - 1 for page in visible if self.cells[page]['image'] is None)
+        for number, path in cached.items():
+            self.show_thumbnail(number + 1, path)
+        if self.pool.pending() and not self.polling:
+            self.polling = True
+            self.canvas.after(50, self.poll)
+    
+    def poll(self):
+        if not self.canvas.winfo_exists():
+            return
+        for number, result in self.pool.finished():
+            if number + 1 in self.cells:
+                self.show_thumbnail(number + 1, result)
+        if self.pool.pending():
+            self.canvas.after(50, self.poll)
+        else:
+            self.polling = False
+    
+    def draw_cell(self, page):
+        row, column = divmod(page - 1, self.columns)
+        x, y = column * self.cell_width, row * self.cell_height
+        frame = self.canvas.create_rectangle(x + 2, y + 2, x + self.cell_width - 2, y + self.cell_height - 2,
+                                             width=3, outline=self.outline(page))
+        label = self.canvas.create_text(x + self.cell_width // 2, y + self.cell_height - self.PAD - self.LABEL_HEIGHT // 2,
+                                        text=str(page), fill="#eee")
+        self.cells[page] = {'frame': frame, 'label': label, 'image': None, 'photo': None}
+    
+    def drop_cell(self, page):
+        cell = self.cells.pop(page)
+        self.canvas.delete(cell['frame'], cell['label'])
+        if cell['image'] is not None:
+            self.canvas.delete(cell['image'])
+    
+    def show_thumbnail(self, page, path):
+        cell = self.cells[page]
+        if isinstance(path, Exception):
+            self.canvas.itemconfig(cell['label'], text=f"{page} (unreadable)")
+            return
+        row, column = divmod(page - 1, self.columns)
+        from PIL import Image, ImageTk
+        photo = ImageTk.PhotoImage(Image.open(path))
+        x = column * self.cell_width + self.cell_width // 2
+        y = row * self.cell_height + self.PAD + self.pool.size[1] // 2
+        if cell['image'] is not None:
+            self.canvas.delete(cell['image'])
+        cell['image'] = self.canvas.create_image(x, y, image=photo)
+        cell['photo'] = photo
+    
+    def outline(self, page):
+        return "#e74c3c" if page in self.selected else "#444"
+    
+    def click(self, event, extend=False):
+        column = int(self.canvas.canvasx(event.x) // self.cell_width)
+        row = int(self.canvas.canvasy(event.y) // self.cell_height)
+        page = row * self.columns + column + 1
+        if column >= self.columns or page > self.page_count:
+            return
+        if extend and self.anchor is not None:
+            changed = range(min(self.anchor, page), max(self.anchor, page) + 1)
+            self.selected.update(changed)
+        else:
+            changed = [page]
+            self.selected.symmetric_difference_update(changed)
+            self.anchor = page
+        for changed_page in changed:
+            if changed_page in self.cells:
+                self.canvas.itemconfig(self.cells[changed_page]['frame'], outline=self.outline(changed_page))
+        self.on_change(self.selected)
+
+class PDFToolbox:
+    def __init__(self):
+        self.window = tb.Window(themename="darkly")
+        self.window.title("PDF Toolbox - Advanced PDF Operations")
+        self.window.geometry("700x600")
+        self.window.resizable(True, True)
+        self.create_diagnostics_menu()
+        self.history = []
+        self.history_pointer = -1
+        self.create_undo_redo_buttons()
+        self.selected_files = []
+        self._documents = None
+        self.jobs = JobScheduler(self.window.after)
+        self.active_jobs = 0
+        # Delete tab state that run() cleans up, whether or not the tab was ever built
+        self.delete_pdf_doc = None
+        self.delete_pdf_handle = None
+        self.delete_pdf_path = None
+        self.delete_preview_renderer = None
+        self.ocr_cache = None
+        self.setup_ui()
+        self.create_progress_bar()
+        
+    def setup_ui(self):
+        # Create notebook for tabs
+        notebook = ttk.Notebook(self.window)
+        notebook.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        # Create tabs
+        self.merge_tab = ttk.Frame(notebook)
+        self.delete_tab = ttk.Frame(notebook)
+        self.split_tab = ttk.Frame(notebook)
+        self.encrypt_tab = ttk.Frame(notebook)
+        self.rotate_tab = ttk.Frame(notebook)
+        self.metadata_tab = ttk.Frame(notebook)
+        
+        notebook.add(self.merge_tab, text="Merge PDFs")
+        notebook.add(self.delete_tab, text="Delete Pages")
+        notebook.add(self.split_tab, text="Split PDF")
+        notebook.add(self.encrypt_tab, text="Encrypt/Decrypt")
+        notebook.add(self.rotate_tab, text="Rotate Pages")
+        notebook.add(self.metadata_tab, text="Metadata Editor")
+        
+        # Tabs are built when first selected; most sessions only ever use one
+        self.notebook = notebook
+        self.tab_builders = {
+            str(self.merge_tab): self.setup_merge_tab,
+            str(self.delete_tab): self.setup_delete_tab,
+            str(self.split_tab): self.setup_split_tab,
+            str(self.encrypt_tab): self.setup_encrypt_tab,
+            str(self.rotate_tab): self.setup_rotate_tab,
+            str(self.metadata_tab): self.setup_metadata_tab,
+        }
+        notebook.bind("<<NotebookTabChanged>>", self.build_selected_tab)
+        self.build_selected_tab()
+    
+    def build_selected_tab(self, event=None):
+        builder = self.tab_builders.pop(str(self.notebook.select()), None)
+        if builder is not None:
+            builder()
+    
+    @property
+    def documents(self):
+        # Created on first use, as the pool brings in fitz and PyPDF2
+        if self._documents is None:
+            self._documents = document_pool.DocumentPool()
+        return self._documents
+    
+    def setup_merge_tab(self):
+        # Title
+        title_label = tb.Label(self.merge_tab, text="Merge PDFs with Reordering", font=("Helvetica", 14, "bold"))
+        title_label.pack(pady=10)
+        
+        # File selection frame
+        file_frame = tb.Labelframe(self.merge_tab, text="Select PDF Files", padding=10)
+        file_frame.pack(fill='x', padx=10, pady=5)
+        
+        select_btn = tb.Button(file_frame, text="Select PDF Files", command=self.select_files_for_merge)
+        select_btn.pack(pady=5)
+        
+        # Files listbox with scrollbar
+        list_frame = tb.Frame(file_frame)
+        list_frame.pack(fill='both', expand=True, pady=5)
+        
+        self.files_listbox = tk.Listbox(list_frame, height=8, bg="#222", fg="#eee", selectbackground="#444", selectforeground="#fff", highlightbackground="#333", relief="flat")
+        scrollbar = tb.Scrollbar(list_frame, orient="vertical", command=self.files_listbox.yview)
+        self.files_listbox.configure(yscrollcommand=scrollbar.set)
+        
+        self.files_listbox.pack(side="left", fill="both", expand=True, padx=(0, 2))
+        scrollbar.pack(side="right", fill="y")
+        
+        # Reorder buttons
+        reorder_frame = tb.Frame(file_frame)
+        reorder_frame.pack(pady=5)
+        
+        tb.Button(reorder_frame, text="Move Up", command=self.move_file_up).pack(side="left", padx=2)
+        tb.Button(reorder_frame, text="Move Down", command=self.move_file_down).pack(side="left", padx=2)
+        tb.Button(reorder_frame, text="Remove", command=self.remove_file).pack(side="left", padx=2)
+        tb.Button(reorder_frame, text="Clear All", command=self.clear_files).pack(side="left", padx=2)
+        
+        self.merge_dedupe = tb.BooleanVar(value=True)
+        tb.Checkbutton(self.merge_tab, text="Store repeated fonts, images and color profiles once",
+                       variable=self.merge_dedupe).pack(pady=5)
+        
+        # Merge button
+        merge_btn = tb.Button(self.merge_tab, text="Merge PDFs", command=self.merge_pdfs_with_reordering)
+        merge_btn.pack(pady=10)
+    
+    def setup_delete_tab(self):
+        # Title
+        title_label = tb.Label(self.delete_tab, text="Delete Pages from PDF", font=("Helvetica", 14, "bold"))
+        title_label.pack(pady=10)
+        
+        # File selection
+        file_frame = tb.Labelframe(self.delete_tab, text="Select PDF File", padding=10)
+        file_frame.pack(fill='x', padx=10, pady=5)
+        
+        self.delete_file_path = tb.StringVar()
+        tb.Button(file_frame, text="Select PDF", command=self.select_file_for_delete).pack(pady=5)
+        tb.Label(file_frame, textvariable=self.delete_file_path, wraplength=400).pack(pady=5)
+        
+        # PDF Preview (thumbnail)
+        self.delete_preview_label = tb.Label(self.delete_tab)
+        self.delete_preview_label.pack(pady=5)
+        # OCR button
+        self.ocr_btn = tb.Button(self.delete_tab, text="🧠 OCR This Page", command=self.ocr_current_page)  # type: ignore
+        self.ocr_btn.pack(pady=2)
+        self.ocr_all_btn = tb.Button(self.delete_tab, text="🧠 OCR All Pages", command=self.ocr_document)  # type: ignore
+        self.ocr_all_btn.pack(pady=2)
+        self.ocr_pdf_btn = tb.Button(self.delete_tab, text="🧠 Save Searchable PDF", command=self.save_searchable_pdf)  # type: ignore
+        self.ocr_pdf_btn.pack(pady=2)
+        
+        # Multi-page preview navigation
+        nav_frame = tb.Frame(self.delete_tab)
+        nav_frame.pack(pady=2)
+        self.delete_page_num = tb.IntVar(value=1)
+        self.delete_total_pages = 1
+        self.delete_preview_results = queue.Queue()
+        self.delete_preview_wanted = None
+        self.delete_preview_polling = False
+        self.delete_prev_btn = tb.Button(nav_frame, text="Previous", command=self.delete_prev_page, state="disabled")
+        self.delete_prev_btn.pack(side="left", padx=2)
+        self.delete_page_label = tb.Label(nav_frame, text="Page 1/1")
+        self.delete_page_label.pack(side="left", padx=4)
+        self.delete_next_btn = tb.Button(nav_frame, text="Next", command=self.delete_next_page, state="disabled")
+        self.delete_next_btn.pack(side="left", padx=2)
+        self.delete_slider = ttk.Scale(nav_frame, from_=1, to=1, orient="horizontal", command=self.delete_slider_move, state="disabled", length=200)
+        self.delete_slider.pack(side="left", padx=8)
+        
+        # Page selection
+        page_frame = tb.Labelframe(self.delete_tab, text="Select Pages to Delete", padding=10)
+        page_frame.pack(fill='x', padx=10, pady=5)
+        
+        tb.Label(page_frame, text=f"Enter pages to delete ({PAGE_SYNTAX_HELP}):", wraplength=500).pack(pady=5)
+        self.pages_to_delete = tb.StringVar()
+        tb.Entry(page_frame, textvariable=self.pages_to_delete, width=40).pack(pady=5)
+        tb.Button(page_frame, text="Pick Pages...",
+                  command=lambda: self.open_page_picker(self.delete_pdf_path, self.pages_to_delete, "Select Pages to Delete")).pack(pady=2)
+        self.delete_incremental = tb.BooleanVar(value=True)
+        tb.Checkbutton(page_frame, text="Fast save (append an update instead of rewriting the file)", variable=self.delete_incremental).pack(anchor='w')
+        
+        # Delete button
+        delete_btn = tb.Button(self.delete_tab, text="Delete Pages", command=self.delete_pages)
+        delete_btn.pack(pady=10)
+    
+    def setup_split_tab(self):
+        # Title
+        title_label = tb.Label(self.split_tab, text="Split PDF by Page Range or Smart Suggestions", font=("Helvetica", 14, "bold"))
+        title_label.pack(pady=10)
+        
+        # File selection
+        file_frame = tb.Labelframe(self.split_tab, text="Select PDF File", padding=10)
+        file_frame.pack(fill='x', padx=10, pady=5)
+        
+        self.split_file_path = tb.StringVar()
+        tb.Button(file_frame, text="Select PDF", command=self.select_file_for_split).pack(pady=5)
+        tb.Label(file_frame, textvariable=self.split_file_path, wraplength=400).pack(pady=5)
+        
+        # Split mode selection
+        mode_frame = tb.Labelframe(self.split_tab, text="Split Mode", padding=10)
+        mode_frame.pack(fill='x', padx=10, pady=5)
+        self.split_mode = tb.StringVar(value="range")
+        tb.Radiobutton(mode_frame, text="By Page Range", variable=self.split_mode, value="range", command=self.update_split_mode).pack(anchor="w")
+        tb.Radiobutton(mode_frame, text="Every N Pages", variable=self.split_mode, value="every_n", command=self.update_split_mode).pack(anchor="w")
+        tb.Radiobutton(mode_frame, text="Into N Equal Parts", variable=self.split_mode, value="equal_n", command=self.update_split_mode).pack(anchor="w")
+        tb.Radiobutton(mode_frame, text="By Bookmarks (if present)", variable=self.split_mode, value="bookmarks", command=self.update_split_mode).pack(anchor="w")
+        
+        # Page range
+        self.range_frame = tb.Labelframe(self.split_tab, text="Page Range", padding=10)
+        self.range_frame.pack(fill='x', padx=10, pady=5)
+        range_input_frame = tb.Frame(self.range_frame)
+        range_input_frame.pack(pady=5)
+        tb.Label(range_input_frame, text="From page:").pack(side="left", padx=5)
+        self.start_page = tb.StringVar()
+        tb.Entry(range_input_frame, textvariable=self.start_page, width=10).pack(side="left", padx=5)
+        tb.Label(range_input_frame, text="To page:").pack(side="left", padx=5)
+        self.end_page = tb.StringVar()
+        tb.Entry(range_input_frame, textvariable=self.end_page, width=10).pack(side="left", padx=5)
+        
+        # Every N pages
+        self.every_n_frame = tb.Labelframe(self.split_tab, text="Split Every N Pages", padding=10)
+        self.every_n_frame.pack(fill='x', padx=10, pady=5)
+        self.every_n_label = tb.Label(self.every_n_frame, text="N:")
+        self.every_n_label.pack(side="left", padx=5)
+        self.every_n_var = tb.StringVar()
+        self.every_n_entry = tb.Entry(self.every_n_frame, textvariable=self.every_n_var, width=10)
+        self.every_n_entry.pack(side="left", padx=5)
+        
+        # Equal N parts
+        self.equal_n_frame = tb.Labelframe(self.split_tab, text="Split Into N Equal Parts", padding=10)
+        self.equal_n_frame.pack(fill='x', padx=10, pady=5)
+        self.equal_n_label = tb.Label(self.equal_n_frame, text="N:")
+        self.equal_n_label.pack(side="left", padx=5)
+        self.equal_n_var = tb.StringVar()
+        self.equal_n_entry = tb.Entry(self.equal_n_frame, textvariable=self.equal_n_var, width=10)
+        self.equal_n_entry.pack(side="left", padx=5)
+        
+        # Bookmarks info
+        self.bookmarks_frame = tb.Labelframe(self.split_tab, text="Split by Bookmarks", padding=10)
+        self.bookmarks_frame.pack(fill='x', padx=10, pady=5)
+        self.bookmarks_label = tb.Label(self.bookmarks_frame, text="Splits at bookmarks; {title} in the file name template is the bookmark title.")
+        self.bookmarks_label.pack(padx=5, pady=5)
+        tb.Label(self.bookmarks_frame, text="Outline levels (0 = all):").pack(side="left", padx=5)
+        self.bookmark_depth = tb.IntVar(value=1)
+        tb.Spinbox(self.bookmarks_frame, from_=0, to=20, textvariable=self.bookmark_depth, width=6).pack(side="left", padx=5)
+        
+        # Output location: every part is written here without asking per part
+        self.split_output_frame = tb.Labelframe(self.split_tab, text="Output", padding=10)
+        self.split_output_frame.pack(fill='x', padx=10, pady=5)
+        self.split_output_dir = tb.StringVar()
+        self.split_name_template = tb.StringVar(value=SPLIT_NAME_TEMPLATES["range"])
+        self.split_jobs = tb.IntVar(value=ops.default_jobs())
+        tb.Label(self.split_output_frame, text="Folder (empty = next to the input):").grid(row=0, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(self.split_output_frame, textvariable=self.split_output_dir, width=30).grid(row=0, column=1, padx=5, pady=2)
+        tb.Button(self.split_output_frame, text="Browse", command=lambda: self.select_output_dir(self.split_output_dir)).grid(row=0, column=2, padx=5, pady=2)
+        tb.Label(self.split_output_frame, text="File name template ({part}, {start}, {end}):").grid(row=1, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(self.split_output_frame, textvariable=self.split_name_template, width=30).grid(row=1, column=1, padx=5, pady=2)
+        tb.Label(self.split_output_frame, text="Workers:").grid(row=2, column=0, sticky='e', padx=5, pady=2)
+        tb.Spinbox(self.split_output_frame, from_=1, to=256, textvariable=self.split_jobs, width=6).grid(row=2, column=1, sticky='w', padx=5, pady=2)
+        
+        # Split button
+        self.split_btn = tb.Button(self.split_tab, text="Split PDF", command=self.smart_split_pdf)
+        self.split_btn.pack(pady=10)
+        self.split_results = self.create_results_table(self.split_tab)
+        self.update_split_mode()
+    
+    def setup_encrypt_tab(self):
+        # Title
+        title_label = tb.Label(self.encrypt_tab, text="Encrypt/Decrypt PDF", font=("Helvetica", 14, "bold"))
+        title_label.pack(pady=10)
+        
+        # File selection
+        file_frame = tb.Labelframe(self.encrypt_tab, text="Select PDF File(s)", padding=10)
+        file_frame.pack(fill='x', padx=10, pady=5)
+        
+        self.encrypt_file_paths = []
+        tb.Button(file_frame, text="Select PDF(s)", command=self.select_files_for_encrypt).pack(pady=5)
+        self.encrypt_files_label = tb.Label(file_frame, text="No file selected", wraplength=400)
+        self.encrypt_files_label.pack(pady=5)
+        
+        # Password
+        password_frame = tb.Labelframe(self.encrypt_tab, text="Password", padding=10)
+        password_frame.pack(fill='x', padx=10, pady=5)
+        self.password_var = tb.StringVar()
+        self.owner_password_var = tb.StringVar()
+        tb.Label(password_frame, text="User Password:").pack(pady=2)
+        tb.Entry(password_frame, textvariable=self.password_var, show="*", width=30).pack(pady=2)
+        tb.Label(password_frame, text="Owner Password (optional):").pack(pady=2)
+        tb.Entry(password_frame, textvariable=self.owner_password_var, show="*", width=30).pack(pady=2)
+        tb.Label(password_frame, text="More passwords to try when decrypting (one per line):").pack(pady=2)
+        self.decrypt_passwords_text = tk.Text(password_frame, height=3, width=30, bg="#222", fg="#eee", insertbackground="#eee", relief="flat")
+        self.decrypt_passwords_text.pack(pady=2)
+        self.password_cache = ops.PasswordCache()
+        # Permissions
+        perm_frame = tb.Labelframe(self.encrypt_tab, text="Restrict Permissions", padding=10)
+        perm_frame.pack(fill='x', padx=10, pady=5)
+        self.perm_print = tb.BooleanVar(value=False)
+        self.perm_copy = tb.BooleanVar(value=False)
+        self.perm_edit = tb.BooleanVar(value=False)
+        tb.Checkbutton(perm_frame, text="Disallow Printing", variable=self.perm_print).pack(anchor='w')
+        tb.Checkbutton(perm_frame, text="Disallow Copying", variable=self.perm_copy).pack(anchor='w')
+        tb.Checkbutton(perm_frame, text="Disallow Editing", variable=self.perm_edit).pack(anchor='w')
+        # Output location (no per-file save dialogs)
+        output_frame = tb.Labelframe(self.encrypt_tab, text="Output", padding=10)
+        output_frame.pack(fill='x', padx=10, pady=5)
+        self.encrypt_output_dir = tb.StringVar()
+        self.encrypt_name_template = tb.StringVar(value="{stem}.enc.pdf")
+        self.encrypt_jobs = tb.IntVar(value=ops.default_jobs())
+        tb.Label(output_frame, text="Folder (empty = next to each input):").grid(row=0, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(output_frame, textvariable=self.encrypt_output_dir, width=30).grid(row=0, column=1, padx=5, pady=2)
+        tb.Button(output_frame, text="Browse", command=lambda: self.select_output_dir(self.encrypt_output_dir)).grid(row=0, column=2, padx=5, pady=2)
+        tb.Label(output_frame, text="File name template:").grid(row=1, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(output_frame, textvariable=self.encrypt_name_template, width=30).grid(row=1, column=1, padx=5, pady=2)
+        self.decrypt_name_template = tb.StringVar(value="{stem}.decrypted.pdf")
+        tb.Label(output_frame, text="Decrypted file name template:").grid(row=2, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(output_frame, textvariable=self.decrypt_name_template, width=30).grid(row=2, column=1, padx=5, pady=2)
+        tb.Label(output_frame, text="Workers:").grid(row=3, column=0, sticky='e', padx=5, pady=2)
+        tb.Spinbox(output_frame, from_=1, to=256, textvariable=self.encrypt_jobs, width=6).grid(row=3, column=1, sticky='w', padx=5, pady=2)
+        
+        # Buttons
+        button_frame = tb.Frame(self.encrypt_tab)
+        button_frame.pack(pady=10)
+        
+        tb.Button(button_frame, text="Encrypt PDF(s)", command=self.encrypt_pdf_batch).pack(side="left", padx=5)
+        tb.Button(button_frame, text="Decrypt PDF(s)", command=self.decrypt_pdf_batch).pack(side="left", padx=5)
+        
+        # Live per-file results
+        self.encrypt_results = self.create_results_table(self.encrypt_tab)
+    
+    def setup_rotate_tab(self):
+        # Title
+        title_label = tb.Label(self.rotate_tab, text="Rotate PDF Pages (Batch)", font=("Helvetica", 14, "bold"))
+        title_label.pack(pady=10)
+        
+        # File selection
+        file_frame = tb.Labelframe(self.rotate_tab, text="Select PDF File(s)", padding=10)
+        file_frame.pack(fill='x', padx=10, pady=5)
+
+        self.rotate_file_paths = []
+        tb.Button(file_frame, text="Select PDF(s)", command=self.select_files_for_rotate).pack(pady=5)
+        self.rotate_files_label = tb.Label(file_frame, text="No file selected", wraplength=400)
+        self.rotate_files_label.pack(pady=5)
+
+        # Page selection
+        page_frame = tb.Labelframe(self.rotate_tab, text="Page Selection", padding=10)
+        page_frame.pack(fill='x', padx=10, pady=5)
+        
+        tb.Label(page_frame, text=f"Enter pages to rotate ({PAGE_SYNTAX_HELP}), leave empty for all:", wraplength=500).pack(pady=5)
+        self.pages_to_rotate = tb.StringVar()
+        tb.Entry(page_frame, textvariable=self.pages_to_rotate, width=40).pack(pady=5)
+        tb.Button(page_frame, text="Pick Pages...",
+                  command=lambda: self.open_page_picker(self.rotate_file_paths[0] if self.rotate_file_paths else None,
+                                                        self.pages_to_rotate, "Select Pages to Rotate")).pack(pady=2)
+        self.rotate_incremental = tb.BooleanVar(value=True)
+        tb.Checkbutton(page_frame, text="Fast save (append an update instead of rewriting the file)", variable=self.rotate_incremental).pack(anchor='w')
+        
+        # Rotation angle
+        angle_frame = tb.Labelframe(self.rotate_tab, text="Rotation Angle", padding=10)
+        angle_frame.pack(fill='x', padx=10, pady=5)
+        
+        self.rotation_angle = tb.StringVar(value="90")
+        tb.Radiobutton(angle_frame, text="90° Clockwise", variable=self.rotation_angle, value="90").pack(anchor="w")
+        tb.Radiobutton(angle_frame, text="180°", variable=self.rotation_angle, value="180").pack(anchor="w")
+        tb.Radiobutton(angle_frame, text="270° Clockwise (90° Counter-clockwise)", variable=self.rotation_angle, value="270").pack(anchor="w")
+        
+        # Output location (no per-file save dialogs)
+        output_frame = tb.Labelframe(self.rotate_tab, text="Output", padding=10)
+        output_frame.pack(fill='x', padx=10, pady=5)
+        self.rotate_output_dir = tb.StringVar()
+        self.rotate_name_template = tb.StringVar(value="{stem}.rotated.pdf")
+        self.rotate_jobs = tb.IntVar(value=ops.default_jobs())
+        tb.Label(output_frame, text="Folder (empty = next to each input):").grid(row=0, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(output_frame, textvariable=self.rotate_output_dir, width=30).grid(row=0, column=1, padx=5, pady=2)
+        tb.Button(output_frame, text="Browse", command=lambda: self.select_output_dir(self.rotate_output_dir)).grid(row=0, column=2, padx=5, pady=2)
+        tb.Label(output_frame, text="File name template:").grid(row=1, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(output_frame, textvariable=self.rotate_name_template, width=30).grid(row=1, column=1, padx=5, pady=2)
+        tb.Label(output_frame, text="Workers:").grid(row=2, column=0, sticky='e', padx=5, pady=2)
+        tb.Spinbox(output_frame, from_=1, to=256, textvariable=self.rotate_jobs, width=6).grid(row=2, column=1, sticky='w', padx=5, pady=2)
+        
+        # Rotate button
+        rotate_btn = tb.Button(self.rotate_tab, text="Rotate PDF(s)", command=self.rotate_pages_batch)
+        rotate_btn.pack(pady=10)
+        
+        # Live per-file results
+        self.rotate_results = self.create_results_table(self.rotate_tab)
+    
+    def setup_metadata_tab(self):
+        # Title
+        title_label = tb.Label(self.metadata_tab, text="PDF Metadata Editor", font=("Helvetica", 14, "bold"))
+        title_label.pack(pady=10)
+        # File selection
+        file_frame = tb.Labelframe(self.metadata_tab, text="Select PDF File", padding=10)
+        file_frame.pack(fill='x', padx=10, pady=5)
+        self.meta_file_path = tb.StringVar()
+        tb.Button(file_frame, text="Select PDF", command=self.select_file_for_metadata).pack(pady=5)
+        tb.Label(file_frame, textvariable=self.meta_file_path, wraplength=400).pack(pady=5)
+        # Metadata fields
+        meta_frame = tb.Labelframe(self.metadata_tab, text="Edit Metadata", padding=10)
+        meta_frame.pack(fill='x', padx=10, pady=5)
+        self.meta_title = tb.StringVar()
+        self.meta_author = tb.StringVar()
+        self.meta_subject = tb.StringVar()
+        self.meta_keywords = tb.StringVar()
+        tb.Label(meta_frame, text="Title:").grid(row=0, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(meta_frame, textvariable=self.meta_title, width=40).grid(row=0, column=1, padx=5, pady=2)
+        tb.Label(meta_frame, text="Author:").grid(row=1, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(meta_frame, textvariable=self.meta_author, width=40).grid(row=1, column=1, padx=5, pady=2)
+        tb.Label(meta_frame, text="Subject:").grid(row=2, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(meta_frame, textvariable=self.meta_subject, width=40).grid(row=2, column=1, padx=5, pady=2)
+        tb.Label(meta_frame, text="Keywords:").grid(row=3, column=0, sticky='e', padx=5, pady=2)
+        tb.Entry(meta_frame, textvariable=self.meta_keywords, width=40).grid(row=3, column=1, padx=5, pady=2)
+        self.meta_incremental = tb.BooleanVar(value=True)
+        tb.Checkbutton(meta_frame, text="Fast save (append an update instead of rewriting the file)", variable=self.meta_incremental).grid(row=4, column=0, columnspan=2, sticky='w', padx=5, pady=2)
+        tb.Label(meta_frame, text="For multiple files, fields may use {stem}, {name}, {index} and {title}, {author}, ...; empty fields are left unchanged").grid(row=5, column=0, columnspan=2, sticky='w', padx=5, pady=2)
+        # Buttons
+        btn_frame = tb.Frame(self.metadata_tab)
+        btn_frame.pack(pady=10)
+        tb.Button(btn_frame, text="Save Metadata", command=self.save_metadata).pack(side='left', padx=5)
+        tb.Button(btn_frame, text="Apply to Files...", command=self.save_metadata_batch).pack(side='left', padx=5)
+        tb.Button(btn_frame, text="Clear Metadata", command=self.clear_metadata).pack(side='left', padx=5)
+        self.meta_results = self.create_results_table(self.metadata_tab)
+    
+    def create_results_table(self, parent):
+        table_frame = tb.Frame(parent)
+        table_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        table = ttk.Treeview(table_frame, columns=("status", "time", "output"), height=6)
+        table.heading("#0", text="File")
+        table.heading("status", text="Status")
+        table.heading("time", text="Time")
+        table.heading("output", text="Output")
+        table.column("#0", width=180)
+        table.column("status", width=160)
+        table.column("time", width=60, anchor='e')
+        table.column("output", width=220)
+        scrollbar = tb.Scrollbar(table_frame, orient="vertical", command=table.yview)
+        table.configure(yscrollcommand=scrollbar.set)
+        table.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        return table
+    
+    def create_undo_redo_buttons(self):
+        # Place Undo/Redo buttons at the top left
+        top_frame = ttk.Frame(self.window)
+        top_frame.pack(fill='x', side='top', anchor='nw')
+        self.undo_btn = tb.Button(top_frame, text="Undo", command=self.undo_action)
+        self.undo_btn.pack(side='left', padx=5, pady=5)
+        self.redo_btn = tb.Button(top_frame, text="Redo", command=self.redo_action)
+        self.redo_btn.pack(side='left', padx=5, pady=5)
+        self.update_undo_redo_buttons()
+    def update_undo_redo_buttons(self):
+        self.undo_btn.config(state="normal" if self.history_pointer >= 0 else "disabled")
+        self.redo_btn.config(state="normal" if self.history_pointer < len(self.history) - 1 else "disabled")
+    def add_history(self, action, file_path):
+        # Remove any redo history
+        self.history = self.history[:self.history_pointer+1]
+        self.history.append((action, file_path))
+        self.history_pointer += 1
+        self.update_undo_redo_buttons()
+    def undo_action(self):
+        if self.history_pointer >= 0:
+            action, file_path = self.history[self.history_pointer]
+            if os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    messagebox.showinfo("Undo", f"Undid {action}. Deleted {os.path.basename(file_path)}.")
+                except Exception as e:
+                    messagebox.showerror("Undo Error", f"Failed to delete {file_path}: {e}")
+            self.history_pointer -= 1
+            self.update_undo_redo_buttons()
+    def redo_action(self):
+        if self.history_pointer < len(self.history) - 1:
+            self.history_pointer += 1
+            action, file_path = self.history[self.history_pointer]
+            messagebox.showinfo("Redo", f"Redo: {action} (file {os.path.basename(file_path)})")
+            self.update_undo_redo_buttons()
+    
+    def create_progress_bar(self):
+        bottom_frame = ttk.Frame(self.window)
+        bottom_frame.pack(fill='x', side='bottom', anchor='s')
+        self.progress = ttk.Progressbar(bottom_frame, mode='indeterminate')
+        self.progress.pack(fill='x', padx=10, pady=2)
+        self.status_label = ttk.Label(bottom_frame, text="Ready")
+        self.status_label.pack(side='left', padx=10)
+        self.cancel_jobs_btn = tb.Button(bottom_frame, text="Cancel Jobs", command=self.jobs.cancel_all,
+                                         bootstyle="danger-outline", state="disabled")
+        self.cancel_jobs_btn.pack(side='right', padx=10, pady=2)
+    def create_diagnostics_menu(self):
+        # Tracing for bug reports, the same switches as PDFTOOLBOX_TRACE and PDFTOOLBOX_PROFILE
+        menubar = tk.Menu(self.window)
+        menu = tk.Menu(menubar, tearoff=0)
+        self.trace_enabled = tk.BooleanVar(value=tracer.enabled)
+        self.trace_cprofile = tk.BooleanVar(value=CPROFILE in tracer.captures)
+        self.trace_tracemalloc = tk.BooleanVar(value=TRACEMALLOC in tracer.captures)
+        menu.add_checkbutton(label="Record Trace", variable=self.trace_enabled, command=self.update_tracing)
+        menu.add_checkbutton(label="Profile Jobs (cProfile)", variable=self.trace_cprofile,
+                             command=self.update_tracing)
+        menu.add_checkbutton(label="Track Job Memory (tracemalloc)", variable=self.trace_tracemalloc,
+                             command=self.update_tracing)
+        menu.add_separator()
+        menu.add_command(label="Export Trace...", command=self.export_trace)
+        menu.add_command(label="Clear Trace", command=tracer.clear)
+        menubar.add_cascade(label="Diagnostics", menu=menu)
+        self.window.config(menu=menubar)
+    def update_tracing(self):
+        if self.trace_enabled.get():
+            tracer.enable([capture for capture, variable in ((CPROFILE, self.trace_cprofile),
+                                                             (TRACEMALLOC, self.trace_tracemalloc))
+                           if variable.get()])
+        else:
+            tracer.disable()
+    def export_trace(self):
+        if not tracer.event_count():
+            messagebox.showinfo("Export Trace", "Nothing has been recorded yet. Turn on Diagnostics > Record Trace "
+                                                "and run the operation again.")
+            return
+        path = filedialog.asksaveasfilename(title="Save trace", defaultextension=".json",
+                                            filetypes=[("Chrome trace", "*.json")])
+        if not path:
+            return
+        try:
+            written = tracer.export(path)
+        except Exception as e:
+            messagebox.showerror("Export Trace", f"Failed to save the trace: {e}")
+            return
+        messagebox.showinfo("Export Trace", f"Saved {', '.join(os.path.basename(p) for p in written)}.\n\n"
+                                            "Open the trace in chrome://tracing or ui.perfetto.dev.")
+    
+    def start_progress(self, status="Processing..."):
+        # Several jobs may run at once; the bar keeps moving until the last one stops it
+        self.active_jobs += 1
+        if self.active_jobs == 1:
+            self.progress.start(10)
+            self.cancel_jobs_btn.config(state="normal")
+        self.status_label.config(text=status)
+        self.window.update_idletasks()
+    def stop_progress(self, status="Done"):
+        self.active_jobs = max(self.active_jobs - 1, 0)
+        if not self.active_jobs:
+            self.progress.stop()
+            self.progress.config(mode='indeterminate', value=0)
+            self.cancel_jobs_btn.config(state="disabled")
+        counts = self.jobs.counts()
+        if counts['running'] + counts['queued'] > 1:
+            status += f" ({counts['running'] - 1} running, {counts['queued']} queued)"
+        self.status_label.config(text=status)
+        self.window.update_idletasks()
+    def job_progress(self, title):
+        """A Progress whose updates are shown by show_progress, whichever thread reports them."""
+        return Progress(title, listener=lambda snapshot: self.jobs.notify(self.show_progress, snapshot))
+    def show_progress(self, snapshot):
+        # Jobs that know how much is left switch the bar from the spinner to a percentage
+        fraction = snapshot.fraction
+        if fraction is not None and self.active_jobs:
+            if str(self.progress.cget('mode')) != 'determinate':
+                self.progress.stop()
+                self.progress.config(mode='determinate', maximum=100)
+            self.progress.config(value=fraction * 100)
+        details = snapshot.describe()
+        self.status_label.config(text=f"{snapshot.title}: {details}" if details else snapshot.title)
+    
+    # File selection methods
+    def select_files_for_merge(self):
+        files = filedialog.askopenfilenames(
+            title="Select PDF files to merge",
+            filetypes=[("PDF Files", "*.pdf")]
+        )
+        if files:
+            self.selected_files.extend(files)
+            self.update_files_listbox()
+    
+    def select_file_for_delete(self):
+        file_path = filedialog.askopenfilename(
+            title="Select PDF file",
+            filetypes=[("PDF Files", "*.pdf")]
+        )
+        if file_path:
+            self.delete_file_path.set(file_path)
+            self.delete_pdf_path = file_path
+            self.close_delete_document()
+            try:
+                self.delete_pdf_handle = self.documents.acquire(file_path)
+                self.delete_pdf_doc = self.delete_pdf_handle.document
+                self.delete_total_pages = self.delete_pdf_doc.page_count
+                self.delete_preview_renderer = page_preview.PreviewRenderer(self.delete_pdf_doc,
+                                                                            lock=self.delete_pdf_handle.lock)
+            except Exception:
+                self.delete_pdf_doc = None
+                self.delete_total_pages = 1
+            self.delete_page_num.set(1)
+            self.update_delete_preview()
+    
+    def close_delete_document(self):
+        # Stop the prefetch thread before the document it renders from goes away
+        if self.delete_preview_renderer:
+            self.delete_preview_renderer.close()
+            self.delete_preview_renderer = None
+        if self.delete_pdf_handle:
+            self.documents.release(self.delete_pdf_handle)
+            self.delete_pdf_handle = None
+            self.delete_pdf_doc = None
+    
+    def select_output_dir(self, variable):
+        directory = filedialog.askdirectory(title="Select output folder")
+        if directory:
+            variable.set(directory)
+    
+    def output_template(self, directory_var, name_template_var):
+        name_template = name_template_var.get().strip()
+        if not name_template:
+            raise ValueError("Please enter a file name template.")
+        return os.path.join(directory_var.get().strip() or "{dir}", name_template)
+    
+    def select_file_for_split(self):
+        file_path = filedialog.askopenfilename(
+            title="Select PDF file",
+            filetypes=[("PDF Files", "*.pdf")]
+        )
+        if file_path:
+            self.split_file_path.set(file_path)
+    
+    def select_files_for_encrypt(self):
+        files = filedialog.askopenfilenames(
+            title="Select PDF file(s)",
+            filetypes=[("PDF Files", "*.pdf")]
+        )
+        if files:
+            self.encrypt_file_paths = list(files)
+            self.encrypt_files_label.config(text="\n".join([os.path.basename(f) for f in self.encrypt_file_paths]))
+        else:
+            self.encrypt_file_paths = []
+            self.encrypt_files_label.config(text="No file selected")
+    
+    def select_files_for_rotate(self):
+        files = filedialog.askopenfilenames(
+            title="Select PDF file(s)",
+            filetypes=[("PDF Files", "*.pdf")]
+        )
+        if files:
+            self.rotate_file_paths = list(files)
+            self.rotate_files_label.config(text="\n".join([os.path.basename(f) for f in self.rotate_file_paths]))
+        else:
+            self.rotate_file_paths = []
+            self.rotate_files_label.config(text="No file selected")
+    
+    def select_file_for_rotate(self):  # type: ignore
+        file_path = filedialog.askopenfilename(
+            title="Select PDF file",
+            filetypes=[("PDF Files", "*.pdf")]
+        )
+        if file_path:
+            self.rotate_file_path = tb.StringVar(value=file_path)  # type: ignore
+    
+    def select_file_for_metadata(self):
+        file_path = filedialog.askopenfilename(
+            title="Select PDF file",
+            filetypes=[("PDF Files", "*.pdf")]
+        )
+        if file_path:
+            self.meta_file_path.set(file_path)
+            try:
+                with self.documents.reader(file_path) as reader:
+                    info = ops.reader_metadata(reader)
+                self.meta_title.set(info['title'])
+                self.meta_author.set(info['author'])
+                self.meta_subject.set(info['subject'])
+                self.meta_keywords.set(info['keywords'])
+            except Exception:
+                self.meta_title.set("")
+                self.meta_author.set("")
+                self.meta_subject.set("")
+                self.meta_keywords.set("")
+    
+    # Merge with reordering methods
+    def update_files_listbox(self):
+        self.files_listbox.delete(0, tk.END)
+        for file_path in self.selected_files:
+            self.files_listbox.insert(tk.END, os.path.basename(file_path))
+    
+    def move_file_up(self):
+        selection = self.files_listbox.curselection()
+        if selection and selection[0] > 0:
+            index = selection[0]
+            self.selected_files[index], self.selected_files[index-1] = self.selected_files[index-1], self.selected_files[index]
+            self.update_files_listbox()
+            self.files_listbox.selection_set(index-1)
+    
+    def move_file_down(self):
+        selection = self.files_listbox.curselection()
+        if selection and selection[0] < len(self.selected_files) - 1:
+            index = selection[0]
+            self.selected_files[index], self.selected_files[index+1] = self.selected_files[index+1], self.selected_files[index]
+            self.update_files_listbox()
+            self.files_listbox.selection_set(index+1)
+    
+    def remove_file(self):
+        selection = self.files_listbox.curselection()
+        if selection:
+            index = selection[0]
+            del self.selected_files[index]
+            self.update_files_listbox()
+    
+    def clear_files(self):
+        self.selected_files.clear()
+        self.update_files_listbox()
+    
+    def merge_pdfs_with_reordering(self):
+        if not self.selected_files:
+            messagebox.showwarning("Warning", "Please select at least one PDF file.")
+            return
+        
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF Files", "*.pdf")],
+            title="Save Merged PDF As"
+        )
+        
+        if save_path:
+            file_paths = list(self.selected_files)
+            dedupe = self.merge_dedupe.get()
+            
+            stats = {}
+            
+            def merge():
+                # Yields nothing: the job is done when the file is, see run_save_job
+                stats.update(ops.merge_pdfs(file_paths, save_path, dedupe, progress=progress)[1])
+                yield from ()
+            
+            def finished(error):
+                self.stop_progress("Ready")
+                if error is not None:
+                    messagebox.showerror("Error", f"Error merging PDFs: {str(error)}")
+                    return
+                self.add_history('Merge PDFs', save_path)
+                message = f"PDFs merged successfully! ({stats['pages']} pages)"
+                if stats['duplicates']:
+                    message += (f"\n{stats['duplicates']} repeated resources stored once, "
+                                f"{ops.format_size(stats['saved'])} saved.")
+                messagebox.showinfo("Success", message)
+            
+            progress = self.job_progress("Merging PDFs")
+            self.run_in_background('merge', "Merging PDFs...", merge, None, finished, progress=progress)
+    
+    # Delete pages method
+    def delete_pages(self):
+        file_path = self.delete_file_path.get()
+        if not file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+        
+        pages_input = self.pages_to_delete.get().strip()
+        if not pages_input:
+            messagebox.showwarning("Warning", "Please enter page numbers to delete.")
+            return
+        
+        try:
+            # Parse and validate page numbers before asking where to save;
+            # the shared document already knows the page count, so avoid parsing the file again
+            with self.documents.fitz(file_path) as doc:
+                total_pages = doc.page_count
+            pages_to_delete = self.parse_page_numbers(pages_input, total_pages)
+            
+            # Save
+            save_path = filedialog.asksaveasfilename(
+                defaultextension=".pdf",
+                filetypes=[("PDF Files", "*.pdf")],
+                title="Save PDF As"
+            )
+            
+            if save_path:
+                incremental = self.delete_incremental.get()
+                self.run_save_job('delete', f"Deleting pages from {os.path.basename(file_path)}...",
+                                  lambda progress: ops.delete_pages(file_path, save_path, pages_to_delete,
+                                                                    incremental=incremental, progress=progress),
+                                  save_path, 'Delete Pages', f"Pages {pages_to_delete} deleted successfully!",
+                                  "Error deleting pages")
+                
+        except Exception as e:
+            messagebox.showerror("Error", f"Error deleting pages: {str(e)}")
+    
+    # Split PDF method
+    def update_split_mode(self):
+        mode = self.split_mode.get()
+        self.range_frame.pack_forget()
+        self.every_n_frame.pack_forget()
+        self.equal_n_frame.pack_forget()
+        self.bookmarks_frame.pack_forget()
+        frames = {
+            "range": self.range_frame,
+            "every_n": self.every_n_frame,
+            "equal_n": self.equal_n_frame,
+            "bookmarks": self.bookmarks_frame,
+        }
+        if mode in frames:
+            frames[mode].pack(fill='x', padx=10, pady=5, before=self.split_output_frame)
+        # Switch between the default file names unless the user typed their own
+        if self.split_name_template.get() in SPLIT_NAME_TEMPLATES.values():
+            self.split_name_template.set(SPLIT_NAME_TEMPLATES.get(mode, SPLIT_NAME_TEMPLATES["range"]))
+    
+    def smart_split_pdf(self):
+        file_path = self.split_file_path.get()
+        if not file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+        mode = self.split_mode.get()
+        history_actions = {
+            "range": 'Split PDF (Range)',
+            "every_n": 'Split PDF (Every N)',
+            "equal_n": 'Split PDF (Equal N)',
+            "bookmarks": 'Split PDF (Bookmarks)',
+        }
+        options = {'mode': mode}
+        if mode == "range":
+            start = self.start_page.get().strip()
+            end = self.end_page.get().strip()
+            if not start or not end:
+                messagebox.showwarning("Warning", "Please enter start and end page numbers.")
+                return
+            options.update(start=start, end=end)
+        elif mode == "every_n":
+            options['n'] = self.every_n_var.get()
+        elif mode == "equal_n":
+            options['n'] = self.equal_n_var.get()
+        try:
+            if mode == "bookmarks":
+                options['depth'] = self.bookmark_depth.get()
+            output_template = self.output_template(self.split_output_dir, self.split_name_template)
+            options['jobs'] = self.split_jobs.get()
+        except Exception as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        
+        table = self.split_results
+        table.delete(*table.get_children())
+        started = time.perf_counter()
+        
+        def add_part(part):
+            _number, label, output_path = part
+            row = table.insert("", tk.END, text=label, values=("Success", f"{time.perf_counter() - started:.2f}s", output_path))
+            table.see(row)
+            self.add_history(history_actions[mode], output_path)
+        
+        def finished(error):
+            self.split_btn.config(state="normal")
+            count = len(table.get_children())
+            if error is None:
+                self.stop_progress(f"Split into {count} part(s)")
+            elif isinstance(error, ValueError) and mode == "bookmarks" and not count:
+                self.stop_progress("Split cancelled")
+                messagebox.showinfo("No Bookmarks", str(error))
+            else:
+                self.stop_progress("Split failed")
+                messagebox.showerror("Error", f"Error splitting PDF: {str(error)}")
+        
+        progress = self.job_progress(f"Splitting {os.path.basename(file_path)}")
+        if self.run_in_background('split', f"Splitting {os.path.basename(file_path)}...",
+                                  lambda: ops.iter_split(file_path, output_template, progress=progress, **options),
+                                  add_part, finished, on_cancel=lambda: self.split_btn.config(state="normal"),
+                                  progress=progress):
+            self.split_btn.config(state="disabled")
+    
+    # Background work: jobs run on the scheduler's worker threads and report back in the Tk loop
+    def run_in_background(self, kind, status, produce, on_item, on_done, on_cancel=None, progress=None):
+        """Queue produce() as a job of kind, calling on_item per item and on_done(error or None) in the Tk loop.
+
+        A cancelled job calls on_cancel instead of on_done. The throughput and stage times of the
+        job's progress, if given, are added to the final status, and its check() raises once the job
+        is cancelled. Returns the job, or None when the queue is full.
+        """
+        def finished(error):
+            if isinstance(error, JobCancelled):
+                self.stop_progress(str(error))
+                if on_cancel:
+                    on_cancel()
+                return
+            on_done(error)
+            if error is None and progress is not None:
+                summary = progress.snapshot(finished=True)
+                details = "; ".join(part for part in (summary.describe(), summary.describe_stages()) if part)
+                if details:
+                    self.status_label.config(text=f"{self.status_label.cget('text')} ({details})")
+        
+        if tracer.enabled:
+            produce = self.traced_job(kind, status.rstrip('.'), produce)
+        try:
+            job = self.jobs.submit(kind, produce, on_item, finished, title=status.rstrip('.'))
+        except SchedulerFull as e:
+            messagebox.showwarning("Busy", str(e))
+            return None
+        if progress is not None:
+            # Cancel is only requested from this thread, so the job cannot be cancelled before this
+            progress.cancelled = lambda: job.cancelled
+        self.start_progress(status)
+        return job
+    
+    @staticmethod
+    def traced_job(kind, title, produce):
+        # The span and profiles cover the whole job on its worker thread, up to completion or cancellation
+        def run():
+            with tracer.job(title, kind=kind):
+                yield from produce()
+        return run
+    
+    def run_save_job(self, kind, status, work, save_path, history_action, success_message, error_title):
+        """Run work(progress), which writes save_path, in the background and report the outcome."""
+        def finished(error):
+            self.stop_progress("Ready")
+            if error is None:
+                self.add_history(history_action, save_path)
+                messagebox.showinfo("Success", success_message)
+            else:
+                messagebox.showerror("Error", f"{error_title}: {str(error)}")
+        
+        def save():
+            # Nothing is yielded, so the job cannot end as cancelled once the file is written;
+            # until then, progress.check() in the operation stops it and removes the partial file
+            work(progress)
+            yield from ()
+        
+        progress = self.job_progress(status.rstrip('.'))
+        return self.run_in_background(kind, status, save, None, finished, progress=progress)
+    
+    # Background batch runner: per-file results are shown in table as workers finish them
+    def run_batch_async(self, operation, file_paths, output_template, jobs, options, table, history_action, title,
+                        per_file_options=None, on_result=None):
+        table.delete(*table.get_children())
+        for index, file_path in enumerate(file_paths):
+            table.insert("", tk.END, iid=str(index), text=os.path.basename(file_path), values=("Queued", "", ""))
+        row_ids = {file_path: str(index) for index, file_path in enumerate(file_paths)}
+        counts = {'ok': 0, 'failed': 0}
+        
+        def show_result(result):
+            row = row_ids[result.input_path]
+            if on_result:
+                on_result(result)
+            if result.ok:
+                counts['ok'] += 1
+                status = f"Success ({result.describe_detail()})" if result.detail else "Success"
+                table.item(row, values=(status, f"{result.elapsed:.2f}s", ", ".join(result.outputs)))
+                if history_action:
+                    for output_path in result.outputs:
+                        self.add_history(history_action, output_path)
+            else:
+                counts['failed'] += 1
+                table.item(row, values=(f"Error - {result.error}", f"{result.elapsed:.2f}s", ""))
+            table.see(row)
+        
+        def finished(error):
+            if error is not None:
+                messagebox.showerror("Error", f"{title} failed: {error}")
+            self.stop_progress(f"{title}: {counts['ok']} succeeded, {counts['failed']} failed")
+        
+        # Batches spread over a process pool of their own, so they count against one shared limit
+        progress = self.job_progress(title)
+        self.run_in_background(
+            'batch', f"{title}: {len(file_paths)} file(s)...",
+            lambda: ops.run_batch(operation, file_paths, output_template, jobs, options, per_file_options, progress),
+            show_result, finished, progress=progress)
+    
+    # Encrypt/Decrypt methods
+    def encrypt_pdf(self):
+        file_path = self.encrypt_file_path.get()  # type: ignore
+        if not file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+        
+        password = self.password_var.get()
+        if not password:
+            messagebox.showwarning("Warning", "Please enter a password.")
+            return
+        
+        try:
+            # Save
+            save_path = filedialog.asksaveasfilename(
+                defaultextension=".pdf",
+                filetypes=[("PDF Files", "*.pdf")],
+                title="Save Encrypted PDF As"
+            )
+            
+            if save_path:
+                self.run_save_job('encrypt', f"Encrypting {os.path.basename(file_path)}...",
+                                  lambda progress: ops.encrypt_pdf(file_path, save_path, password, progress=progress),
+                                  save_path, 'Encrypt PDF', "PDF encrypted successfully!", "Error encrypting PDF")
+                
+        except Exception as e:
+            messagebox.showerror("Error", f"Error encrypting PDF: {str(e)}")
+    
+    def decrypt_pdf_batch(self):
+        file_paths = list(self.encrypt_file_paths)
+        if not file_paths:
+            messagebox.showwarning("Warning", "Please select at least one PDF file.")
+            return
+        passwords = [self.password_var.get()] if self.password_var.get() else []
+        for line in self.decrypt_passwords_text.get("1.0", tk.END).splitlines():
+            if line and line not in passwords:
+                passwords.append(line)
+        if not passwords:
+            messagebox.showwarning("Warning", "Please enter the password.")
+            return
+        try:
+            output_template = self.output_template(self.encrypt_output_dir, self.decrypt_name_template)
+            jobs = self.encrypt_jobs.get()
+        except Exception as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        # Files opened earlier in this session try their known password first
+        per_file_options = {}
+        for file_path in file_paths:
+            ordered = self.password_cache.order(file_path, passwords)
+            if ordered != passwords:
+                per_file_options[file_path] = {'passwords': ordered}
+        
+        def remember_password(result):
+            if result.ok and result.detail:
+                ordered = per_file_options.get(result.input_path, {}).get('passwords', passwords)
+                self.password_cache.record(result.input_path, ordered[result.detail['password'] - 1])
+        
+        self.run_batch_async('decrypt', file_paths, output_template, jobs, {'passwords': passwords},
+                             self.encrypt_results, 'Batch Decrypt PDF', "Batch decryption",
+                             per_file_options=per_file_options, on_result=remember_password)
+    
+    def encrypt_pdf_batch(self):
+        file_paths = self.encrypt_file_paths
+        if not file_paths:
+            messagebox.showwarning("Warning", "Please select at least one PDF file.")
+            return
+        user_password = self.password_var.get()
+        owner_password = self.owner_password_var.get() or None
+        if not user_password:
+            messagebox.showwarning("Warning", "Please enter a user password.")
+            return
+        try:
+            output_template = self.output_template(self.encrypt_output_dir, self.encrypt_name_template)
+            jobs = self.encrypt_jobs.get()
+        except Exception as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        options = {
+            'user_password': user_password,
+            'owner_password': owner_password,
+            'allow_print': not self.perm_print.get(),
+            'allow_copy': not self.perm_copy.get(),
+            'allow_edit': not self.perm_edit.get(),
+        }
+        self.run_batch_async('encrypt', list(file_paths), output_template, jobs, options,
+                             self.encrypt_results, 'Batch Encrypt PDF', "Batch encryption")
+    
+    # Rotate pages method
+    def rotate_pages(self):
+        file_path = self.rotate_file_path.get()  # type: ignore
+        if not file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+        
+        pages_input = self.pages_to_rotate.get().strip()
+        angle = int(self.rotation_angle.get())
+        
+        try:
+            # Save
+            save_path = filedialog.asksaveasfilename(
+                defaultextension=".pdf",
+                filetypes=[("PDF Files", "*.pdf")],
+                title="Save Rotated PDF As"
+            )
+            
+            if save_path:
+                incremental = self.rotate_incremental.get()
+                self.run_save_job('rotate', f"Rotating pages of {os.path.basename(file_path)}...",
+                                  lambda progress: ops.rotate_pages(file_path, save_path, angle, pages_input,
+                                                                    incremental=incremental, progress=progress),
+                                  save_path, 'Rotate PDF', "Pages rotated successfully!", "Error rotating pages")
+                
+        except Exception as e:
+            messagebox.showerror("Error", f"Error rotating pages: {str(e)}")
+    
+    def rotate_pages_batch(self):
+        file_paths = self.rotate_file_paths
+        if not file_paths:
+            messagebox.showwarning("Warning", "Please select at least one PDF file.")
+            return
+        try:
+            output_template = self.output_template(self.rotate_output_dir, self.rotate_name_template)
+            jobs = self.rotate_jobs.get()
+        except Exception as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        options = {
+            'angle': int(self.rotation_angle.get()),
+            'pages': self.pages_to_rotate.get().strip(),
+            'incremental': self.rotate_incremental.get(),
+        }
+        self.run_batch_async('rotate', list(file_paths), output_template, jobs, options,
+                             self.rotate_results, 'Batch Rotate PDF', "Batch rotation")
+    
+    # Utility method to parse page numbers
+    def parse_page_numbers(self, input_str: str, total_pages=None) -> PageRangeSet:
+        """Parse page numbers from string like '1,3,5' or '2-4' or '1,3-5,7'"""
+        return ops.parse_page_numbers(input_str, total_pages)
+    
+    def update_delete_preview(self):
+        page_num = self.delete_page_num.get()
+        total = self.delete_total_pages
+        self.delete_page_label.config(text=f"Page {page_num}/{total}")
+        self.delete_slider.config(from_=1, to=total, state="normal" if total > 1 else "disabled")
+        self.delete_slider.set(page_num)
+        self.delete_prev_btn.config(state="normal" if page_num > 1 else "disabled")
+        self.delete_next_btn.config(state="normal" if page_num < total else "disabled")
+        if self.delete_preview_renderer:
+            self.request_delete_preview(page_num - 1)
+        else:
+            self.delete_preview_label.config(text="Preview unavailable")
+    def delete_prev_page(self):
+        if self.delete_page_num.get() > 1:
+            self.delete_page_num.set(self.delete_page_num.get() - 1)
+            self.update_delete_preview()
+    def delete_next_page(self):
+        if self.delete_page_num.get() < self.delete_total_pages:
+            self.delete_page_num.set(self.delete_page_num.get() + 1)
+            self.update_delete_preview()
+    def delete_slider_move(self, val):
+        val = int(float(val))
+        if val != self.delete_page_num.get():
+            self.delete_page_num.set(val)
+            self.update_delete_preview()
+    
+    # Previews render on the renderer's thread; results come back through a queue drained by the Tk loop
+    def request_delete_preview(self, page_number):
+        renderer = self.delete_preview_renderer
+        self.delete_preview_wanted = page_number
+        cached = renderer.request(page_number, lambda *result: self.delete_preview_results.put((renderer,) + result))
+        if cached is not None:
+            self.show_pdf_preview(self.delete_preview_label, cached)
+            self.delete_preview_wanted = None  # earlier requests were cancelled; stop polling
+            return
+        if not self.delete_preview_polling:
+            self.delete_preview_polling = True
+            self.window.after(15, self.drain_delete_previews)
+    
+    def drain_delete_previews(self):
+        done = self.delete_preview_renderer is None or self.delete_preview_wanted is None
+        while True:
+            try:
+                renderer, number, image, final = self.delete_preview_results.get_nowait()
+            except queue.Empty:
+                break
+            if renderer is self.delete_preview_renderer and number == self.delete_preview_wanted:
+                self.show_pdf_preview(self.delete_preview_label, image)
+                done = final
+        if done:
+            self.delete_preview_polling = False
+        else:
+            self.window.after(15, self.drain_delete_previews)
+    
+    # Thumbnail page picker: clicking pages fills in a page selection entry
+    def open_page_picker(self, file_path, variable, title):
+        if not file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+        try:
+            with self.documents.fitz(file_path) as doc:
+                page_count = doc.page_count
+            pool = thumbnails.ThumbnailPool(file_path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Cannot open {os.path.basename(file_path)}: {e}")
+            return
+        try:
+            selected = set(PageRangeSet.parse(variable.get(), page_count)) if variable.get().strip() else set()
+        except ValueError:
+            selected = set()
+        
+        picker = tb.Toplevel(self.window)
+        picker.title(f"{title} - {os.path.basename(file_path)}")
+        picker.geometry("640x600")
+        tb.Label(picker, text="Click pages to select them; Shift+click selects a range.").pack(pady=5)
+        status = tb.Label(picker, text=f"{len(selected)} of {page_count} page(s) selected")
+        grid_frame = tb.Frame(picker)
+        grid_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        def changed(pages):
+            variable.set(str(PageRangeSet.from_pages(pages)))
+            status.config(text=f"{len(pages)} of {page_count} page(s) selected")
+        
+        def close():
+            pool.close()
+            picker.destroy()
+        
+        ThumbnailGrid(grid_frame, pool, page_count, selected, changed)
+        status.pack(pady=2)
+        tb.Button(picker, text="Done", command=close).pack(pady=5)
+        picker.protocol("WM_DELETE_WINDOW", close)
+    
+    def show_pdf_preview(self, label_widget, image):
+        if isinstance(image, Exception):
+            label_widget.configure(text=f"Preview unavailable: {image}", image="")  # type: ignore
+            label_widget.image = None  # type: ignore
+            return
+        from PIL import ImageTk
+        img_tk = ImageTk.PhotoImage(image)
+        label_widget.configure(image=img_tk, text="")  # type: ignore
+        label_widget.image = img_tk  # type: ignore
+    
+    def ocr_current_page(self):
+        file_path = self.delete_pdf_path
+        if not file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+        page_num = self.delete_page_num.get() - 1
+        if self.ocr_cache is None:
+            from ocr_cache import OcrCache
+            self.ocr_cache = OcrCache()
+        cache = self.ocr_cache
+        results = []
+        
+        def recognize():
+            # The shared document is locked while the page renders, not while Tesseract runs,
+            # so the preview keeps working in the meantime
+            handle = self.documents.acquire(file_path)
+            try:
+                return [pdf_ocr.ocr_page(handle.document, page_num, cache=cache, lock=handle.lock)]
+            finally:
+                self.documents.release(handle)
+        
+        def finished(error):
+            self.ocr_btn.config(state="normal")
+            if error is not None:
+                self.stop_progress("OCR failed")
+                messagebox.showerror("OCR Error", f"Failed to extract text: {error}")
+                return
+            self.stop_progress(f"OCR finished: page {page_num + 1}")
+            result = results[0]
+            title = "OCR Result" if result.source == pdf_ocr.SCANNED else "OCR Result (from the page's text layer)"
+            self.show_ocr_result(result.text, title=title)
+        
+        if self.run_in_background('ocr', f"OCR page {page_num + 1} of {os.path.basename(file_path)}...", recognize,
+                                  results.append, finished, on_cancel=lambda: self.ocr_btn.config(state="normal")):
+            self.ocr_btn.config(state="disabled")
+
+    def ocr_document(self):
+        file_path = self.delete_pdf_path
+        if not file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+        total = self.delete_total_pages
+        text_widget = self.show_ocr_result("", title=f"OCR Result - {os.path.basename(file_path)}")
+        # One mark per page so pages can be filled in as they finish, in any order
+        for page in range(total):
+            text_widget.insert("end", f"--- Page {page + 1} ---\n")
+            text_widget.mark_set(f"page{page}", "end-1c")
+            text_widget.mark_gravity(f"page{page}", "left")
+            text_widget.insert("end", "\n")
+        done = {'pages': 0, 'ocr': 0}
+        # Pages arrive here on the Tk thread, so the progress is shown directly
+        progress = Progress(f"OCR {os.path.basename(file_path)}", total_pages=total, listener=self.show_progress)
+        
+        def add_page(result):
+            if text_widget.winfo_exists():
+                text_widget.insert(f"page{result.page}", result.text.rstrip() + "\n")
+            done['pages'] += 1
+            if result.source == pdf_ocr.SCANNED:
+                done['ocr'] += 1
+            progress.add_stage_time("ocr", result.elapsed)
+            progress.advance(pages=1)
+        
+        def finished(error):
+            self.ocr_all_btn.config(state="normal")
+            if error is None:
+                self.stop_progress(f"OCR finished: {done['pages']} pages, {done['ocr']} needed OCR")
+            else:
+                self.stop_progress("OCR failed")
+                messagebox.showerror("OCR Error", f"Failed to extract text: {error}")
+        
+        if self.run_in_background('ocr', f"OCR {os.path.basename(file_path)}...", lambda: pdf_ocr.iter_ocr(file_path),
+                                  add_page, finished, on_cancel=lambda: self.ocr_all_btn.config(state="normal"),
+                                  progress=progress):
+            self.ocr_all_btn.config(state="disabled")
+    
+    def save_searchable_pdf(self):
+        file_path = self.delete_pdf_path
+        if not file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF Files", "*.pdf")],
+            initialfile=f"{os.path.splitext(os.path.basename(file_path))[0]}_searchable.pdf",
+            title="Save Searchable PDF As"
+        )
+        if not save_path:
+            return
+        done = {'pages': 0, 'ocr': 0}
+        progress = self.job_progress(f"Searchable PDF {os.path.basename(file_path)}")
+        
+        def add_page(result):
+            done['pages'] += 1
+            done['ocr'] += result.source == pdf_ocr.SCANNED
+        
+        def finished(error):
+            self.ocr_pdf_btn.config(state="normal")
+            if error is None:
+                self.stop_progress(f"Saved searchable PDF ({done['ocr']} pages recognized)")
+                self.add_history('Searchable PDF', save_path)
+                messagebox.showinfo("Success", f"Searchable PDF saved as:\n{save_path}")
+            else:
+                self.stop_progress("OCR failed")
+                messagebox.showerror("OCR Error", f"Failed to create searchable PDF: {error}")
+        
+        if self.run_in_background('ocr', f"OCR {os.path.basename(file_path)}...",
+                                  lambda: pdf_ocr.iter_searchable(file_path, save_path, progress=progress), add_page,
+                                  finished, on_cancel=lambda: self.ocr_pdf_btn.config(state="normal"),
+                                  progress=progress):
+            self.ocr_pdf_btn.config(state="disabled")
+    
+    def show_ocr_result(self, text, title="OCR Result"):
+        ocr_win = tb.Toplevel(self.window)
+        ocr_win.title(title)
+        ocr_win.geometry("600x400")
+        text_widget = tb.Text(ocr_win, wrap="word")
+        text_widget.insert("1.0", text)
+        text_widget.pack(fill="both", expand=True)
+        def save_txt():
+            save_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text Files", "*.txt")], title="Save OCR Text As")
+            if save_path:
+                with open(save_path, 'w', encoding='utf-8') as f:
+                    f.write(text_widget.get("1.0", "end-1c"))
+        save_btn = tb.Button(ocr_win, text="Save as .txt", command=save_txt)
+        save_btn.pack(pady=5)
+        return text_widget
+    
+    def save_metadata(self):
+        file_path = self.meta_file_path.get()
+        if not file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+        try:
+            metadata = {
+                'title': self.meta_title.get(),
+                'author': self.meta_author.get(),
+                'subject': self.meta_subject.get(),
+                'keywords': self.meta_keywords.get(),
+            }
+            save_path = filedialog.asksaveasfilename(
+                defaultextension=".pdf",
+                filetypes=[("PDF Files", "*.pdf")],
+                title="Save PDF with New Metadata"
+            )
+            if save_path:
+                incremental = self.meta_incremental.get()
+                self.run_save_job('metadata', f"Saving metadata of {os.path.basename(file_path)}...",
+                                  lambda progress: ops.save_metadata(file_path, save_path, metadata,
+                                                                     incremental=incremental, progress=progress),
+                                  save_path, 'Save Metadata', "Metadata saved successfully!", "Error saving metadata")
+        except Exception as e:
+            messagebox.showerror("Error", f"Error saving metadata: {e}")
+    def save_metadata_batch(self):
+        file_paths = filedialog.askopenfilenames(
+            title="Select PDF files to update",
+            filetypes=[("PDF Files", "*.pdf")]
+        )
+        if not file_paths:
+            return
+        if not messagebox.askyesno("Apply Metadata", f"Update the metadata of {len(file_paths)} file(s) in place?"):
+            return
+        fields = {
+            'title': self.meta_title.get(),
+            'author': self.meta_author.get(),
+            'subject': self.meta_subject.get(),
+            'keywords': self.meta_keywords.get(),
+        }
+        # Empty boxes leave each file's own value alone instead of erasing it, as on the command line
+        metadata = {key: value for key, value in fields.items() if value.strip()}
+        if not metadata:
+            messagebox.showwarning("Warning", "Please fill in at least one metadata field.")
+            return
+        options = {'metadata': metadata, 'incremental': self.meta_incremental.get(), 'templated': True}
+        # In-place updates are not added to the undo history, which would delete the original file
+        self.run_batch_async('metadata', list(file_paths), None, ops.default_jobs(), options,
+                             self.meta_results, None, "Batch metadata")
+    
+    def clear_metadata(self):
+        self.meta_title.set("")
+        self.meta_author.set("")
+        self.meta_subject.set("")
+        self.meta_keywords.set("")
+    
+    def run(self):
+        self.window.mainloop()
+        self.jobs.shutdown()
+        self.close_delete_document()
+        if self._documents is not None:
+            self._documents.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Any arguments switch to the headless command line (see pdf_cli.py)
+        import pdf_cli
+        sys.exit(pdf_cli.main())
+    configure_from_environment()
+    app = PDFToolbox()
+    app.run()
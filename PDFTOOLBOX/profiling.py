@@ -0,0 +1,200 @@
+"""Opt-in timing spans and per-job profiles, exported as Chrome trace JSON for bug reports.
+
+Tracing is off unless turned on from the GUI's Diagnostics menu or with environment variables:
+
+    PDFTOOLBOX_TRACE=trace.json             record spans, write them to trace.json at exit
+    PDFTOOLBOX_PROFILE=cprofile,tracemalloc  also profile each job (either or both)
+
+Open the trace in chrome://tracing or https://ui.perfetto.dev. Jobs show up as spans with the
+stages inside them (parse, transform, serialize, write, ocr), fitz rendering and Tesseract calls
+below those. A job's cProfile capture is saved next to the trace as <trace>.job<n>.prof; tracemalloc
+adds the job's peak memory and top allocation sites to its span.
+
+While tracing is off, span() hands back one shared no-op context manager, so instrumented code
+costs a single attribute check. Only the process that turned tracing on records: worker
+processes of split, OCR and batch pools are covered by their job's span and stage times.
+"""
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List, Optional
+
+ENV_TRACE = "PDFTOOLBOX_TRACE"
+ENV_PROFILE = "PDFTOOLBOX_PROFILE"
+
+CPROFILE = "cprofile"
+TRACEMALLOC = "tracemalloc"
+CAPTURES = (CPROFILE, TRACEMALLOC)
+
+DEFAULT_MAX_EVENTS = 200_000
+TOP_ALLOCATIONS = 10
+
+_NO_SPAN = nullcontext()
+
+
+class Tracer:
+    """Collects complete ('X') trace events from any thread of this process."""
+
+    def __init__(self, max_events: int = DEFAULT_MAX_EVENTS):
+        self.enabled = False
+        self.captures = frozenset()
+        self.max_events = max_events
+        self.dropped = 0
+        self._events: List[dict] = []
+        self._threads: Dict[int, str] = {}
+        self._profiles: List[cProfile.Profile] = []
+        self._tracemalloc_users = 0
+        self._started_tracemalloc = False
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self, captures: Iterable[str] = ()):
+        unknown = set(captures) - set(CAPTURES)
+        if unknown:
+            raise ValueError(f"Unknown profile capture(s): {', '.join(sorted(unknown))}")
+        self.captures = frozenset(captures)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._profiles.clear()
+            self.dropped = 0
+
+    def event_count(self) -> int:
+        with self._lock:
+            return len(self._events)
+
+    def span(self, name: str, category: str = "operation", **args):
+        """Context manager timing its block as one trace event; args are shown with the event."""
+        if not self.enabled:
+            return _NO_SPAN
+        return self._span(name, category, args)
+
+    def job(self, name: str, category: str = "job", **args):
+        """Like span(), with the cProfile and tracemalloc captures that are turned on."""
+        if not self.enabled:
+            return _NO_SPAN
+        return self._job(name, category, args)
+
+    def add(self, name: str, category: str, started: float, seconds: float, args: Optional[dict] = None):
+        """Record a finished span that started at perf_counter() value started."""
+        thread = threading.current_thread()
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': thread.ident,
+                 'ts': round((started - self._origin) * 1e6, 1), 'dur': round(seconds * 1e6, 1)}
+        if args is not None:
+            event['args'] = args
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._events.append(event)
+            self._threads.setdefault(thread.ident, thread.name)
+
+    def export(self, path: str) -> List[str]:
+        """Write the trace to path and each job's cProfile data beside it; returns the files written."""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+            profiles = list(self._profiles)
+            dropped = self.dropped
+        pid = os.getpid()
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': "PDF Toolbox"}}]
+        metadata += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                     for tid, name in threads.items()]
+        written = [path]
+        stem = os.path.splitext(path)[0]
+        for number, profile in enumerate(profiles, start=1):
+            profile_path = f"{stem}.job{number}.prof"
+            profile.dump_stats(profile_path)
+            written.append(profile_path)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms',
+                       'otherData': {'dropped_events': dropped}}, f)
+        return written
+
+    @contextmanager
+    def _span(self, name: str, category: str, args: dict) -> Iterator[dict]:
+        started = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, category, started, time.perf_counter() - started, args)
+
+    @contextmanager
+    def _job(self, name: str, category: str, args: dict) -> Iterator[dict]:
+        profile = self._start_profile() if CPROFILE in self.captures else None
+        snapshot = self._start_tracemalloc() if TRACEMALLOC in self.captures else None
+        try:
+            with self._span(name, category, args):
+                yield args
+        finally:
+            if profile is not None:
+                profile.disable()
+                with self._lock:
+                    self._profiles.append(profile)
+                    args['profile'] = f"job{len(self._profiles)}"
+            if snapshot is not None:
+                args.update(self._stop_tracemalloc(snapshot))
+
+    def _start_profile(self) -> Optional[cProfile.Profile]:
+        # cProfile follows the calling thread only, which is the one running the job
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler is active in this thread
+            return None
+        return profile
+
+    def _start_tracemalloc(self):
+        with self._lock:
+            self._tracemalloc_users += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            elif self._tracemalloc_users == 1:
+                tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot()
+
+    def _stop_tracemalloc(self, before) -> dict:
+        # With several jobs traced at once the peak is shared between them
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().compare_to(before, 'lineno')[:TOP_ALLOCATIONS]
+        with self._lock:
+            self._tracemalloc_users -= 1
+            if not self._tracemalloc_users and self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        return {'peak_bytes': peak, 'retained_bytes': current,
+                'top_allocations': [str(statistic) for statistic in top]}
+
+
+tracer = Tracer()
+
+
+def span(name: str, category: str = "operation", **args):
+    """tracer.span(); the form instrumented modules use."""
+    return tracer.span(name, category, **args)
+
+
+def parse_captures(value: str) -> List[str]:
+    """'cprofile, tracemalloc' -> ['cprofile', 'tracemalloc']."""
+    return [part.strip().lower() for part in value.split(",") if part.strip()]
+
+
+def configure_from_environment() -> Optional[str]:
+    """Turn tracing on when PDFTOOLBOX_TRACE names a file, exporting to it at exit; returns that path."""
+    path = os.environ.get(ENV_TRACE)
+    if not path:
+        return None
+    tracer.enable(parse_captures(os.environ.get(ENV_PROFILE, "")))
+    atexit.register(tracer.export, path)
+    return path
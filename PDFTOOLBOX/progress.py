@@ -0,0 +1,228 @@
+"""Progress and throughput of long operations, shared by the GUI's progress bar and the CLI.
+
+Operations report what they have finished to a Progress: pages, files and bytes written, and the
+time spent in each stage (parse, transform, serialize, write; OCR adds its own). A snapshot turns
+that into a fraction done, pages/s, MB/s and an ETA, and into a JSON-friendly event for headless
+runs. Listeners are called from the thread doing the work, at most every interval seconds.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+from profiling import span
+
+PARSE = "parse"
+TRANSFORM = "transform"
+SERIALIZE = "serialize"
+WRITE = "write"
+
+
+class ProgressSnapshot(NamedTuple):
+    title: str
+    pages: int
+    total_pages: Optional[int]
+    files: int
+    total_files: Optional[int]
+    bytes: int
+    elapsed: float
+    stages: Dict[str, float]
+    finished: bool = False
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """Share of the work done: from files when there are several, else from pages if their total is known."""
+        if self.finished:
+            return 1.0
+        if self.total_files and self.total_files > 1:
+            return min(self.files / self.total_files, 1.0)
+        if self.total_pages:
+            return min(self.pages / self.total_pages, 1.0)
+        if self.total_files:
+            return min(self.files / self.total_files, 1.0)
+        return None
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / (1024 * 1024) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left at the average rate so far; None until something is done."""
+        fraction = self.fraction
+        if not fraction or fraction >= 1.0:
+            return None if not fraction else 0.0
+        return self.elapsed * (1 - fraction) / fraction
+
+    def describe(self) -> str:
+        """e.g. '120/400 pages, 35.2 pages/s, 4.1 MB/s, ETA 0:08'."""
+        parts = []
+        if self.total_files and self.total_files > 1:
+            parts.append(f"{self.files}/{self.total_files} files")
+        if self.total_pages:
+            parts.append(f"{self.pages}/{self.total_pages} pages")
+        elif self.pages:
+            parts.append(f"{self.pages} pages")
+        if self.pages:
+            parts.append(f"{self.pages_per_second:.1f} pages/s")
+        if self.bytes:
+            parts.append(f"{self.mb_per_second:.1f} MB/s")
+        eta = self.eta
+        if eta is not None and not self.finished:
+            parts.append(f"ETA {format_duration(eta)}")
+        return ", ".join(parts)
+
+    def describe_stages(self) -> str:
+        """e.g. 'parse 0.12s, transform 0.40s, serialize 1.10s, write 0.30s'."""
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stages.items())
+
+    def to_event(self, event: str = "progress") -> dict:
+        return {
+            'event': event,
+            'title': self.title,
+            'pages': self.pages,
+            'total_pages': self.total_pages,
+            'files': self.files,
+            'total_files': self.total_files,
+            'bytes': self.bytes,
+            'elapsed': round(self.elapsed, 3),
+            'fraction': None if self.fraction is None else round(self.fraction, 4),
+            'pages_per_second': round(self.pages_per_second, 2),
+            'mb_per_second': round(self.mb_per_second, 3),
+            'eta': None if self.eta is None else round(self.eta, 1),
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+        }
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class _TimedFile:
+    """Binary output file that counts the bytes written and the time spent writing them."""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'wb')
+        self.bytes = 0
+        self.write_time = 0.0
+
+    def write(self, data) -> int:
+        started = time.perf_counter()
+        written = self._file.write(data)
+        self.write_time += time.perf_counter() - started
+        self.bytes += len(data)
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class Cancelled(Exception):
+    """Raised by Progress.check() once the operation has been cancelled."""
+
+    def __init__(self, title: str = ""):
+        super().__init__(f"{title} cancelled" if title else "Cancelled")
+
+
+class Progress:
+    """Thread-safe counters of one operation; listener(snapshot) is told about changes.
+
+    cancelled, when given, is polled by check(): operations call it before they commit their
+    output, so a cancelled save stops without leaving a file behind.
+    """
+
+    def __init__(self, title: str = "", total_pages: Optional[int] = None, total_files: Optional[int] = None,
+                 listener: Optional[Callable[[ProgressSnapshot], None]] = None, interval: float = 0.2,
+                 cancelled: Optional[Callable[[], bool]] = None):
+        self.title = title
+        self.listener = listener
+        self.interval = interval
+        self.cancelled = cancelled
+        self._total_pages = total_pages
+        self._total_files = total_files
+        self._pages = 0
+        self._files = 0
+        self._bytes = 0
+        self._stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._notified = 0.0
+        self._lock = threading.Lock()
+
+    def expect(self, pages: int = 0, files: int = 0):
+        """Add to the expected totals, e.g. once a document is parsed and its page count known."""
+        with self._lock:
+            if pages:
+                self._total_pages = (self._total_pages or 0) + pages
+            if files:
+                self._total_files = (self._total_files or 0) + files
+        self._changed()
+
+    def advance(self, pages: int = 0, files: int = 0, num_bytes: int = 0):
+        with self._lock:
+            self._pages += pages
+            self._files += files
+            self._bytes += num_bytes
+        self._changed()
+
+    def check(self):
+        """Raise Cancelled if the operation has been cancelled."""
+        if self.cancelled is not None and self.cancelled():
+            raise Cancelled(self.title)
+
+    def add_stage_time(self, name: str, seconds: float):
+        with self._lock:
+            self._stages[name] = self._stages.get(name, 0.0) + seconds
+
+    def add_stages(self, stages: Dict[str, float]):
+        for name, seconds in stages.items():
+            self.add_stage_time(name, seconds)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            with span(name, "stage"):
+                yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - started)
+
+    @contextmanager
+    def output(self, path: str) -> Iterator[_TimedFile]:
+        """Open path for writing; time inside the block counts as serialize, except the file writes."""
+        started = time.perf_counter()
+        output_file = _TimedFile(path)
+        try:
+            with span("serialize and write", "stage", path=path):
+                yield output_file
+        finally:
+            output_file.close()
+            elapsed = time.perf_counter() - started
+            self.add_stage_time(SERIALIZE, elapsed - output_file.write_time)
+            self.add_stage_time(WRITE, output_file.write_time)
+            self.advance(num_bytes=output_file.bytes)
+
+    def snapshot(self, finished: bool = False) -> ProgressSnapshot:
+        with self._lock:
+            return ProgressSnapshot(self.title, self._pages, self._total_pages, self._files, self._total_files,
+                                    self._bytes, time.perf_counter() - self._started, dict(self._stages), finished)
+
+    def finish(self) -> ProgressSnapshot:
+        """The final snapshot, always passed to the listener."""
+        snapshot = self.snapshot(finished=True)
+        if self.listener is not None:
+            self.listener(snapshot)
+        return snapshot
+
+    def _changed(self):
+        if self.listener is None:
+            return
+        now = time.perf_counter()
+        if now - self._notified >= self.interval:
+            self._notified = now
+            self.listener(self.snapshot())
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject, NumberObject, TextStringObject
+
+# The toolbox modules are imported flat, as pdf_toolbox.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _link(writer: PdfWriter, **entries):
+    annotation = DictionaryObject({NameObject("/Type"): NameObject("/Annot"), NameObject("/Subtype"): NameObject("/Link"),
+                                   NameObject("/Rect"): ArrayObject([NumberObject(0)] * 4)})
+    annotation.update({NameObject(f"/{key}"): value for key, value in entries.items()})
+    return writer._add_object(annotation)
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """make_pdf(name, pages, destinations={name: 0-based page}, links=[name, ...]) -> path.
+
+    Each page is 200pt square. links are named-destination links on the first page: a /Dest link for
+    every name, plus a GoTo action for the last one. label_prefix labels the pages 'prefix' + i, ii, ...
+    """
+    def make(name: str, pages: int = 3, destinations=None, links=(), lang=None, label_prefix=None) -> str:
+        writer = PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(200, 200)
+        for title, page in (destinations or {}).items():
+            writer.add_named_destination(title, page)
+        annotations = ArrayObject(_link(writer, Dest=TextStringObject(target)) for target in links)
+        if links:
+            action = DictionaryObject({NameObject("/S"): NameObject("/GoTo"), NameObject("/D"): TextStringObject(links[-1])})
+            annotations.append(_link(writer, A=action))
+            writer.pages[0][NameObject("/Annots")] = annotations
+        if lang:
+            writer._root_object[NameObject("/Lang")] = TextStringObject(lang)
+        if label_prefix:
+            style = DictionaryObject({NameObject("/S"): NameObject("/r"), NameObject("/P"): TextStringObject(label_prefix)})
+            writer._root_object[NameObject("/PageLabels")] = DictionaryObject(
+                {NameObject("/Nums"): ArrayObject([NumberObject(0), style])})
+        path = str(tmp_path / name)
+        with open(path, 'wb') as f:
+            writer.write(f)
+        return path
+
+    return make
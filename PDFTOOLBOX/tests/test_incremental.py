@@ -0,0 +1,62 @@
+import shutil
+
+import pytest
+from PyPDF2 import PdfReader
+
+import pdf_operations as ops
+
+
+@pytest.fixture(params=["classic", "object_streams"])
+def source(request, make_pdf, tmp_path):
+    """A 6-page PDF with a classic xref table, or one with an xref stream and object streams."""
+    path = make_pdf("source.pdf", 6)
+    if request.param == "object_streams":
+        fitz = pytest.importorskip("fitz")
+        with fitz.open(path) as doc:
+            path = str(tmp_path / "packed.pdf")
+            doc.save(path, use_objstms=1, deflate=True)
+        assert PdfReader(path).xref_objStm
+    return path
+
+
+def reopen(path, original):
+    """The output, checked to be the original bytes with an update appended, read strictly."""
+    with open(original, 'rb') as f:
+        before = f.read()
+    with open(path, 'rb') as f:
+        assert f.read(len(before)) == before
+        assert f.read()
+    return PdfReader(path, strict=True)
+
+
+def test_delete_pages(source, tmp_path):
+    output = ops.delete_pages(source, str(tmp_path / "out.pdf"), "2,5-6", incremental=True)
+    reader = reopen(output, source)
+    assert len(reader.pages) == 3
+    assert [page.mediabox.width for page in reader.pages] == [200] * 3
+
+
+def test_rotate_pages(source, tmp_path):
+    output = ops.rotate_pages(source, str(tmp_path / "out.pdf"), 90, "odd", incremental=True)
+    reader = reopen(output, source)
+    assert [page.get("/Rotate", 0) for page in reader.pages] == [90, 0, 90, 0, 90, 0]
+
+
+def test_save_metadata(source, tmp_path):
+    output = ops.save_metadata(source, str(tmp_path / "out.pdf"), {'title': "Report", 'author': "Finance"},
+                               incremental=True)
+    reader = reopen(output, source)
+    assert reader.metadata.title == "Report" and reader.metadata.author == "Finance"
+    assert len(reader.pages) == 6
+
+
+def test_updates_stack_in_place(source, tmp_path):
+    path = str(tmp_path / "edited.pdf")
+    shutil.copyfile(source, path)
+    ops.rotate_pages(path, path, 180, "1", incremental=True)
+    ops.delete_pages(path, path, "6", incremental=True)
+    ops.save_metadata(path, path, {'title': "Edited"}, incremental=True)
+    reader = reopen(path, source)
+    assert len(reader.pages) == 5
+    assert reader.pages[0]["/Rotate"] == 180
+    assert reader.metadata.title == "Edited"
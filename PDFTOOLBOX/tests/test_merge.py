@@ -0,0 +1,50 @@
+from PyPDF2 import PdfReader
+
+import pdf_operations as ops
+from pdf_pages import PageIndex
+
+
+def link_targets(path):
+    """(page, destination, 0-based target page) of every link annotation, resolved like a viewer."""
+    reader = PdfReader(path, strict=True)
+    index = PageIndex.of(reader)
+    targets = []
+    for number, page in enumerate(reader.pages):
+        for annotation in page.get("/Annots", []):
+            annotation = annotation.get_object()
+            destination = annotation["/Dest"] if "/Dest" in annotation else annotation["/A"]["/D"]
+            targets.append((number, str(destination), index.page_number(destination)))
+    return targets
+
+
+def test_named_destination_links_resolve(make_pdf, tmp_path):
+    first = make_pdf("first.pdf", 3, {"intro": 1, "end": 2}, links=["intro", "end"])
+    second = make_pdf("second.pdf", 2, {"solo": 1}, links=["solo"])
+    output, stats = ops.merge_pdfs([first, second], str(tmp_path / "merged.pdf"))
+    assert stats['pages'] == 5
+    assert link_targets(output) == [(0, "intro", 1), (0, "end", 2), (0, "end", 2), (3, "solo", 4), (3, "solo", 4)]
+
+
+def test_clashing_destination_names_are_prefixed(make_pdf, tmp_path):
+    first = make_pdf("first.pdf", 2, {"intro": 1}, links=["intro"])
+    second = make_pdf("second.pdf", 3, {"intro": 2}, links=["intro"])
+    output, _stats = ops.merge_pdfs([first, second], str(tmp_path / "merged.pdf"))
+    reader = PdfReader(output, strict=True)
+    assert sorted(reader.named_destinations) == ["2_intro", "intro"]
+    assert link_targets(output) == [(0, "intro", 1), (0, "intro", 1), (2, "2_intro", 4), (2, "2_intro", 4)]
+
+
+def test_document_language_is_kept(make_pdf, tmp_path):
+    first = make_pdf("first.pdf", 1, lang="de-DE")
+    second = make_pdf("second.pdf", 1, lang="en-US")
+    output, _stats = ops.merge_pdfs([first, second], str(tmp_path / "merged.pdf"))
+    assert PdfReader(output).trailer["/Root"]["/Lang"] == "de-DE"
+
+
+def test_page_labels_restart_per_input(make_pdf, tmp_path):
+    first = make_pdf("first.pdf", 2, label_prefix="A-")
+    second = make_pdf("second.pdf", 2)
+    output, _stats = ops.merge_pdfs([first, second], str(tmp_path / "merged.pdf"))
+    labels = PdfReader(output).trailer["/Root"]["/PageLabels"]["/Nums"]
+    assert [int(start) for start in labels[::2]] == [0, 2]
+    assert labels[1]["/P"] == "A-" and labels[3]["/S"] == "/D"
@@ -0,0 +1,66 @@
+import pytest
+
+from page_ranges import PageRangeSet
+
+
+def parse(text, total_pages=10):
+    return str(PageRangeSet.parse(text, total_pages))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,3-5,7", "1,3-5,7"),
+    ("5,1-3,2", "1-3,5"),
+    ("7-", "7-10"),
+    ("8-last", "8-10"),
+    ("-3", "8-10"),
+    ("-15", "1-10"),
+    ("last", "10"),
+    ("odd", "1,3,5,7,9"),
+    ("even,!4", "2,6,8,10"),
+    ("!3", "1-2,4-10"),
+    ("!1,!9-", "2-8"),
+    ("1-6,!2-3;!5", "1,4,6"),
+])
+def test_parse(text, expected):
+    assert parse(text) == expected
+
+
+@pytest.mark.parametrize("text, message", [
+    ("11", "Page 11 is out of range (1-10)"),
+    ("0", "Page 0 is out of range (1-10)"),
+    ("8-12", "Page 11 is out of range (1-10)"),
+    ("4-2", "Invalid page range: 4-2"),
+    ("-0", "Invalid page selection: -0"),
+    ("abc", "Invalid page selection: abc"),
+    ("2-x", "Invalid page selection: 2-x"),
+    ("", "Please enter at least one page."),
+])
+def test_parse_errors(text, message):
+    with pytest.raises(ValueError) as error:
+        PageRangeSet.parse(text, 10)
+    assert str(error.value) == message
+
+
+@pytest.mark.parametrize("text", ["!3", "odd", "last", "-2", "7-"])
+def test_selections_that_need_the_page_count(text):
+    with pytest.raises(ValueError, match="page count"):
+        PageRangeSet.parse(text)
+
+
+def test_large_ranges_stay_compact():
+    pages = PageRangeSet.parse("1-500000,!250000")
+    assert pages.intervals() == [(1, 249999), (250001, 500000)]
+    assert len(pages) == 499999
+    assert 250000 not in pages and 250001 in pages
+
+
+def test_gaps_and_intersects():
+    pages = PageRangeSet([(3, 4), (8, 9)])
+    assert list(pages.gaps(1, 10)) == [(1, 2), (5, 7), (10, 10)]
+    assert list(pages.gaps(3, 4)) == []
+    assert pages.intersects(5, 8) and not pages.intersects(5, 7)
+
+
+def test_equal_sets_hash_alike():
+    assert PageRangeSet.parse("1-3") == PageRangeSet.from_pages([3, 1, 2])
+    assert len({PageRangeSet.parse("1-3"), PageRangeSet.from_pages([1, 2, 3])}) == 1
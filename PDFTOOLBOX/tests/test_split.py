@@ -0,0 +1,21 @@
+import os
+
+import pytest
+from PyPDF2 import PdfReader
+
+import pdf_operations as ops
+
+
+def test_parallel_split_returns_parts_in_order(make_pdf, tmp_path):
+    source = make_pdf("source.pdf", 12)
+    template = str(tmp_path / "out" / "{part:03d}.pdf")
+    outputs = ops.split_pdf(source, template, "every_n", n=1, jobs=3)
+    assert [os.path.basename(path) for path in outputs] == [f"{part:03d}.pdf" for part in range(1, 13)]
+    assert all(len(PdfReader(path, strict=True).pages) == 1 for path in outputs)
+
+
+def test_clashing_part_names_fail_before_creating_directories(make_pdf, tmp_path):
+    source = make_pdf("source.pdf", 4)
+    with pytest.raises(ValueError, match="add {part}"):
+        ops.split_pdf(source, str(tmp_path / "new" / "{stem}.pdf"), "every_n", n=1)
+    assert not (tmp_path / "new").exists()
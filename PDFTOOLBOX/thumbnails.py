@@ -0,0 +1,176 @@
+"""Page thumbnails rendered by a process pool and kept in an on-disk cache.
+
+Thumbnails are JPEG files stored per document under a fingerprint of the file's content, so
+reopening a document (or a copy of it) shows its pages without rendering them again, while an
+edited file gets new thumbnails. Workers write the files themselves and only return their paths;
+the GUI loads the few it is currently showing.
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+
+from page_preview import render_page
+from paths import cache_root
+
+THUMBNAIL_SIZE = (120, 160)  # bounding box in pixels
+DEFAULT_THUMBNAIL_CACHE_BYTES = 512 * 1024 * 1024
+
+# The fingerprint reads this many evenly spaced blocks of the file, plus its last block
+_FINGERPRINT_SAMPLES = 16
+_FINGERPRINT_BLOCK = 64 * 1024
+
+
+def default_cache_dir() -> str:
+    return os.path.join(cache_root(), "thumbnails")
+
+
+def content_fingerprint(path: str) -> str:
+    """Hash of the file's size and sampled content, not of its path or mtime like ops.file_fingerprint.
+
+    Small files are hashed whole. Larger ones are sampled at fixed offsets and at the end, where
+    incremental updates append their changes, so even a 700 MB scan is keyed in milliseconds.
+    Only those blocks and the size are hashed: an edit to a large file that keeps its size and
+    touches none of the sampled blocks reuses the old thumbnails.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, 'rb') as f:
+        if size <= _FINGERPRINT_SAMPLES * _FINGERPRINT_BLOCK * 2:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        else:
+            step = size // _FINGERPRINT_SAMPLES
+            for offset in [i * step for i in range(_FINGERPRINT_SAMPLES)] + [size - _FINGERPRINT_BLOCK]:
+                f.seek(offset)
+                digest.update(f.read(_FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+
+class ThumbnailCache:
+    """Directory of thumbnail files, one subdirectory per document fingerprint.
+
+    prune() removes the least recently opened documents once the directory outgrows max_bytes.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_THUMBNAIL_CACHE_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def document_dir(self, fingerprint: str, size: Tuple[int, int]) -> str:
+        return os.path.join(self.directory, f"{fingerprint}_{size[0]}x{size[1]}")
+
+    def open_document(self, fingerprint: str, size: Tuple[int, int]) -> str:
+        directory = self.document_dir(fingerprint, size)
+        os.makedirs(directory, exist_ok=True)
+        os.utime(directory)  # marks the document as recently used for prune()
+        return directory
+
+    def prune(self):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_dir()]
+        except FileNotFoundError:
+            return
+        documents = []
+        total = 0
+        for entry in entries:
+            size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            documents.append((entry.stat().st_mtime, size, entry.path))
+            total += size
+        for _mtime, size, path in sorted(documents):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def thumbnail_path(directory: str, number: int) -> str:
+    return os.path.join(directory, f"{number}.jpg")
+
+
+# Source document of the thumbnail worker processes, opened once per process
+_thumbnail_source = None
+
+
+def _open_thumbnail_source(input_path: str):
+    global _thumbnail_source
+    _thumbnail_source = fitz.open(input_path)
+
+
+def _render_thumbnail(number: int, size: Tuple[int, int], output_path: str) -> str:
+    rect = _thumbnail_source.load_page(number).rect
+    scale = min(size[0] / rect.width, size[1] / rect.height)
+    image = render_page(_thumbnail_source, number, scale).convert("RGB")
+    # Written under a temporary name so a reader never sees half a file
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    image.save(temp_path, "JPEG", quality=80)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+class ThumbnailPool:
+    """Renders thumbnails of one document on demand.
+
+    request(pages) returns the paths of the pages that are already cached and queues the others
+    on worker processes; finished() collects the ones rendered since the last call. Pages that
+    are no longer wanted can be dropped with cancel() before a worker picks them up.
+    """
+
+    def __init__(self, input_path: str, cache: Optional[ThumbnailCache] = None,
+                 size: Tuple[int, int] = THUMBNAIL_SIZE, jobs: Optional[int] = None):
+        self.cache = cache or ThumbnailCache()
+        self.size = size
+        self.directory = self.cache.open_document(content_fingerprint(input_path), size)
+        self._input_path = input_path
+        self._jobs = jobs or min(4, os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._futures: Dict[int, Future] = {}
+
+    def request(self, pages: Iterable[int]) -> Dict[int, str]:
+        cached = {}
+        for number in pages:
+            path = thumbnail_path(self.directory, number)
+            if os.path.exists(path):
+                cached[number] = path
+            elif number not in self._futures:
+                self._futures[number] = self._pool().submit(_render_thumbnail, number, self.size, path)
+        return cached
+
+    def pending(self) -> bool:
+        return bool(self._futures)
+
+    def finished(self) -> List[Tuple[int, Union[str, Exception]]]:
+        """(page, thumbnail path or the render error) for each page completed since the last call."""
+        done = []
+        for number, future in list(self._futures.items()):
+            if future.done():
+                del self._futures[number]
+                if not future.cancelled():
+                    error = future.exception()
+                    done.append((number, error if error is not None else future.result()))
+        return done
+
+    def cancel(self, keep: Iterable[int]):
+        """Drop queued pages outside keep; pages already being rendered still finish."""
+        keep = set(keep)
+        for number, future in list(self._futures.items()):
+            if number not in keep and future.cancel():
+                del self._futures[number]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._futures.clear()
+        self.cache.prune()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self._jobs, mp_context=context,
+                                                 initializer=_open_thumbnail_source, initargs=(self._input_path,))
+        return self._executor